@@ -1,194 +1,844 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query
-from sqlalchemy.orm import Session
-import crud
-import schemas
-from database import get_db
-from minio_client import upload_to_minio, download_from_minio, upload_merged_to_minio
-from fastapi_cache import FastAPICache
-from fastapi_cache.backends.inmemory import InMemoryBackend
-import pandas as pd
-import uuid
-import json
-import io
-
-ALLOWED_EXTENSIONS = {"csv", "xlsx"}
-
-router = APIRouter()
-
-# POST Method — File Upload
-@router.post("/file/upload", response_model = schemas.FileResponse)
-def upload_file(
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db)
-):
-    file_extension = file.filename.split('.')[-1]
-    
-    if (file_extension not in ALLOWED_EXTENSIONS):
-        print(f"Invalid file type: {file_extension}")
-        raise HTTPException(status_code = 400, detail = "Invalid file type. Only CSV and XLSX files are allowed.")
-
-    file_name = file.filename.split('.')[0]
-    file_format = file_extension
-    
-    print(f"Processing file: {file.filename}")
-
-    try:
-        db_record = crud.create_file_record(
-            db = db, 
-            file_name = file_name,
-            file_format = file_format
-        )
-        
-        upload_to_minio(file, file.filename)
-
-        return db_record
-
-    except HTTPException as e:
-        print(f"HTTP error occurred while uploading file: {e.detail}")
-        raise e
-    except Exception as e:
-        print(f"Error occurred while uploading file: {e}")
-        raise HTTPException(status_code = 500, detail = f"An error occurred: {e}")
-
-#  GET Method — View Stored Files  
-@router.get("/files", response_model = list[schemas.FileResponse])
-def get_all_files(db: Session = Depends(get_db)):
-    try:
-        records = crud.get_all_file_records(db = db)
-        return records
-    
-    except Exception as e:
-        print(f"Error occurred while fetching files: {e}")
-        raise HTTPException(status_code = 500, detail = f"An error occurred: {e}")
-
-# GET Method — Merge Two Files Temporarily
-@router.get("/files/merge", response_model = schemas.MergeResponse)
-async def merge_files(
-    file_id_1: int = Query(..., description = "ID of the first file to merge"),
-    file_id_2: int = Query(..., description = "ID of the second file to merge"),
-    common_column: str = Query(..., description = "Common column to merge on"),
-    join_type: str = Query(..., description = "Type of join operation: 'inner', 'outer', 'left', 'right'"),
-    db: Session = Depends(get_db),
-    cache: InMemoryBackend = Depends(FastAPICache.get_backend)
-): 
-    try:
-        file_record_1 = crud.get_file_record(db = db, file_id = file_id_1)
-        file_record_2 = crud.get_file_record(db = db, file_id = file_id_2)
-
-        if not file_record_1 or not file_record_2:
-            print(f"One or both file IDs not found: {file_id_1}, {file_id_2}")
-            raise HTTPException(status_code = 404, detail = "One or both file IDs not found.")
-        
-        full_name_1 = f"{file_record_1.file_name}.{file_record_1.file_format}"
-        full_name_2 = f"{file_record_2.file_name}.{file_record_2.file_format}"
-
-        df1 = download_from_minio(full_name_1)
-        df2 = download_from_minio(full_name_2)
-
-        df1.columns = df1.columns.str.strip().str.lower()
-        df2.columns = df2.columns.str.strip().str.lower()
-
-        if common_column not in df1.columns or common_column not in df2.columns:
-            print(f"Common column {common_column} not found in one or both files.")
-            raise HTTPException(status_code = 400, detail = f"Common column {common_column} not found in one or both files.")
-
-        merged_df = pd.merge(df1, df2, on = common_column, how = join_type)
-
-        if file_record_1.file_format != file_record_2.file_format:
-            print(f"File format mismatch: {file_record_1.file_format} vs {file_record_2.file_format}")
-            raise HTTPException(status_code = 400, detail = "File format mismatch. Both files must be of the same format to merge.")
-        
-        if file_record_1.file_format == "csv":
-            merged_filename = f"merged_{file_record_1.file_name}_{file_record_2.file_name}_via_{join_type}.csv"
-        elif file_record_1.file_format == "xlsx":
-            merged_filename = f"merged_{file_record_1.file_name}_{file_record_2.file_name}_via_{join_type}.xlsx"
-        else:
-            print(f"Unsupported file format: {file_record_1.file_format}")
-            raise HTTPException(status_code = 400, detail = "Unsupported file format.")
-
-        cache_key = uuid.uuid4()
-        df_json = merged_df.to_json(orient = "records")
-
-        cache_data = {
-            "df": df_json,
-            "file1_name": full_name_1,
-            "file2_name": full_name_2,
-            "join_type": join_type,
-            "merged_filename": merged_filename
-        }
-
-        await cache.set(str(cache_key), json.dumps(cache_data), expire = 300)
-
-        preview_json = merged_df.head().to_dict(orient = "records")
-
-        print(f"Files merged successfully: {full_name_1}, {full_name_2}")
-
-        return schemas.MergeResponse(
-            message = "Files merged successfully.",
-            cache_key = cache_key,
-            preview = preview_json
-        )
-
-    except HTTPException as e:
-        print(f"HTTP error occurred while merging files: {e.detail}")
-        raise e
-    except Exception as e:
-        print(f"Error occurred while merging files: {e}")
-        raise HTTPException(status_code = 500, detail = f"An error occurred: {e}")
-    
-#  POST Method — Save Merged Dataset Permanently
-@router.post("/files/save_merged", response_model = schemas.FileResponse)
-async def save_merged_file(
-    merged_file: schemas.SaveMergedResponse,
-    db: Session = Depends(get_db),
-    cache: InMemoryBackend = Depends(FastAPICache.get_backend)
-):
-    try:
-        cache_key = str(merged_file.cache_key)
-        cached_json = await cache.get(cache_key)
-        
-        if not cached_json:
-            print(f"Cache key not found or expired: {cache_key}")
-            raise HTTPException(status_code = 404, detail = "Cache key not found or expired. Please merge the files again.")
-        
-        try:
-            cache_data = json.loads(cached_json)
-        except json.JSONDecodeError:
-            print(f"Failed to decode cache data for key: {cache_key}")
-            raise HTTPException(status_code = 500, detail = "Failed to decode cached data. Please merge the files again.")
-
-        df_json = cache_data.get("df")
-        file1_name = cache_data.get("file1_name")
-        file2_name = cache_data.get("file2_name")
-        join_type = cache_data.get("join_type")
-        merged_filename = cache_data.get("merged_filename")
-
-        if not all([df_json, file1_name, file2_name, join_type, merged_filename]):
-            print(f"Incomplete cache data for key: {cache_key}")
-            raise HTTPException(status_code = 400, detail = "Incomplete cache data. Please merge the files again.")
-
-        merged_filename = merged_filename
-        merged_df = pd.read_json(io.StringIO(df_json), orient = "records")
-        file_format = merged_filename.split('.')[-1]
-
-        upload_merged_to_minio(df = merged_df, merged_file_name = merged_filename, file_format = file_format)
-
-        merged_filename_base = merged_filename.split('.')[0]
-
-        db_record = crud.create_file_record(
-            db = db,
-            file_name = merged_filename_base,
-            file_format = file_format
-        )
-
-        print(f"Merged file saved successfully: {merged_filename}")
-
-        return db_record
-
-    except HTTPException as e:
-        print(f"HTTP error occurred while saving merged file: {e.detail}")
-        raise e
-    except Exception as e:
-        print(f"Error occurred while saving merged file: {e}")
-        raise HTTPException(status_code = 500, detail = f"An error occurred: {e}")
-
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, Header
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+import crud
+import schemas
+from database import get_db, get_async_db
+from minio_client import upload_to_minio, parse_upload, upload_parquet_shadow, object_exists, parquet_object_name, remove_objects_from_minio, download_from_minio, download_chunks_from_minio, get_object_stat, get_object_size, get_merge_key_of_object, upload_merged_to_minio, commit_staged_merge, delta_object_name, append_rows_to_object
+from merge_cache import set_merge_result, set_merge_result_from_chunks, start_staging, wait_for_staging, get_merge_metadata, get_reusable_merge, iter_merge_chunks, open_merge_batches, frames_to_batches, merge_cache_key, merge_chain_cache_key, spill_directory
+from streaming import STREAM_MEDIA_TYPES, OBJECT_MEDIA_TYPES, encode_batches, slice_batches, parse_range, iter_object_bytes
+from merge_pipeline import build_merge_metadata, build_merge_chain_metadata, check_merge_catalog, plan_merge_chain, merge_frames, merge_chain, preview_records, start_out_of_core_merge, start_out_of_core_chain
+from profiling import profile_dataframe, profile_csv_stream
+from pushdown import NO_PUSHDOWN, build_pushdown, pushdown_identity
+from lineage import merge_lineage, pending_deltas, refresh_merged_output
+from key_index import upload_key_indexes, load_merge_indexes
+from frame_cache import frame_cache
+from external_merge import fits_in_memory, JOIN_TYPES
+from executors import run_io, run_cpu
+from jobs import merge_jobs
+from config import settings
+import asyncio
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends import Backend
+import pandas as pd
+import pyarrow as pa
+import uuid
+import json
+
+ALLOWED_EXTENSIONS = {"csv", "xlsx"}
+
+router = APIRouter()
+
+# Run a crud function from an async endpoint: natively (its _async version, or on the session's connection)
+# for an AsyncSession, on the I/O pool for a sync session
+async def run_db(db: Session | AsyncSession, function, **kwargs):
+
+    if isinstance(db, AsyncSession):
+        async_function = getattr(crud, f"{function.__name__}_async", None)
+
+        if async_function is not None:
+            return await async_function(db = db, **kwargs)
+
+        return await db.run_sync(lambda session: function(db = session, **kwargs))
+
+    return await run_io(function, db = db, **kwargs)
+
+# Stat both inputs at the same time; returns the content-addressed cache key of the merge and the sizes and ETags of the inputs
+async def resolve_merge_key(cache_data: dict, common_column: str, join_type: str, pushdowns: list[dict] | None = None) -> tuple[uuid.UUID, list[int], list[str]]:
+
+    stat_1, stat_2 = await asyncio.gather(
+        run_io(get_object_stat, cache_data["file1_name"]),
+        run_io(get_object_stat, cache_data["file2_name"])
+    )
+
+    cache_key = merge_cache_key(cache_data["file1_name"], stat_1.etag, cache_data["file2_name"], stat_2.etag, common_column, join_type, pushdown_identity(pushdowns))
+    return cache_key, [stat_1.size, stat_2.size], [stat_1.etag, stat_2.etag]
+
+# Validate the join column and estimate the result from the column catalog, without downloading either file
+async def check_catalog(db: Session | AsyncSession, file_record_1, file_record_2, etags: list[str], file_sizes: list[int], common_column: str, join_type: str, pushdowns: list[dict] | None = None) -> dict | None:
+
+    catalog = await run_db(db, crud.get_file_schemas, file_ids = [file_record_1.id, file_record_2.id])
+    return check_merge_catalog(catalog.get(file_record_1.id), catalog.get(file_record_2.id), etags, file_sizes, common_column, join_type, pushdowns or (NO_PUSHDOWN, NO_PUSHDOWN))
+
+# Parquet copy, column catalog and key indexes of a parsed file; returns the Parquet object (None when it could
+# not be written), the profile and the objects that did not exist before
+def store_derived_objects(df: pd.DataFrame, file_name: str, etag: str) -> tuple[str | None, dict, list[str]]:
+
+    created_objects = []
+
+    shadow_existed = object_exists(parquet_object_name(file_name))
+    parquet_object = upload_parquet_shadow(None, file_name, df = df)
+
+    if parquet_object and not shadow_existed:
+        created_objects.append(parquet_object)
+
+    profile = profile_dataframe(df)
+
+    # Key indexes overwrite those of any earlier version of the file, so a rollback removes them too
+    created_objects.extend(upload_key_indexes(df, file_name, etag))
+
+    return parquet_object, profile, created_objects
+
+# Put an uploaded file (and its Parquet copy) into MinIO; returns the metadata record fields
+# and the objects that did not exist before, so a failed insert can remove them again
+def store_upload(file: UploadFile) -> dict:
+
+    created_objects = [] if object_exists(file.filename) else [file.filename]
+    file_size, checksum, etag = upload_to_minio(file, file.filename)
+    file_format = file.filename.split('.')[-1]
+
+    # Files too large to parse in memory keep only the original; their merges read it in chunks anyway
+    parquet_object = None
+    profile = None
+
+    if fits_in_memory([file_size], settings.MERGE_MEMORY_LIMIT_BYTES):
+        df = parse_upload(file.file, file.filename)
+
+        if df is not None:
+            parquet_object, profile, derived_objects = store_derived_objects(df, file.filename, etag)
+            created_objects.extend(derived_objects)
+
+    elif file_format == "csv":
+        try:
+            profile = profile_csv_stream(file.file, settings.MERGE_CHUNK_ROWS)
+        except Exception as e:
+            print(f"Could not profile {file.filename}: {e}")
+
+    if profile is not None:
+        profile["etag"] = etag
+
+    record = {
+        "file_name": file.filename.split('.')[0],
+        "file_format": file_format,
+        "file_size": file_size,
+        "checksum": checksum,
+        "parquet_object": parquet_object,
+        "profile": profile
+    }
+
+    return {"record": record, "created_objects": created_objects}
+
+# POST Method — File Upload
+@router.post("/file/upload", response_model = schemas.FileResponse)
+def upload_file(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db)
+):
+    file_extension = file.filename.split('.')[-1]
+    
+    if (file_extension not in ALLOWED_EXTENSIONS):
+        print(f"Invalid file type: {file_extension}")
+        raise HTTPException(status_code = 400, detail = "Invalid file type. Only CSV and XLSX files are allowed.")
+
+    print(f"Processing file: {file.filename}")
+
+    try:
+        upload = store_upload(file)
+
+        db_record = crud.create_file_record(db = db, **upload["record"])
+
+        return db_record
+
+    except HTTPException as e:
+        print(f"HTTP error occurred while uploading file: {e.detail}")
+        raise e
+    except Exception as e:
+        print(f"Error occurred while uploading file: {e}")
+        raise HTTPException(status_code = 500, detail = f"An error occurred: {e}")
+
+# Keep appended rows as their own delta object and fold them into the stored file, then rebuild what was
+# derived from the file; returns the fields of the delta record and of the file's new state
+def store_delta(file_record, file: UploadFile, sequence: int) -> dict:
+
+    full_name = f"{file_record.file_name}.{file_record.file_format}"
+
+    rows = parse_upload(file.file, file.filename)
+    if rows is None:
+        print(f"Could not parse appended rows: {file.filename}")
+        raise HTTPException(status_code = 400, detail = "The appended file could not be parsed.")
+
+    object_name = delta_object_name(full_name, sequence)
+    base_etag = get_object_stat(full_name).etag
+    upload_to_minio(file, object_name)
+
+    try:
+        etag = append_rows_to_object(full_name, rows, file_record.file_format)
+    except Exception:
+        remove_objects_from_minio([object_name])
+        raise
+
+    file_size = get_object_size(full_name)
+    parquet_object = None
+    profile = None
+
+    # Like an upload: files too large to parse in memory are only read in chunks by merges, so they keep no Parquet copy
+    if fits_in_memory([file_size], settings.MERGE_MEMORY_LIMIT_BYTES):
+        parquet_object, profile, _ = store_derived_objects(download_from_minio(full_name), full_name, etag)
+        profile["etag"] = etag
+
+    return {
+        "sequence": sequence,
+        "object_name": object_name,
+        "row_count": len(rows),
+        "base_etag": base_etag.strip('"'),
+        "etag": etag.strip('"'),
+        "file_size": file_size,
+        "parquet_object": parquet_object,
+        "profile": profile
+    }
+
+# POST Method — Append Rows to an Uploaded File
+@router.post("/files/{file_id}/append", response_model = schemas.AppendResponse)
+def append_to_file(
+    file_id: int,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db)
+):
+    file_record = crud.get_file_record(db = db, file_id = file_id)
+
+    if not file_record:
+        print(f"File ID not found: {file_id}")
+        raise HTTPException(status_code = 404, detail = "File ID not found.")
+
+    if file.filename.split('.')[-1] != file_record.file_format:
+        print(f"Appended file format does not match: {file.filename}")
+        raise HTTPException(status_code = 400, detail = f"Appended rows must be a {file_record.file_format} file, like the file they are appended to.")
+
+    print(f"Appending {file.filename} to file ID {file_id}")
+
+    try:
+        sequence = crud.get_last_delta_sequence(db = db, file_id = file_id) + 1
+        delta = store_delta(file_record, file, sequence)
+
+        db_delta = crud.create_file_delta(db = db, file_record = file_record, **delta)
+
+        return schemas.AppendResponse(file = file_record, delta = db_delta)
+
+    except HTTPException as e:
+        print(f"HTTP error occurred while appending to file: {e.detail}")
+        raise e
+    except Exception as e:
+        print(f"Error occurred while appending to file: {e}")
+        raise HTTPException(status_code = 500, detail = f"An error occurred: {e}")
+
+# POST Method — Upload Many Files in One Request
+@router.post("/files/upload/batch", response_model = schemas.BatchUploadResponse)
+async def upload_files_batch(
+    files: list[UploadFile] = File(...),
+    db: Session | AsyncSession = Depends(get_async_db)
+):
+    if len(files) > settings.BATCH_UPLOAD_MAX_FILES:
+        print(f"Too many files in batch upload: {len(files)}")
+        raise HTTPException(status_code = 400, detail = f"Too many files. At most {settings.BATCH_UPLOAD_MAX_FILES} files can be uploaded in one request.")
+
+    results: list[schemas.BatchUploadResult | None] = [None] * len(files)
+    accepted = []
+    seen_names = set()
+
+    for index, file in enumerate(files):
+        if file.filename.split('.')[-1] not in ALLOWED_EXTENSIONS:
+            results[index] = schemas.BatchUploadResult(filename = file.filename, status = "failed", error = "Invalid file type. Only CSV and XLSX files are allowed.")
+        elif file.filename in seen_names:
+            results[index] = schemas.BatchUploadResult(filename = file.filename, status = "failed", error = "Duplicate file name in this batch.")
+        else:
+            seen_names.add(file.filename)
+            accepted.append(index)
+
+    print(f"Processing batch upload: {len(accepted)} of {len(files)} files accepted")
+
+    # Object puts run in parallel on the I/O pool, at most BATCH_UPLOAD_CONCURRENCY at a time
+    semaphore = asyncio.Semaphore(settings.BATCH_UPLOAD_CONCURRENCY)
+
+    async def store(file: UploadFile) -> dict:
+        async with semaphore:
+            return await run_io(store_upload, file)
+
+    outcomes = await asyncio.gather(*(store(files[index]) for index in accepted), return_exceptions = True)
+
+    stored = []
+    for index, outcome in zip(accepted, outcomes):
+        if isinstance(outcome, Exception):
+            error = outcome.detail if isinstance(outcome, HTTPException) else str(outcome)
+            print(f"Error occurred while uploading {files[index].filename}: {error}")
+            results[index] = schemas.BatchUploadResult(filename = files[index].filename, status = "failed", error = error)
+        else:
+            stored.append((index, outcome))
+
+    if stored:
+        try:
+            db_records = await run_db(db, crud.create_file_records, records = [upload["record"] for _, upload in stored])
+
+            for (index, _), db_record in zip(stored, db_records):
+                results[index] = schemas.BatchUploadResult(filename = files[index].filename, status = "uploaded", file = db_record)
+
+        except Exception as e:
+            # No metadata was written, so remove the objects this batch created to keep both stores consistent
+            print(f"Error occurred while saving batch metadata, removing uploaded objects: {e}")
+
+            created_objects = [name for _, upload in stored for name in upload["created_objects"]]
+            not_removed = await run_io(remove_objects_from_minio, created_objects)
+
+            if not_removed:
+                print(f"Could not remove objects after failed batch upload: {not_removed}")
+
+            for index, _ in stored:
+                results[index] = schemas.BatchUploadResult(filename = files[index].filename, status = "failed", error = f"Saving file metadata failed, upload rolled back: {e}")
+
+    uploaded = sum(1 for result in results if result.status == "uploaded")
+
+    return schemas.BatchUploadResponse(
+        uploaded = uploaded,
+        failed = len(results) - uploaded,
+        results = results
+    )
+
+#  GET Method — View Stored Files  
+@router.get("/files", response_model = list[schemas.FileResponse])
+async def get_all_files(db: Session | AsyncSession = Depends(get_async_db)):
+    try:
+        records = await run_db(db, crud.get_all_file_records)
+        return records
+    
+    except Exception as e:
+        print(f"Error occurred while fetching files: {e}")
+        raise HTTPException(status_code = 500, detail = f"An error occurred: {e}")
+
+# GET Method — View Stored Files One Page at a Time
+@router.get("/files/page", response_model = schemas.FilePageResponse)
+def get_files_page(
+    cursor: int | None = Query(None, description = "next_cursor of the previous page; omit for the first page"),
+    limit: int = Query(settings.FILES_PAGE_DEFAULT_LIMIT, ge = 1, le = settings.FILES_PAGE_MAX_LIMIT, description = "Maximum number of files in the page"),
+    file_format: str | None = Query(None, description = "Only files of this format, e.g. 'csv'"),
+    file_name_prefix: str | None = Query(None, description = "Only files whose name starts with this prefix"),
+    include_count: bool = Query(False, description = "Add an estimated total of matching files"),
+    db: Session = Depends(get_db)
+):
+    try:
+        records, next_cursor = crud.get_file_records_page(
+            db = db,
+            after_id = cursor,
+            limit = limit,
+            file_format = file_format,
+            file_name_prefix = file_name_prefix
+        )
+
+        estimated_total = None
+        if include_count:
+            estimated_total = crud.estimate_file_record_count(db = db, file_format = file_format, file_name_prefix = file_name_prefix)
+
+        return schemas.FilePageResponse(
+            items = records,
+            next_cursor = next_cursor,
+            estimated_total = estimated_total
+        )
+
+    except Exception as e:
+        print(f"Error occurred while fetching files page: {e}")
+        raise HTTPException(status_code = 500, detail = f"An error occurred: {e}")
+
+# GET Method — Column Catalog of a Stored File
+@router.get("/files/{file_id}/schema", response_model = schemas.FileSchemaResponse)
+def get_file_schema(file_id: int, db: Session = Depends(get_db)):
+
+    schema = crud.get_file_schema(db = db, file_id = file_id)
+
+    if schema is None:
+        print(f"No column catalog for file ID: {file_id}")
+        raise HTTPException(status_code = 404, detail = "File not found or not profiled.")
+
+    return schema
+
+# GET Method — Stream a Stored File (byte ranges supported for stored objects)
+@router.get("/files/{file_id}/download")
+def download_file(
+    file_id: int,
+    format: str = Query("original", description = "'original', or convert to 'csv', 'ndjson', 'arrow' or 'parquet'"),
+    range_header: str | None = Header(None, alias = "Range"),
+    if_range: str | None = Header(None, alias = "If-Range"),
+    db: Session = Depends(get_db)
+):
+    file_record = crud.get_file_record(db = db, file_id = file_id)
+
+    if not file_record:
+        print(f"File ID not found: {file_id}")
+        raise HTTPException(status_code = 404, detail = "File ID not found.")
+
+    full_name = f"{file_record.file_name}.{file_record.file_format}"
+
+    if format in ("original", file_record.file_format):
+        object_name, object_format = full_name, file_record.file_format
+    elif format == "parquet" and file_record.parquet_object:
+        object_name, object_format = file_record.parquet_object, "parquet"
+    else:
+        # Converted on the fly chunk by chunk; generated bodies have no stable byte offsets, so no ranges
+        if format not in STREAM_MEDIA_TYPES:
+            print(f"Unsupported download format: {format}")
+            raise HTTPException(status_code = 400, detail = f"Unsupported download format. Use 'original' or one of: {', '.join(STREAM_MEDIA_TYPES)}.")
+
+        chunks = download_chunks_from_minio(full_name, settings.MERGE_CHUNK_ROWS, spill_directory(), file_record.parquet_object)
+        schema, batches = frames_to_batches(chunks)
+
+        return StreamingResponse(
+            encode_batches(schema, batches, format),
+            media_type = STREAM_MEDIA_TYPES[format],
+            headers = {
+                "Accept-Ranges": "none",
+                "Content-Disposition": f'attachment; filename="{file_record.file_name}.{format}"'
+            }
+        )
+
+    stat = get_object_stat(object_name)
+    etag = '"' + stat.etag.strip('"') + '"'
+
+    # If-Range: resume only when the object is still the version the client started with
+    byte_range = parse_range(range_header, stat.size) if not if_range or if_range == etag else None
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Content-Disposition": f'attachment; filename="{object_name.split("/")[-1]}"'
+    }
+
+    if byte_range is None:
+        headers["Content-Length"] = str(stat.size)
+        return StreamingResponse(iter_object_bytes(object_name), media_type = OBJECT_MEDIA_TYPES[object_format], headers = headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{stat.size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    return StreamingResponse(
+        iter_object_bytes(object_name, offset = start, length = end - start + 1),
+        status_code = 206,
+        media_type = OBJECT_MEDIA_TYPES[object_format],
+        headers = headers
+    )
+
+# GET Method — Parsed DataFrame Cache Statistics
+@router.get("/cache/frames")
+def get_frame_cache_stats():
+    return frame_cache.stats()
+
+# GET Method — Merge Two Files Temporarily
+@router.get("/files/merge", response_model = schemas.MergeResponse)
+async def merge_files(
+    file_id_1: int = Query(..., description = "ID of the first file to merge"),
+    file_id_2: int = Query(..., description = "ID of the second file to merge"),
+    common_column: str = Query(..., description = "Common column to merge on"),
+    join_type: str = Query(..., description = "Type of join operation: 'inner', 'outer', 'left', 'right'"),
+    columns_1: list[str] | None = Query(None, description = "Columns of the first file to keep (the common column is always kept); all when omitted"),
+    columns_2: list[str] | None = Query(None, description = "Columns of the second file to keep (the common column is always kept); all when omitted"),
+    filters_1: list[str] | None = Query(None, description = "Row filters on the first file as column:operator:value, operator one of eq, ne, gt, gte, lt, lte, in (comma-separated values)"),
+    filters_2: list[str] | None = Query(None, description = "Row filters on the second file as column:operator:value, operator one of eq, ne, gt, gte, lt, lte, in (comma-separated values)"),
+    db: Session | AsyncSession = Depends(get_async_db),
+    cache: Backend = Depends(FastAPICache.get_backend)
+): 
+    try:
+        # Both records in one round trip
+        records = await run_db(db, crud.get_file_records, file_ids = [file_id_1, file_id_2])
+        file_record_1 = records.get(file_id_1)
+        file_record_2 = records.get(file_id_2)
+
+        if not file_record_1 or not file_record_2:
+            print(f"One or both file IDs not found: {file_id_1}, {file_id_2}")
+            raise HTTPException(status_code = 404, detail = "One or both file IDs not found.")
+        
+        common_column = common_column.strip().lower()
+
+        # Only the requested columns and matching rows of each file are read
+        pushdowns = [build_pushdown(columns_1, filters_1, common_column), build_pushdown(columns_2, filters_2, common_column)]
+        cache_data = build_merge_metadata(file_record_1, file_record_2, join_type, pushdowns)
+
+        full_name_1 = cache_data["file1_name"]
+        full_name_2 = cache_data["file2_name"]
+
+        cache_key, file_sizes, etags = await resolve_merge_key(cache_data, common_column, join_type, pushdowns)
+        cache_data["lineage"] = merge_lineage(file_record_1, file_record_2, common_column, join_type, etags, pushdown_identity(pushdowns))
+
+        # Identical request on unchanged inputs: hand back the result that is already cached
+        cached_merge = await get_reusable_merge(cache, str(cache_key))
+        if cached_merge is not None:
+            print(f"Reusing cached merge of {full_name_1}, {full_name_2}: {cache_key}")
+
+            return schemas.MergeResponse(
+                message = "Files merged successfully.",
+                cache_key = cache_key,
+                preview = cached_merge.get("preview", []),
+                estimated_rows = cached_merge.get("estimated_rows")
+            )
+
+        estimate = await check_catalog(db, file_record_1, file_record_2, etags, file_sizes, common_column, join_type, pushdowns)
+        estimated_rows = estimate["rows"] if estimate else None
+        cache_data["estimated_rows"] = estimated_rows
+
+        # A join that fans out can outgrow memory even when both inputs fit
+        in_memory = fits_in_memory(file_sizes, settings.MERGE_MEMORY_LIMIT_BYTES)
+        if in_memory and estimate and estimate["bytes"] is not None:
+            in_memory = estimate["bytes"] <= settings.MERGE_MEMORY_LIMIT_BYTES
+
+        if in_memory:
+            # Both downloads run at the same time on the I/O pool
+            df1, df2 = await asyncio.gather(
+                run_io(download_from_minio, full_name_1, file_record_1.parquet_object, **pushdowns[0]),
+                run_io(download_from_minio, full_name_2, file_record_2.parquet_object, **pushdowns[1])
+            )
+
+            merged_df = await run_cpu(merge_frames, df1, df2, common_column, join_type)
+            preview_json = preview_records(merged_df)
+            cache_data["preview"] = preview_json
+
+            await set_merge_result(cache, str(cache_key), merged_df, cache_data)
+
+        else:
+            # Too large for worker memory: partition both inputs to local spill files and stream the join result to disk
+            key_indexes = await run_io(load_merge_indexes, [full_name_1, full_name_2], etags, common_column, join_type)
+            preview_json, merged_chunks = await run_cpu(start_out_of_core_merge, file_record_1, file_record_2, common_column, join_type, file_sizes, key_indexes, pushdowns)
+            cache_data["preview"] = preview_json
+
+            await set_merge_result_from_chunks(cache, str(cache_key), merged_chunks, cache_data)
+
+        start_staging(cache, str(cache_key))
+
+        print(f"Files merged successfully: {full_name_1}, {full_name_2}")
+
+        return schemas.MergeResponse(
+            message = "Files merged successfully.",
+            cache_key = cache_key,
+            preview = preview_json,
+            estimated_rows = estimated_rows
+        )
+
+    except HTTPException as e:
+        print(f"HTTP error occurred while merging files: {e.detail}")
+        raise e
+    except Exception as e:
+        print(f"Error occurred while merging files: {e}")
+        raise HTTPException(status_code = 500, detail = f"An error occurred: {e}")
+    
+# POST Method — Merge a Chain of Files in One Request
+@router.post("/files/merge/chain", response_model = schemas.MergeChainResponse)
+async def merge_file_chain(
+    request: schemas.MergeChainRequest,
+    db: Session | AsyncSession = Depends(get_async_db),
+    cache: Backend = Depends(FastAPICache.get_backend)
+):
+    try:
+        if not 2 <= len(request.file_ids) <= settings.MERGE_CHAIN_MAX_FILES:
+            print(f"Invalid number of files to merge: {len(request.file_ids)}")
+            raise HTTPException(status_code = 400, detail = f"A merge chain takes between 2 and {settings.MERGE_CHAIN_MAX_FILES} files.")
+
+        if len(request.joins) != len(request.file_ids) - 1:
+            print(f"Merge chain has {len(request.file_ids)} files but {len(request.joins)} joins")
+            raise HTTPException(status_code = 400, detail = "Give one join (common column and join type) for every file after the first.")
+
+        joins = [(join.common_column.strip().lower(), join.join_type) for join in request.joins]
+
+        for _, join_type in joins:
+            if join_type not in JOIN_TYPES:
+                print(f"Invalid join type: {join_type}")
+                raise HTTPException(status_code = 400, detail = f"Invalid join type. Use one of: {', '.join(JOIN_TYPES)}.")
+
+        records = await run_db(db, crud.get_file_records, file_ids = request.file_ids)
+
+        if any(file_id not in records for file_id in request.file_ids):
+            print(f"One or more file IDs not found: {request.file_ids}")
+            raise HTTPException(status_code = 404, detail = "One or more file IDs not found.")
+
+        file_records = [records[file_id] for file_id in request.file_ids]
+        cache_data = build_merge_chain_metadata(file_records, joins)
+        file_names = cache_data["file_names"]
+
+        stats = await asyncio.gather(*(run_io(get_object_stat, file_name) for file_name in file_names))
+        file_sizes = [stat.size for stat in stats]
+        etags = [stat.etag for stat in stats]
+
+        cache_key = merge_chain_cache_key(file_names, etags, joins)
+
+        # Identical chain on unchanged inputs: hand back the result that is already cached
+        cached_merge = await get_reusable_merge(cache, str(cache_key))
+        if cached_merge is not None:
+            print(f"Reusing cached merge of {', '.join(file_names)}: {cache_key}")
+
+            return schemas.MergeChainResponse(
+                message = "Files merged successfully.",
+                cache_key = cache_key,
+                preview = cached_merge.get("preview", []),
+                estimated_rows = cached_merge.get("estimated_rows"),
+                join_order = cached_merge.get("join_order", request.file_ids)
+            )
+
+        catalog = await run_db(db, crud.get_file_schemas, file_ids = request.file_ids)
+        plan = plan_merge_chain([catalog.get(file_id) for file_id in request.file_ids], etags, file_sizes, joins)
+        cache_data["join_order"] = [request.file_ids[index] for index in plan["order"]]
+        cache_data["estimated_rows"] = plan["rows"]
+
+        in_memory = fits_in_memory(file_sizes, settings.MERGE_MEMORY_LIMIT_BYTES)
+        if in_memory and plan["bytes"] is not None:
+            in_memory = plan["bytes"] <= settings.MERGE_MEMORY_LIMIT_BYTES
+
+        if in_memory:
+            frames = await asyncio.gather(*(
+                run_io(download_from_minio, file_name, file_record.parquet_object)
+                for file_name, file_record in zip(file_names, file_records)
+            ))
+
+            merged_df = await run_cpu(merge_chain, list(frames), plan)
+            del frames
+            preview_json = preview_records(merged_df)
+            cache_data["preview"] = preview_json
+
+            await set_merge_result(cache, str(cache_key), merged_df, cache_data)
+
+        else:
+            preview_json, merged_chunks = await run_cpu(start_out_of_core_chain, file_records, plan, file_sizes)
+            cache_data["preview"] = preview_json
+
+            await set_merge_result_from_chunks(cache, str(cache_key), merged_chunks, cache_data)
+
+        start_staging(cache, str(cache_key))
+
+        print(f"Files merged successfully: {', '.join(file_names)}")
+
+        return schemas.MergeChainResponse(
+            message = "Files merged successfully.",
+            cache_key = cache_key,
+            preview = preview_json,
+            estimated_rows = plan["rows"],
+            join_order = cache_data["join_order"]
+        )
+
+    except HTTPException as e:
+        print(f"HTTP error occurred while merging files: {e.detail}")
+        raise e
+    except Exception as e:
+        print(f"Error occurred while merging files: {e}")
+        raise HTTPException(status_code = 500, detail = f"An error occurred: {e}")
+
+#  POST Method — Save Merged Dataset Permanently
+@router.post("/files/save_merged", response_model = schemas.FileResponse)
+async def save_merged_file(
+    merged_file: schemas.SaveMergedResponse,
+    db: Session | AsyncSession = Depends(get_async_db),
+    cache: Backend = Depends(FastAPICache.get_backend)
+):
+    try:
+        cache_key = str(merged_file.cache_key)
+        try:
+            cache_data = await get_merge_metadata(cache, cache_key)
+        except json.JSONDecodeError:
+            print(f"Failed to decode cache data for key: {cache_key}")
+            raise HTTPException(status_code = 500, detail = "Failed to decode cached data. Please merge the files again.")
+
+        if cache_data is None:
+            print(f"Cache key not found or expired: {cache_key}")
+            raise HTTPException(status_code = 404, detail = "Cache key not found or expired. Please merge the files again.")
+
+        file1_name = cache_data.get("file1_name")
+        file2_name = cache_data.get("file2_name")
+        join_type = cache_data.get("join_type")
+        merged_filename = cache_data.get("merged_filename")
+
+        # Merge chains record their inputs as a list instead of a pair
+        if not merged_filename or not (cache_data.get("file_names") or all([file1_name, file2_name, join_type])):
+            print(f"Incomplete cache data for key: {cache_key}")
+            raise HTTPException(status_code = 400, detail = "Incomplete cache data. Please merge the files again.")
+
+        file_format = merged_filename.split('.')[-1]
+        merged_filename_base = merged_filename.split('.')[0]
+
+        # The same merge (same key) was saved before: the object is already in MinIO, so skip the re-upload
+        if await run_io(get_merge_key_of_object, merged_filename) == cache_key:
+            existing_record = await run_db(db, crud.get_file_record_by_name, file_name = merged_filename_base, file_format = file_format)
+
+            if existing_record:
+                print(f"Merged file already saved, skipping upload: {merged_filename}")
+                return existing_record
+        else:
+            await wait_for_staging(cache_key)
+
+            # The merge already wrote the file in its output format: a server-side copy saves it without serializing again
+            if not await run_io(commit_staged_merge, cache_key, merged_filename, file_format):
+                try:
+                    merged_chunks = await iter_merge_chunks(cache, cache_key, cache_data)
+                except pa.ArrowInvalid:
+                    print(f"Failed to decode cache data for key: {cache_key}")
+                    raise HTTPException(status_code = 500, detail = "Failed to decode cached data. Please merge the files again.")
+
+                if merged_chunks is None:
+                    print(f"Cache key not found or expired: {cache_key}")
+                    raise HTTPException(status_code = 404, detail = "Cache key not found or expired. Please merge the files again.")
+
+                await run_io(upload_merged_to_minio, df = merged_chunks, merged_file_name = merged_filename, file_format = file_format, merge_key = cache_key)
+
+        # Two-file merges record their lineage, so the saved result can be refreshed after appends to its sources
+        db_record = await run_db(
+            db,
+            crud.create_file_record,
+            file_name = merged_filename_base,
+            file_format = file_format,
+            lineage = cache_data.get("lineage")
+        )
+
+        print(f"Merged file saved successfully: {merged_filename}")
+
+        return db_record
+
+    except HTTPException as e:
+        print(f"HTTP error occurred while saving merged file: {e.detail}")
+        raise e
+    except Exception as e:
+        print(f"Error occurred while saving merged file: {e}")
+        raise HTTPException(status_code = 500, detail = f"An error occurred: {e}")
+
+# POST Method — Refresh a Saved Merge Result with the Rows Appended to Its Sources
+@router.post("/files/{file_id}/refresh", response_model = schemas.MergeRefreshResponse)
+def refresh_merged_file(file_id: int, db: Session = Depends(get_db)):
+
+    merged_record = crud.get_file_record(db = db, file_id = file_id)
+
+    if not merged_record:
+        print(f"File ID not found: {file_id}")
+        raise HTTPException(status_code = 404, detail = "File ID not found.")
+
+    lineage = crud.get_merge_lineage(db = db, file_id = file_id)
+
+    if lineage is None:
+        print(f"No merge lineage for file ID: {file_id}")
+        raise HTTPException(status_code = 404, detail = "No merge lineage recorded for this file. Only results of two-file merges saved with save_merged can be refreshed.")
+
+    try:
+        source_ids = [lineage.source_file_id_1, lineage.source_file_id_2]
+        records = crud.get_file_records(db = db, file_ids = source_ids)
+
+        if any(source_id not in records for source_id in source_ids):
+            print(f"Source files of file ID {file_id} not found: {source_ids}")
+            raise HTTPException(status_code = 404, detail = "One or both source files of this merge result no longer exist.")
+
+        source_records = [records[source_id] for source_id in source_ids]
+        deltas = crud.get_file_deltas(db = db, file_ids = source_ids)
+        etags = [get_object_stat(f"{record.file_name}.{record.file_format}").etag.strip('"') for record in source_records]
+
+        pending = [pending_deltas(deltas[source_id], merged_etag, etag) for source_id, merged_etag, etag in zip(source_ids, lineage.source_etags, etags)]
+
+        if any(source_pending is None for source_pending in pending):
+            print(f"Sources of file ID {file_id} changed other than by appends")
+            raise HTTPException(status_code = 409, detail = "A source file changed other than by appends since this result was saved. Please merge the files again.")
+
+        if not any(pending):
+            return schemas.MergeRefreshResponse(file = merged_record, mode = "unchanged", deltas_applied = [0, 0])
+
+        result = refresh_merged_output(merged_record, source_records, lineage, pending)
+
+        merged_name = f"{merged_record.file_name}.{merged_record.file_format}"
+        crud.set_merge_lineage_refreshed(db = db, lineage = lineage, file_record = merged_record, source_etags = etags, file_size = get_object_size(merged_name))
+
+        return schemas.MergeRefreshResponse(file = merged_record, deltas_applied = [len(source_pending) for source_pending in pending], **result)
+
+    except HTTPException as e:
+        print(f"HTTP error occurred while refreshing merged file: {e.detail}")
+        raise e
+    except Exception as e:
+        print(f"Error occurred while refreshing merged file: {e}")
+        raise HTTPException(status_code = 500, detail = f"An error occurred: {e}")
+
+# POST Method — Submit a Background Merge Job
+@router.post("/files/merge/jobs", response_model = schemas.MergeJobResponse, status_code = 202)
+async def submit_merge_job(
+    file_id_1: int = Query(..., description = "ID of the first file to merge"),
+    file_id_2: int = Query(..., description = "ID of the second file to merge"),
+    common_column: str = Query(..., description = "Common column to merge on"),
+    join_type: str = Query(..., description = "Type of join operation: 'inner', 'outer', 'left', 'right'"),
+    db: Session | AsyncSession = Depends(get_async_db),
+    cache: Backend = Depends(FastAPICache.get_backend)
+):
+    try:
+        # Both records in one round trip
+        records = await run_db(db, crud.get_file_records, file_ids = [file_id_1, file_id_2])
+        file_record_1 = records.get(file_id_1)
+        file_record_2 = records.get(file_id_2)
+
+        if not file_record_1 or not file_record_2:
+            print(f"One or both file IDs not found: {file_id_1}, {file_id_2}")
+            raise HTTPException(status_code = 404, detail = "One or both file IDs not found.")
+
+        cache_data = build_merge_metadata(file_record_1, file_record_2, join_type)
+        common_column = common_column.strip().lower()
+
+        cache_key, file_sizes, etags = await resolve_merge_key(cache_data, common_column, join_type)
+        cache_data["lineage"] = merge_lineage(file_record_1, file_record_2, common_column, join_type, etags, None)
+        estimate = await check_catalog(db, file_record_1, file_record_2, etags, file_sizes, common_column, join_type)
+        cache_data["estimated_rows"] = estimate["rows"] if estimate else None
+
+        job = await merge_jobs.submit(cache, str(cache_key), file_record_1, file_record_2, common_column, join_type, cache_data)
+        print(f"Merge job {job['job_id']} submitted: {cache_data['file1_name']}, {cache_data['file2_name']}")
+
+        return job
+
+    except HTTPException as e:
+        print(f"HTTP error occurred while submitting merge job: {e.detail}")
+        raise e
+    except Exception as e:
+        print(f"Error occurred while submitting merge job: {e}")
+        raise HTTPException(status_code = 500, detail = f"An error occurred: {e}")
+
+# GET Method — Stream a Cached Merge Result (page with offset/limit)
+@router.get("/files/merge/{cache_key}/download")
+async def download_merged_file(
+    cache_key: uuid.UUID,
+    format: str = Query("csv", description = "Output format: 'csv', 'ndjson', 'arrow' or 'parquet'"),
+    offset: int = Query(0, ge = 0, description = "Number of result rows to skip"),
+    limit: int | None = Query(None, ge = 1, description = "Maximum number of rows to return"),
+    cache: Backend = Depends(FastAPICache.get_backend)
+):
+    if format not in STREAM_MEDIA_TYPES:
+        print(f"Unsupported download format: {format}")
+        raise HTTPException(status_code = 400, detail = f"Unsupported download format. Use one of: {', '.join(STREAM_MEDIA_TYPES)}.")
+
+    try:
+        cache_data = await get_merge_metadata(cache, str(cache_key))
+        opened = await open_merge_batches(cache, str(cache_key), cache_data) if cache_data else None
+    except (json.JSONDecodeError, pa.ArrowInvalid):
+        print(f"Failed to decode cache data for key: {cache_key}")
+        raise HTTPException(status_code = 500, detail = "Failed to decode cached data. Please merge the files again.")
+
+    if opened is None:
+        print(f"Cache key not found or expired: {cache_key}")
+        raise HTTPException(status_code = 404, detail = "Cache key not found or expired. Please merge the files again.")
+
+    schema, batches = opened
+    merged_filename_base = cache_data.get("merged_filename", str(cache_key)).split('.')[0]
+
+    return StreamingResponse(
+        encode_batches(schema, slice_batches(batches, offset, limit), format),
+        media_type = STREAM_MEDIA_TYPES[format],
+        headers = {
+            "Accept-Ranges": "none",
+            "X-Total-Rows": str(cache_data.get("rows", "")),
+            "Content-Disposition": f'attachment; filename="{merged_filename_base}.{format}"'
+        }
+    )
+
+# GET Method — Merge Job Status and Result
+@router.get("/files/merge/jobs/{job_id}", response_model = schemas.MergeJobResponse)
+async def get_merge_job(job_id: str):
+
+    job = await merge_jobs.status(job_id)
+
+    if job is None:
+        print(f"Merge job not found: {job_id}")
+        raise HTTPException(status_code = 404, detail = "Merge job not found or expired.")
+
+    return job
+
+# DELETE Method — Cancel a Merge Job
+@router.delete("/files/merge/jobs/{job_id}", response_model = schemas.MergeJobResponse)
+async def cancel_merge_job(job_id: str):
+
+    job = await merge_jobs.cancel(job_id)
+
+    if job is None:
+        print(f"Merge job not found: {job_id}")
+        raise HTTPException(status_code = 404, detail = "Merge job not found or expired.")
+
+    return job
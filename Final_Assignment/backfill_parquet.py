@@ -0,0 +1,60 @@
+"""
+Backfill Parquet copies for files uploaded before uploads started writing them.
+
+Run from the Final_Assignment folder with the usual .env in place:
+
+    python backfill_parquet.py
+"""
+from database import SessionLocal
+from minio_client import minio_client, upload_parquet_shadow
+from external_merge import fits_in_memory
+from config import settings
+import crud
+import tempfile
+
+def backfill() -> None:
+
+    db = SessionLocal()
+    converted, skipped, failed = 0, 0, 0
+
+    try:
+        for file_record in crud.get_records_without_parquet(db = db):
+            full_name = f"{file_record.file_name}.{file_record.file_format}"
+
+            try:
+                stat = minio_client.stat_object(settings.MINIO_BUCKET, full_name)
+            except Exception as e:
+                print(f"Skipping {full_name}: original object not found ({e})")
+                skipped += 1
+                continue
+
+            if not fits_in_memory([stat.size], settings.MERGE_MEMORY_LIMIT_BYTES):
+                print(f"Skipping {full_name}: too large to convert in memory ({stat.size} bytes)")
+                skipped += 1
+                continue
+
+            with tempfile.SpooledTemporaryFile(max_size = settings.MINIO_PART_SIZE) as original:
+                response = minio_client.get_object(settings.MINIO_BUCKET, full_name)
+                try:
+                    for chunk in response.stream(settings.MINIO_PART_SIZE):
+                        original.write(chunk)
+                finally:
+                    response.close()
+                    response.release_conn()
+
+                parquet_object = upload_parquet_shadow(original, full_name)
+
+            if parquet_object is None:
+                failed += 1
+                continue
+
+            crud.set_parquet_object(db = db, file_record = file_record, parquet_object = parquet_object)
+            converted += 1
+
+    finally:
+        db.close()
+
+    print(f"Parquet backfill finished: {converted} converted, {skipped} skipped, {failed} failed.")
+
+if __name__ == "__main__":
+    backfill()
@@ -0,0 +1,298 @@
+"""
+End-to-end benchmark of the API: upload, merge and save_merged through the real app in main.py.
+
+Input pairs are generated for every combination of format, size, key cardinality (distinct join keys
+per row) and selectivity (share of right rows whose key exists on the left), so an inner join returns
+about rows * selectivity / cardinality rows. Each combination runs in its own child process, which
+starts the app with a TestClient and measures, over --repeats runs:
+
+    upload        POST /file/upload, for each file of the pair
+    merge_cold    GET /files/merge with the cached result dropped before every run
+    merge_cached  GET /files/merge answered from the cached result
+    save_merged   POST /files/save_merged right after a fresh merge, with the saved object removed first
+
+Timings are reported as p50 / p99 / mean in milliseconds with rows per second; memory as the process
+peak RSS before the stages and the growth each stage added to it (peak RSS only ever grows, so a stage
+that stays under an earlier peak adds nothing). Frame caching is disabled so every merge downloads
+and parses its inputs.
+
+By default nothing external is needed: objects go to the in-process fake in benchmarks.fake_s3 and
+metadata to a temporary SQLite database. --s3 minio uses the MinIO from .env instead (objects are
+named bench_* and left in the bucket), and --database-url points at another database, e.g. Postgres.
+Run from the Final_Assignment folder:
+
+    python -m benchmarks.api_suite --rows 1000 10000 100000 --output results.json
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+CHILD_FLAG = "--child"
+
+def generate_pair(rows: int, cardinality: float, selectivity: float, seed: int = 42) -> tuple[pd.DataFrame, pd.DataFrame]:
+
+    rng = np.random.default_rng(seed)
+    domain = max(1, int(rows * cardinality))
+
+    left = pd.DataFrame({
+        "id": rng.integers(0, domain, rows),
+        "name": rng.choice(["Asha", "Ravi", "Meera", "Arjun", "Kiran"], rows),
+        "amount": rng.normal(60000, 15000, rows).round(2)
+    })
+
+    # Right keys outside [0, domain) never match a left key
+    matching = rng.random(rows) < selectivity
+    right = pd.DataFrame({
+        "id": np.where(matching, rng.integers(0, domain, rows), rng.integers(domain, 2 * domain, rows)),
+        "city": rng.choice(["Mumbai", "Chennai", "Kolkata", "New Delhi"], rows),
+        "score": rng.integers(0, 100, rows)
+    })
+
+    return left, right
+
+def expected_rows(left: pd.DataFrame, right: pd.DataFrame, join_type: str) -> int:
+
+    counts = pd.concat([left["id"].value_counts().rename("left"), right["id"].value_counts().rename("right")], axis = 1)
+    matched = counts.dropna()
+    inner = int((matched["left"] * matched["right"]).sum())
+
+    left_only = int(counts.loc[counts["right"].isna(), "left"].sum())
+    right_only = int(counts.loc[counts["left"].isna(), "right"].sum())
+
+    return {
+        "inner": inner,
+        "left": inner + left_only,
+        "right": inner + right_only,
+        "outer": inner + left_only + right_only
+    }[join_type]
+
+def write_file(df: pd.DataFrame, path: str, file_format: str) -> None:
+
+    if file_format == "csv":
+        df.to_csv(path, index = False)
+    else:
+        from xlsx_io import write_xlsx
+        write_xlsx([df], path)
+
+def summarize(seconds: list[float], rows: int) -> dict:
+
+    values = np.array(seconds)
+
+    return {
+        "runs": len(values),
+        "p50_ms": round(float(np.percentile(values, 50)) * 1000, 2),
+        "p99_ms": round(float(np.percentile(values, 99)) * 1000, 2),
+        "mean_ms": round(float(values.mean()) * 1000, 2),
+        "rows_per_second": round(rows / float(np.median(values)), 1) if values.min() > 0 else None
+    }
+
+def timed(call) -> tuple[float, dict]:
+
+    start = time.perf_counter()
+    response = call()
+    elapsed = time.perf_counter() - start
+
+    if response.status_code != 200:
+        raise RuntimeError(f"{response.request.method} {response.request.url} failed with {response.status_code}: {response.text}")
+
+    return elapsed, response.json()
+
+def run_child(scenario: dict) -> None:
+
+    workdir = scenario["workdir"]
+
+    os.environ["FRAME_CACHE_MAX_BYTES"] = "0"
+    os.environ["MERGE_SPILL_DIR"] = os.path.join(workdir, "spill")
+    os.environ["CACHE_DIR"] = os.path.join(workdir, "cache")
+    os.environ["DATABASE_URL"] = scenario["database_url"] or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    if scenario["s3"] == "fake":
+        from benchmarks import fake_s3
+        fake_s3.install(os.path.join(workdir, "s3"))
+
+        for name, value in (("MINIO_ENDPOINT", "fake:9000"), ("MINIO_ACCESS_KEY", "fake"), ("MINIO_SECRET_KEY", "fake"), ("MINIO_BUCKET", "bench")):
+            os.environ.setdefault(name, value)
+
+    # The app logs every request to stdout, which is reserved for the result line
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        from fastapi.testclient import TestClient
+        from fastapi_cache import FastAPICache
+        from config import settings
+        from metrics import peak_rss_bytes
+        from minio_client import minio_client
+        import main
+
+        file_format = scenario["format"]
+        rows = scenario["rows"]
+        repeats = scenario["repeats"]
+        paths = scenario["files"]
+        join_type = scenario["join_type"]
+
+        seconds = {"upload": [], "merge_cold": [], "merge_cached": [], "save_merged": []}
+        peaks = {}
+
+        with TestClient(main.app) as client:
+            peaks["baseline"] = peak_rss_bytes()
+
+            for _ in range(repeats):
+                file_ids = []
+                for path in paths:
+                    with open(path, "rb") as f:
+                        elapsed, record = timed(lambda: client.post("/api/v1/file/upload", files = {"file": (os.path.basename(path), f)}))
+                    seconds["upload"].append(elapsed)
+                    file_ids.append(record["id"])
+            peaks["upload"] = peak_rss_bytes()
+
+            params = {"file_id_1": file_ids[0], "file_id_2": file_ids[1], "common_column": "id", "join_type": join_type}
+            cache_key = None
+
+            for _ in range(repeats):
+                if cache_key is not None:
+                    # Drops both the result metadata and its payload, which are keyed by the cache key
+                    client.portal.call(FastAPICache.get_backend().clear, cache_key)
+                elapsed, merged = timed(lambda: client.get("/api/v1/files/merge", params = params))
+                seconds["merge_cold"].append(elapsed)
+                cache_key = merged["cache_key"]
+            peaks["merge_cold"] = peak_rss_bytes()
+
+            for _ in range(repeats):
+                elapsed, _ = timed(lambda: client.get("/api/v1/files/merge", params = params))
+                seconds["merge_cached"].append(elapsed)
+            peaks["merge_cached"] = peak_rss_bytes()
+
+            names = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+            merged_object = f"merged_{names[0]}_{names[1]}_via_{join_type}.{file_format}"
+
+            for _ in range(repeats):
+                # An object already saved from this cache key is not uploaded again, and a save consumes the
+                # output staged by its merge, so every save follows a fresh (untimed) merge
+                minio_client.remove_object(settings.MINIO_BUCKET, merged_object)
+                client.portal.call(FastAPICache.get_backend().clear, cache_key)
+                timed(lambda: client.get("/api/v1/files/merge", params = params))
+                elapsed, _ = timed(lambda: client.post("/api/v1/files/save_merged", json = {"cache_key": cache_key}))
+                seconds["save_merged"].append(elapsed)
+            peaks["save_merged"] = peak_rss_bytes()
+
+    stage_rows = {
+        "upload": rows,
+        "merge_cold": 2 * rows,
+        "merge_cached": 2 * rows,
+        "save_merged": scenario["output_rows"]
+    }
+
+    stages = {}
+    previous_peak = peaks["baseline"]
+    for stage, stage_seconds in seconds.items():
+        stages[stage] = summarize(stage_seconds, stage_rows[stage])
+        if previous_peak is not None:
+            stages[stage]["peak_rss_growth_bytes"] = peaks[stage] - previous_peak
+            previous_peak = peaks[stage]
+
+    print(json.dumps({
+        "format": file_format,
+        "rows": rows,
+        "cardinality": scenario["cardinality"],
+        "selectivity": scenario["selectivity"],
+        "join_type": join_type,
+        "file_bytes": [os.path.getsize(path) for path in paths],
+        "output_rows": scenario["output_rows"],
+        "baseline_peak_rss_bytes": peaks["baseline"],
+        "peak_rss_bytes": peaks["save_merged"],
+        "stages": stages
+    }))
+
+def git_commit() -> str | None:
+
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], check = True, capture_output = True, text = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description = "Benchmark upload, merge and save_merged end to end.")
+    parser.add_argument("--rows", nargs = "+", type = int, default = [1000, 10000])
+    parser.add_argument("--formats", nargs = "+", choices = ["csv", "xlsx"], default = ["csv", "xlsx"])
+    parser.add_argument("--cardinalities", nargs = "+", type = float, default = [1.0, 0.1], help = "Distinct join keys per row.")
+    parser.add_argument("--selectivities", nargs = "+", type = float, default = [1.0, 0.1], help = "Share of right rows with a matching left key.")
+    parser.add_argument("--join-type", choices = ["inner", "left", "right", "outer"], default = "inner")
+    parser.add_argument("--repeats", type = int, default = 5)
+    parser.add_argument("--s3", choices = ["fake", "minio"], default = "fake", help = "In-process fake S3 or the MinIO from .env.")
+    parser.add_argument("--database-url", help = "SQLAlchemy URL of the metadata database; a temporary SQLite file by default.")
+    parser.add_argument("--output", help = "Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    results = []
+
+    for file_format, rows, cardinality, selectivity in itertools.product(args.formats, args.rows, args.cardinalities, args.selectivities):
+        workdir = tempfile.mkdtemp(prefix = "api_suite_")
+
+        try:
+            left, right = generate_pair(rows, cardinality, selectivity)
+            label = f"bench_{rows}_{cardinality:g}_{selectivity:g}".replace(".", "p")
+            files = [os.path.join(workdir, f"{label}_left.{file_format}"), os.path.join(workdir, f"{label}_right.{file_format}")]
+
+            write_file(left, files[0], file_format)
+            write_file(right, files[1], file_format)
+
+            scenario = {
+                "format": file_format,
+                "rows": rows,
+                "cardinality": cardinality,
+                "selectivity": selectivity,
+                "join_type": args.join_type,
+                "output_rows": expected_rows(left, right, args.join_type),
+                "repeats": args.repeats,
+                "s3": args.s3,
+                "database_url": args.database_url,
+                "workdir": workdir,
+                "files": files
+            }
+            del left, right
+
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.api_suite", CHILD_FLAG, json.dumps(scenario)],
+                check = True,
+                capture_output = True,
+                text = True
+            ).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+
+        finally:
+            shutil.rmtree(workdir, ignore_errors = True)
+
+    report = {
+        "run": {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "s3": args.s3,
+            "database": args.database_url.split(":")[0] if args.database_url else "sqlite",
+            "repeats": args.repeats
+        },
+        "results": results
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent = 2)
+
+    print(json.dumps(report, indent = 2))
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == CHILD_FLAG:
+        run_child(json.loads(sys.argv[2]))
+    else:
+        main()
@@ -0,0 +1,118 @@
+"""
+Cold start of an API worker: time from launching the process until it answers GET / and until GET /ready
+reports every startup check passed, plus the worker's own breakdown (imported, serving, minio, database, ready).
+
+Each run starts a fresh uvicorn worker in a child process against the in-process fake in benchmarks.fake_s3
+and a SQLite database in a temporary folder, so no MinIO or PostgreSQL is needed. --store-latency and
+--db-latency add that many seconds to every bucket call and every new database connection, to stand in
+for a remote object store and database. Run from the Final_Assignment folder:
+
+    python -m benchmarks.cold_start --runs 5 --store-latency 0.5 --db-latency 0.2
+"""
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+CHILD_FLAG = "--child"
+
+def run_child(port: int, workdir: str, store_latency: float, db_latency: float) -> None:
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'cold_start.db')}"
+    os.environ["CACHE_DIR"] = os.path.join(workdir, "cache")
+    for name, value in (("MINIO_ENDPOINT", "fake:9000"), ("MINIO_ACCESS_KEY", "fake"), ("MINIO_SECRET_KEY", "fake"), ("MINIO_BUCKET", "bench")):
+        os.environ.setdefault(name, value)
+
+    from benchmarks import fake_s3
+    fake_s3.install(os.path.join(workdir, "s3"))
+
+    def delayed(method):
+        def call(*args, **kwargs):
+            time.sleep(store_latency)
+            return method(*args, **kwargs)
+        return call
+
+    fake_s3.FakeMinio.bucket_exists = delayed(fake_s3.FakeMinio.bucket_exists)
+    fake_s3.FakeMinio.make_bucket = delayed(fake_s3.FakeMinio.make_bucket)
+
+    from sqlalchemy import event
+    from database import engine
+    event.listen(engine, "connect", lambda *args: time.sleep(db_latency))
+
+    import uvicorn
+    uvicorn.run("main:app", host = "127.0.0.1", port = port, log_level = "warning")
+
+def free_port() -> int:
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+# Poll url until it answers with 200; returns seconds since started and the response body
+def wait_for(url: str, started: float, timeout: float) -> tuple[float, bytes]:
+
+    while time.perf_counter() - started < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout = 1) as response:
+                return time.perf_counter() - started, response.read()
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.005)
+
+    raise TimeoutError(f"{url} did not answer within {timeout}s")
+
+def measure_run(store_latency: float, db_latency: float, timeout: float) -> dict:
+
+    workdir = tempfile.mkdtemp(prefix = "cold_start_")
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+
+    started = time.perf_counter()
+    worker = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.cold_start", CHILD_FLAG, str(port), workdir, str(store_latency), str(db_latency)],
+        stdout = subprocess.DEVNULL
+    )
+
+    try:
+        first_response, _ = wait_for(f"{base_url}/", started, timeout)
+        ready, body = wait_for(f"{base_url}/ready", started, timeout)
+    finally:
+        worker.terminate()
+        worker.wait()
+        shutil.rmtree(workdir, ignore_errors = True)
+
+    return {"first_response_seconds": first_response, "ready_seconds": ready, "worker": json.loads(body)["startup_seconds"]}
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description = "Measure API worker cold start.")
+    parser.add_argument("--runs", type = int, default = 5)
+    parser.add_argument("--store-latency", type = float, default = 0.0, help = "Seconds added to every bucket call.")
+    parser.add_argument("--db-latency", type = float, default = 0.0, help = "Seconds added to every new database connection.")
+    parser.add_argument("--timeout", type = float, default = 120.0)
+    args = parser.parse_args()
+
+    runs = [measure_run(args.store_latency, args.db_latency, args.timeout) for _ in range(args.runs)]
+    phases = runs[0]["worker"].keys()
+
+    print(json.dumps({
+        "runs": args.runs,
+        "store_latency": args.store_latency,
+        "db_latency": args.db_latency,
+        "first_response_seconds_median": round(statistics.median(run["first_response_seconds"] for run in runs), 4),
+        "ready_seconds_median": round(statistics.median(run["ready_seconds"] for run in runs), 4),
+        "worker_seconds_median": {phase: round(statistics.median(run["worker"][phase] for run in runs), 4) for phase in phases}
+    }, indent = 2))
+
+if __name__ == "__main__":
+    if len(sys.argv) == 6 and sys.argv[1] == CHILD_FLAG:
+        run_child(int(sys.argv[2]), sys.argv[3], float(sys.argv[4]), float(sys.argv[5]))
+    else:
+        main()
@@ -0,0 +1,200 @@
+"""
+In-process stand-in for the MinIO client, for benchmarks that should run without a MinIO server.
+
+Objects are kept as files under a local directory (so stored data does not count towards the
+memory being measured) and implement the parts of the minio SDK the API uses: put/get/stat with
+metadata and If-Match, ranged reads, fget, copy, compose, list and (bulk) removal. install() must
+run before anything imports minio_client.
+"""
+import datetime
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import urllib.parse
+import minio
+from minio.error import S3Error
+
+class FakeObjectStat:
+
+    def __init__(self, bucket_name: str, object_name: str, size: int, etag: str, metadata: dict, last_modified: datetime.datetime):
+        self.bucket_name = bucket_name
+        self.object_name = object_name
+        self.size = size
+        self.etag = etag
+        self.metadata = metadata
+        self.last_modified = last_modified
+        self.is_dir = False
+
+class FakeResponse:
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self._stream = io.BytesIO(data)
+
+    def read(self, amt: int | None = None) -> bytes:
+        return self._stream.read() if amt is None else self._stream.read(amt)
+
+    def stream(self, amt: int = 64 * 1024):
+        while True:
+            chunk = self._stream.read(amt)
+            if not chunk:
+                return
+            yield chunk
+
+    def close(self) -> None:
+        pass
+
+    def release_conn(self) -> None:
+        pass
+
+class FakeMinio:
+
+    root = None
+
+    def __init__(self, *args, **kwargs):
+        self._stats: dict[tuple[str, str], FakeObjectStat] = {}
+        self._buckets = set()
+        self._lock = threading.Lock()
+
+    def _path(self, bucket_name: str, object_name: str) -> str:
+        return os.path.join(self.root, bucket_name, urllib.parse.quote(object_name, safe = ""))
+
+    def _stat(self, bucket_name: str, object_name: str, request_headers: dict | None = None) -> FakeObjectStat:
+
+        with self._lock:
+            stat = self._stats.get((bucket_name, object_name))
+
+        if stat is None:
+            raise S3Error(None, "NoSuchKey", "The specified key does not exist.", object_name, "fake", "fake", bucket_name, object_name)
+
+        expected = (request_headers or {}).get("If-Match")
+        if expected is not None and expected.strip('"') != stat.etag:
+            raise S3Error(None, "PreconditionFailed", "At least one of the preconditions did not hold.", object_name, "fake", "fake", bucket_name, object_name)
+
+        return stat
+
+    # Write an object from an iterable of byte blocks, so large objects are never held in memory at once
+    def _store(self, bucket_name: str, object_name: str, blocks, metadata: dict | None) -> FakeObjectStat:
+
+        path = self._path(bucket_name, object_name)
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+
+        digest = hashlib.md5()
+        size = 0
+
+        # Written aside and moved into place, so an object can be composed from itself
+        writing_path = f"{path}.{threading.get_ident()}.writing"
+        with open(writing_path, "wb") as f:
+            for block in blocks:
+                f.write(block)
+                digest.update(block)
+                size += len(block)
+        os.replace(writing_path, path)
+
+        stat = FakeObjectStat(
+            bucket_name,
+            object_name,
+            size,
+            digest.hexdigest(),
+            {key.lower(): value for key, value in (metadata or {}).items()},
+            datetime.datetime.now(datetime.timezone.utc)
+        )
+
+        with self._lock:
+            self._stats[(bucket_name, object_name)] = stat
+
+        return stat
+
+    @staticmethod
+    def _blocks(data, length: int, part_size: int):
+
+        remaining = length
+        while remaining != 0:
+            block = data.read(part_size if remaining < 0 else min(part_size, remaining))
+            if not block:
+                return
+            yield block
+            remaining -= len(block) if remaining > 0 else 0
+
+    def _read(self, bucket_name: str, object_name: str) -> bytes:
+
+        with open(self._path(bucket_name, object_name), "rb") as f:
+            return f.read()
+
+    def bucket_exists(self, bucket_name: str) -> bool:
+        return bucket_name in self._buckets
+
+    def make_bucket(self, bucket_name: str, *args, **kwargs) -> None:
+        self._buckets.add(bucket_name)
+
+    def put_object(self, bucket_name: str, object_name: str, data, length: int, content_type: str = "application/octet-stream", metadata: dict | None = None, part_size: int = 0, **kwargs):
+        return self._store(bucket_name, object_name, self._blocks(data, length, part_size or 5 * 1024 * 1024), metadata)
+
+    def fput_object(self, bucket_name: str, object_name: str, file_path: str, **kwargs):
+
+        with open(file_path, "rb") as f:
+            return self.put_object(bucket_name, object_name, f, -1, **kwargs)
+
+    def stat_object(self, bucket_name: str, object_name: str, request_headers: dict | None = None, **kwargs) -> FakeObjectStat:
+        return self._stat(bucket_name, object_name, request_headers)
+
+    def get_object(self, bucket_name: str, object_name: str, offset: int = 0, length: int = 0, request_headers: dict | None = None, **kwargs) -> FakeResponse:
+
+        self._stat(bucket_name, object_name, request_headers)
+        data = self._read(bucket_name, object_name)
+
+        return FakeResponse(data[offset:offset + length] if length else data[offset:])
+
+    def fget_object(self, bucket_name: str, object_name: str, file_path: str, request_headers: dict | None = None, **kwargs) -> FakeObjectStat:
+
+        stat = self._stat(bucket_name, object_name, request_headers)
+        shutil.copyfile(self._path(bucket_name, object_name), file_path)
+
+        return stat
+
+    def copy_object(self, bucket_name: str, object_name: str, source, metadata: dict | None = None, metadata_directive: str | None = None, **kwargs):
+
+        stat = self._stat(source.bucket_name, source.object_name)
+        data = self._read(source.bucket_name, source.object_name)
+
+        return self._store(bucket_name, object_name, [data], metadata if metadata_directive == "REPLACE" or metadata else stat.metadata)
+
+    def compose_object(self, bucket_name: str, object_name: str, sources: list, metadata: dict | None = None, **kwargs):
+
+        for source in sources:
+            self._stat(source.bucket_name, source.object_name)
+
+        return self._store(bucket_name, object_name, (self._read(source.bucket_name, source.object_name) for source in sources), metadata)
+
+    def list_objects(self, bucket_name: str, prefix: str | None = None, recursive: bool = False, **kwargs):
+
+        with self._lock:
+            stats = [stat for (bucket, name), stat in self._stats.items() if bucket == bucket_name and name.startswith(prefix or "")]
+
+        return iter(sorted(stats, key = lambda stat: stat.object_name))
+
+    def remove_object(self, bucket_name: str, object_name: str, **kwargs) -> None:
+
+        with self._lock:
+            stat = self._stats.pop((bucket_name, object_name), None)
+
+        if stat is not None:
+            os.remove(self._path(bucket_name, object_name))
+
+    def remove_objects(self, bucket_name: str, delete_object_list, **kwargs):
+
+        for delete_object in delete_object_list:
+            self.remove_object(bucket_name, delete_object.name)
+
+        return iter([])
+
+# Replace minio.Minio with the fake, storing objects under root (a new temporary directory by default)
+def install(root: str | None = None) -> str:
+
+    FakeMinio.root = root or tempfile.mkdtemp(prefix = "fake_s3_")
+    minio.Minio = FakeMinio
+
+    return FakeMinio.root
@@ -0,0 +1,112 @@
+"""
+Memory and latency of reading and joining two wide, low-cardinality files with and without frame
+compaction (FRAME_COMPACTION_ENABLED): Arrow-backed strings, categoricals and lossless numeric downcasting.
+
+Each mode downloads both files through download_from_minio and joins them with merge_frames, from the
+uploaded CSV and from its Parquet copy, in its own child process so ru_maxrss reflects that mode only.
+Objects go to the in-process fake in benchmarks.fake_s3, so no MinIO is needed. Run from the
+Final_Assignment folder:
+
+    python -m benchmarks.frame_compaction --rows 200000 --width 40
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.merge_pushdown import generate_files
+
+CHILD_FLAG = "--child"
+GENERATE_FLAG = "--generate"
+
+def run_child(compaction: bool, source: str, workdir: str, repeats: int) -> None:
+
+    os.environ["FRAME_CACHE_MAX_BYTES"] = "0"
+    os.environ["FRAME_COMPACTION_ENABLED"] = str(compaction).lower()
+    for name, value in (("MINIO_ENDPOINT", "fake:9000"), ("MINIO_ACCESS_KEY", "fake"), ("MINIO_SECRET_KEY", "fake"), ("MINIO_BUCKET", "bench")):
+        os.environ.setdefault(name, value)
+
+    from benchmarks import fake_s3
+    fake_s3.install(os.path.join(workdir, "s3"))
+
+    from compaction import frame_memory_bytes
+    from config import settings
+    from merge_pipeline import merge_frames
+    from metrics import peak_rss_bytes
+    from minio_client import download_from_minio, minio_client, parquet_object_name
+
+    parquet_objects = {}
+    for side in ("left", "right"):
+        minio_client.fput_object(settings.MINIO_BUCKET, f"{side}.csv", os.path.join(workdir, f"{side}.csv"))
+        if source == "parquet":
+            parquet_objects[side] = parquet_object_name(f"{side}.csv")
+            minio_client.fput_object(settings.MINIO_BUCKET, parquet_objects[side], os.path.join(workdir, f"{side}.parquet"))
+
+    baseline_rss = peak_rss_bytes()
+    seconds = []
+
+    for _ in range(repeats):
+        start = time.perf_counter()
+        left = download_from_minio("left.csv", parquet_objects.get("left"))
+        right = download_from_minio("right.csv", parquet_objects.get("right"))
+        input_bytes = frame_memory_bytes(left) + frame_memory_bytes(right)
+        merged = merge_frames(left, right, "id", "inner")
+        seconds.append(time.perf_counter() - start)
+        del left, right
+
+    peak_rss = peak_rss_bytes()
+
+    print(json.dumps({
+        "compaction": compaction,
+        "source": source,
+        "seconds_median": round(statistics.median(seconds), 4),
+        "seconds_min": round(min(seconds), 4),
+        "input_frame_bytes": input_bytes,
+        "merged_frame_bytes": frame_memory_bytes(merged),
+        "rows_out": len(merged),
+        "baseline_rss_bytes": baseline_rss,
+        "peak_rss_bytes": peak_rss,
+        "peak_rss_growth_bytes": peak_rss - baseline_rss if baseline_rss is not None else None
+    }))
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description = "Measure merge memory and latency with and without frame compaction.")
+    parser.add_argument("--rows", type = int, default = 200000)
+    parser.add_argument("--width", type = int, default = 40, help = "Columns per file.")
+    parser.add_argument("--sources", nargs = "+", choices = ["csv", "parquet"], default = ["csv", "parquet"])
+    parser.add_argument("--repeats", type = int, default = 3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix = "frame_compaction_")
+    results = []
+
+    try:
+        # Inputs are written by a child of their own, so the parent's peak stays out of every mode's baseline
+        subprocess.run([sys.executable, "-m", "benchmarks.frame_compaction", GENERATE_FLAG, str(args.rows), str(args.width), workdir], check = True)
+
+        for source in args.sources:
+            for compaction in ("false", "true"):
+                output = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.frame_compaction", CHILD_FLAG, compaction, source, workdir, str(args.repeats)],
+                    check = True,
+                    capture_output = True,
+                    text = True
+                ).stdout
+                results.append(json.loads(output.strip().splitlines()[-1]))
+    finally:
+        shutil.rmtree(workdir, ignore_errors = True)
+
+    print(json.dumps(results, indent = 2))
+
+if __name__ == "__main__":
+    if len(sys.argv) == 6 and sys.argv[1] == CHILD_FLAG:
+        run_child(sys.argv[2] == "true", sys.argv[3], sys.argv[4], int(sys.argv[5]))
+    elif len(sys.argv) == 5 and sys.argv[1] == GENERATE_FLAG:
+        generate_files(int(sys.argv[2]), int(sys.argv[3]), sys.argv[4])
+    else:
+        main()
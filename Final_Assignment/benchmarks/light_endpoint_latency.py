@@ -0,0 +1,87 @@
+"""
+Latency of a light endpoint (GET /api/v1/files) while heavy merges run on the same worker.
+
+Start the API first (uvicorn main:app) and upload two large files, then run from the Final_Assignment folder:
+
+    python -m benchmarks.light_endpoint_latency --file-id-1 1 --file-id-2 2 --common-column id --heavy 4
+
+The light endpoint is measured once alone and once with --heavy concurrent merges in flight;
+with the merge pipeline on executors both p99 values should stay close.
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+def timed_get(url: str) -> float:
+
+    start = time.perf_counter()
+    with urllib.request.urlopen(url, timeout = 600) as response:
+        response.read()
+    return time.perf_counter() - start
+
+def percentile(samples: list[float], fraction: float) -> float:
+
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def measure_light(base_url: str, requests: int) -> dict:
+
+    samples = [timed_get(f"{base_url}/api/v1/files") for _ in range(requests)]
+
+    return {
+        "requests": requests,
+        "p50_ms": round(statistics.median(samples) * 1000, 2),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 2),
+        "max_ms": round(max(samples) * 1000, 2)
+    }
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description = "Measure light endpoint latency under heavy merge load.")
+    parser.add_argument("--base-url", default = "http://127.0.0.1:8000")
+    parser.add_argument("--file-id-1", type = int, required = True)
+    parser.add_argument("--file-id-2", type = int, required = True)
+    parser.add_argument("--common-column", default = "id")
+    parser.add_argument("--join-type", default = "inner")
+    parser.add_argument("--heavy", type = int, default = 4, help = "Concurrent merge requests kept in flight")
+    parser.add_argument("--requests", type = int, default = 200)
+    args = parser.parse_args()
+
+    merge_url = f"{args.base_url}/api/v1/files/merge?" + urllib.parse.urlencode({
+        "file_id_1": args.file_id_1,
+        "file_id_2": args.file_id_2,
+        "common_column": args.common_column,
+        "join_type": args.join_type
+    })
+
+    idle = measure_light(args.base_url, args.requests)
+
+    stop = threading.Event()
+    merge_samples = []
+
+    def keep_merging() -> None:
+        while not stop.is_set():
+            merge_samples.append(timed_get(merge_url))
+
+    with ThreadPoolExecutor(max_workers = args.heavy) as pool:
+        for _ in range(args.heavy):
+            pool.submit(keep_merging)
+
+        time.sleep(1)
+        loaded = measure_light(args.base_url, args.requests)
+        stop.set()
+
+    print(json.dumps({
+        "light_idle": idle,
+        "light_under_merge_load": loaded,
+        "merges_completed": len(merge_samples),
+        "merge_p50_s": round(statistics.median(merge_samples), 3) if merge_samples else None
+    }, indent = 2))
+
+if __name__ == "__main__":
+    main()
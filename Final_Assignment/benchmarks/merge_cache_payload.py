@@ -0,0 +1,75 @@
+"""
+Compare the old JSON records cache payload with the Arrow IPC payload used by merge_cache.
+
+Measures encode + decode time, payload size and traced peak memory for each path.
+Run from the Final_Assignment folder:
+
+    python -m benchmarks.merge_cache_payload --rows 100000 1000000
+"""
+import argparse
+import io
+import json
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from merge_cache import dataframe_to_ipc, dataframe_from_ipc
+
+def make_frame(rows: int) -> pd.DataFrame:
+
+    rng = np.random.default_rng(42)
+    return pd.DataFrame({
+        "id": np.arange(rows),
+        "firstname": rng.choice(["Asha", "Ravi", "Meera", "Arjun", "Kiran"], rows),
+        "city": rng.choice(["Mumbai", "Chennai", "Kolkata", "New Delhi"], rows),
+        "age": rng.integers(18, 70, rows),
+        "salary": rng.normal(60000, 15000, rows).round(2),
+        "joined": pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 2000, rows), unit = "D")
+    })
+
+def json_path(df: pd.DataFrame) -> tuple[int, pd.DataFrame]:
+
+    cached = json.dumps({"df": df.to_json(orient = "records")})
+    restored = pd.read_json(io.StringIO(json.loads(cached)["df"]), orient = "records")
+    return len(cached.encode()), restored
+
+def ipc_path(df: pd.DataFrame) -> tuple[int, pd.DataFrame]:
+
+    payload = dataframe_to_ipc(df)
+    restored = dataframe_from_ipc(payload)
+    return len(payload), restored
+
+def measure(name: str, path, df: pd.DataFrame) -> dict:
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    payload_bytes, restored = path(df)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "path": name,
+        "rows": len(df),
+        "seconds": round(elapsed, 3),
+        "payload_bytes": payload_bytes,
+        "traced_peak_bytes": peak,
+        "dtypes_preserved": restored.dtypes.equals(df.dtypes)
+    }
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description = "Compare JSON and Arrow IPC merge cache payloads.")
+    parser.add_argument("--rows", nargs = "+", type = int, default = [10000, 100000, 1000000])
+    args = parser.parse_args()
+
+    results = []
+    for rows in args.rows:
+        df = make_frame(rows)
+        results.append(measure("json", json_path, df))
+        results.append(measure("arrow-ipc", ipc_path, df))
+
+    print(json.dumps(results, indent = 2))
+
+if __name__ == "__main__":
+    main()
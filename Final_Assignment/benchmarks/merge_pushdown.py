@@ -0,0 +1,140 @@
+"""
+Latency and peak memory of reading and joining two wide files with and without column projection
+(columns_1 / columns_2) and row filters (filters_1 / filters_2) pushed into the read path.
+
+Each case downloads both files through download_from_minio and joins them with merge_frames, from the
+uploaded CSV and from its Parquet copy, in its own child process so ru_maxrss reflects that case only.
+Objects go to the in-process fake in benchmarks.fake_s3, so no MinIO is needed. Run from the
+Final_Assignment folder:
+
+    python -m benchmarks.merge_pushdown --rows 100000 --width 60
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+CHILD_FLAG = "--child"
+GENERATE_FLAG = "--generate"
+
+REGIONS = [f"region_{number}" for number in range(10)]
+
+# Both sides keep the key plus three columns and the rows of one region in ten
+CASES = {
+    "full": {"columns": None, "filters": None},
+    "projected": {"columns": ["metric_0", "metric_1", "label_0"], "filters": None},
+    "filtered": {"columns": None, "filters": ["region:eq:region_0"]},
+    "projected_filtered": {"columns": ["metric_0", "metric_1", "label_0"], "filters": ["region:eq:region_0"]}
+}
+
+def make_frame(rows: int, width: int, seed: int) -> pd.DataFrame:
+
+    rng = np.random.default_rng(seed)
+    columns = {"id": rng.permutation(rows), "region": rng.choice(REGIONS, rows)}
+
+    for number in range(width // 2):
+        columns[f"metric_{number}"] = rng.random(rows).round(4)
+    for number in range(width - width // 2 - 2):
+        columns[f"label_{number}"] = rng.choice(["alpha", "beta", "gamma", "delta"], rows)
+
+    return pd.DataFrame(columns)
+
+def generate_files(rows: int, width: int, workdir: str) -> None:
+
+    for side, seed in (("left", 1), ("right", 2)):
+        df = make_frame(rows, width, seed)
+        df.to_csv(os.path.join(workdir, f"{side}.csv"), index = False)
+        df.to_parquet(os.path.join(workdir, f"{side}.parquet"), index = False)
+
+def run_child(case: str, source: str, workdir: str, repeats: int) -> None:
+
+    os.environ["FRAME_CACHE_MAX_BYTES"] = "0"
+    for name, value in (("MINIO_ENDPOINT", "fake:9000"), ("MINIO_ACCESS_KEY", "fake"), ("MINIO_SECRET_KEY", "fake"), ("MINIO_BUCKET", "bench")):
+        os.environ.setdefault(name, value)
+
+    from benchmarks import fake_s3
+    fake_s3.install(os.path.join(workdir, "s3"))
+
+    from config import settings
+    from merge_pipeline import merge_frames
+    from metrics import peak_rss_bytes
+    from minio_client import download_from_minio, minio_client, parquet_object_name
+    from pushdown import build_pushdown
+
+    parquet_objects = {}
+    for side in ("left", "right"):
+        minio_client.fput_object(settings.MINIO_BUCKET, f"{side}.csv", os.path.join(workdir, f"{side}.csv"))
+        if source == "parquet":
+            parquet_objects[side] = parquet_object_name(f"{side}.csv")
+            minio_client.fput_object(settings.MINIO_BUCKET, parquet_objects[side], os.path.join(workdir, f"{side}.parquet"))
+
+    pushdown = build_pushdown(CASES[case]["columns"], CASES[case]["filters"], "id")
+    baseline_rss = peak_rss_bytes()
+    seconds = []
+
+    for _ in range(repeats):
+        start = time.perf_counter()
+        left = download_from_minio("left.csv", parquet_objects.get("left"), **pushdown)
+        right = download_from_minio("right.csv", parquet_objects.get("right"), **pushdown)
+        merged = merge_frames(left, right, "id", "inner")
+        seconds.append(time.perf_counter() - start)
+
+    peak_rss = peak_rss_bytes()
+
+    print(json.dumps({
+        "case": case,
+        "source": source,
+        "seconds_median": round(statistics.median(seconds), 4),
+        "seconds_min": round(min(seconds), 4),
+        "rows_out": len(merged),
+        "columns_out": len(merged.columns),
+        "baseline_rss_bytes": baseline_rss,
+        "peak_rss_bytes": peak_rss,
+        "peak_rss_growth_bytes": peak_rss - baseline_rss if baseline_rss is not None else None
+    }))
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description = "Measure merge latency and memory with and without projection and filter pushdown.")
+    parser.add_argument("--rows", type = int, default = 100000)
+    parser.add_argument("--width", type = int, default = 60, help = "Columns per file.")
+    parser.add_argument("--sources", nargs = "+", choices = ["csv", "parquet"], default = ["csv", "parquet"])
+    parser.add_argument("--repeats", type = int, default = 3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix = "merge_pushdown_")
+    results = []
+
+    try:
+        # Linux carries ru_maxrss over fork and exec, so the inputs are written by a child of their own
+        # to keep the parent's peak out of every case's baseline
+        subprocess.run([sys.executable, "-m", "benchmarks.merge_pushdown", GENERATE_FLAG, str(args.rows), str(args.width), workdir], check = True)
+
+        for source in args.sources:
+            for case in CASES:
+                output = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.merge_pushdown", CHILD_FLAG, case, source, workdir, str(args.repeats)],
+                    check = True,
+                    capture_output = True,
+                    text = True
+                ).stdout
+                results.append(json.loads(output.strip().splitlines()[-1]))
+    finally:
+        shutil.rmtree(workdir, ignore_errors = True)
+
+    print(json.dumps(results, indent = 2))
+
+if __name__ == "__main__":
+    if len(sys.argv) == 6 and sys.argv[1] == CHILD_FLAG:
+        run_child(sys.argv[2], sys.argv[3], sys.argv[4], int(sys.argv[5]))
+    elif len(sys.argv) == 5 and sys.argv[1] == GENERATE_FLAG:
+        generate_files(int(sys.argv[2]), int(sys.argv[3]), sys.argv[4])
+    else:
+        main()
@@ -0,0 +1,86 @@
+"""
+Peak RSS of upload_to_minio for growing file sizes.
+
+Each size runs in its own child process so ru_maxrss reflects that upload only.
+Run from the Final_Assignment folder with MinIO up and the usual .env in place:
+
+    python -m benchmarks.upload_memory --sizes-mb 64 256 1024
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+CHILD_FLAG = "--child"
+
+def generate_csv(path: str, size_bytes: int) -> None:
+
+    row = "1,alpha,beta,gamma,12345.678,2025-01-01\n"
+    block = "id,a,b,c,amount,date\n" + row * (1024 * 1024 // len(row))
+
+    with open(path, "w") as f:
+        written = 0
+        while written < size_bytes:
+            f.write(block)
+            written += len(block)
+
+def run_child(size_mb: int) -> None:
+
+    from fastapi import UploadFile
+    from minio_client import ensure_bucket, minio_client, upload_to_minio
+    from config import settings
+
+    ensure_bucket()
+
+    object_name = f"bench_upload_{size_mb}mb.csv"
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, object_name)
+        generate_csv(path, size_mb * 1024 * 1024)
+        baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        with open(path, "rb") as f:
+            start = time.perf_counter()
+            file_size, checksum, _ = upload_to_minio(UploadFile(file = f, filename = object_name), object_name)
+            elapsed = time.perf_counter() - start
+
+    minio_client.remove_object(settings.MINIO_BUCKET, object_name)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    print(json.dumps({
+        "size_mb": size_mb,
+        "bytes": file_size,
+        "checksum": checksum,
+        "seconds": round(elapsed, 3),
+        "baseline_rss_kb": baseline_rss,
+        "peak_rss_kb": peak_rss,
+        "upload_rss_delta_kb": peak_rss - baseline_rss
+    }))
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description = "Measure upload peak RSS for growing file sizes.")
+    parser.add_argument("--sizes-mb", nargs = "+", type = int, default = [16, 64, 256, 1024])
+    args = parser.parse_args()
+
+    results = []
+    for size_mb in args.sizes_mb:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.upload_memory", CHILD_FLAG, str(size_mb)],
+            check = True,
+            capture_output = True,
+            text = True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(json.dumps(results, indent = 2))
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == CHILD_FLAG:
+        run_child(int(sys.argv[2]))
+    else:
+        main()
@@ -0,0 +1,140 @@
+"""
+Compare pandas' xlsx reading and writing (pd.read_excel / DataFrame.to_excel) with the streaming
+paths in xlsx_io, across sheet sizes.
+
+Every run first checks parity: workbooks written by write_xlsx must read back exactly like the ones
+written by to_excel, and read_xlsx / read_xlsx_chunks must return what pd.read_excel returns, for
+each installed engine. The script exits non-zero on the first mismatch. Timings follow, with the
+same data as CSV for reference; --memory adds traced peak memory (slower, tracemalloc hooks every
+allocation). Run from the Final_Assignment folder:
+
+    python -m benchmarks.xlsx_read_write --rows 1000 10000 100000
+"""
+import argparse
+import importlib.util
+import io
+import json
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from xlsx_io import XLSX_ENGINES, read_xlsx, read_xlsx_chunks, write_xlsx
+
+CHUNK_ROWS = 10000
+
+def make_frame(rows: int) -> pd.DataFrame:
+
+    rng = np.random.default_rng(42)
+    df = pd.DataFrame({
+        "id": np.arange(rows),
+        "firstname": rng.choice(["Asha", "Ravi", "Meera", "Arjun", "Kiran"], rows),
+        "city": rng.choice(["Mumbai", "Chennai", "Kolkata", "New Delhi", None], rows),
+        "age": rng.integers(18, 70, rows),
+        "salary": rng.normal(60000, 15000, rows).round(2),
+        "bonus": np.where(rng.random(rows) < 0.2, np.nan, rng.integers(0, 5000, rows)),
+        "joined": pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 2000, rows), unit = "D"),
+        "active": rng.random(rows) < 0.5,
+        "code": rng.choice(["007", "42", "A-1"], rows)
+    })
+    return df
+
+def installed_engines() -> list[str]:
+    return [engine for engine in XLSX_ENGINES if engine != "calamine" or importlib.util.find_spec("python_calamine") is not None]
+
+def write_pandas(df: pd.DataFrame) -> io.BytesIO:
+
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index = False)
+    return buffer
+
+def write_streaming(df: pd.DataFrame) -> io.BytesIO:
+
+    buffer = io.BytesIO()
+    write_xlsx((df.iloc[start:start + CHUNK_ROWS] for start in range(0, max(len(df), 1), CHUNK_ROWS)), buffer)
+    return buffer
+
+def write_csv(df: pd.DataFrame) -> io.BytesIO:
+
+    buffer = io.BytesIO()
+    df.to_csv(buffer, index = False)
+    return buffer
+
+def read_chunked(buffer: io.BytesIO, engine: str) -> pd.DataFrame:
+    return pd.concat(read_xlsx_chunks(buffer, CHUNK_ROWS, engine), ignore_index = True)
+
+def check_parity(df: pd.DataFrame) -> None:
+
+    pandas_book = write_pandas(df)
+    streaming_book = write_streaming(df)
+
+    pandas_book.seek(0)
+    expected = pd.read_excel(pandas_book)
+
+    streaming_book.seek(0)
+    pd.testing.assert_frame_equal(pd.read_excel(streaming_book), expected)
+
+    for engine in installed_engines():
+        for book in (pandas_book, streaming_book):
+            book.seek(0)
+            pd.testing.assert_frame_equal(read_xlsx(book, engine), expected)
+
+            # Chunks infer dtypes on their own, so only the values have to agree once concatenated
+            book.seek(0)
+            pd.testing.assert_frame_equal(read_chunked(book, engine), expected, check_dtype = False)
+
+def measure(name: str, rows: int, operation, argument, trace_memory: bool) -> dict:
+
+    if hasattr(argument, "seek"):
+        argument.seek(0)
+
+    if trace_memory:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    operation(argument)
+    elapsed = time.perf_counter() - start
+
+    result = {"path": name, "rows": rows, "seconds": round(elapsed, 3)}
+
+    if trace_memory:
+        result["traced_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return result
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser(description = "Compare pandas and streaming xlsx reading and writing.")
+    parser.add_argument("--rows", nargs = "+", type = int, default = [1000, 10000, 100000])
+    parser.add_argument("--memory", action = "store_true", help = "Also report traced peak memory.")
+    args = parser.parse_args()
+
+    results = []
+
+    for rows in args.rows:
+        df = make_frame(rows)
+
+        try:
+            check_parity(df.head(min(rows, 2 * CHUNK_ROWS + 1)))
+        except AssertionError as e:
+            print(f"Parity check failed for {rows} rows: {e}")
+            sys.exit(1)
+
+        results.append(measure("write to_excel", rows, write_pandas, df, args.memory))
+        results.append(measure("write write_xlsx", rows, write_streaming, df, args.memory))
+        results.append(measure("write to_csv", rows, write_csv, df, args.memory))
+
+        book = write_streaming(df)
+        csv_file = write_csv(df)
+
+        results.append(measure("read read_excel", rows, pd.read_excel, book, args.memory))
+        for engine in installed_engines():
+            results.append(measure(f"read read_xlsx ({engine})", rows, lambda buffer: read_xlsx(buffer, engine), book, args.memory))
+            results.append(measure(f"read read_xlsx_chunks ({engine})", rows, lambda buffer: read_chunked(buffer, engine), book, args.memory))
+        results.append(measure("read read_csv", rows, pd.read_csv, csv_file, args.memory))
+
+    print(json.dumps(results, indent = 2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+from config import settings
+from metrics import FRAME_MEMORY, track
+import numpy as np
+import pandas as pd
+
+# Compact in-memory representation of parsed frames: text columns become Arrow-backed strings, or
+# categoricals when few of their values are distinct, and numeric columns are downcast to the smallest
+# type that holds every value exactly. Join keys are brought to one dtype on both sides before a merge,
+# so pd.merge neither upcasts them nor falls back to object keys.
+
+STRING_DTYPE = pd.StringDtype("pyarrow")
+
+def frame_memory_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index = True, deep = True).sum())
+
+def _compact_column(values: pd.Series) -> pd.Series:
+
+    dtype = values.dtype
+
+    if dtype == STRING_DTYPE:
+        return _compact_text(values, values)
+
+    if pd.api.types.is_bool_dtype(dtype) or not isinstance(dtype, np.dtype):
+        return values
+
+    if dtype.kind in "iu":
+        return pd.to_numeric(values, downcast = "integer" if dtype.kind == "i" else "unsigned")
+
+    if dtype == np.float64:
+        # Only when every value survives the round trip, so merged outputs print the same numbers
+        narrowed = values.astype(np.float32)
+        if ((narrowed.astype(np.float64) == values) | values.isna()).all():
+            return narrowed
+        return values
+
+    if dtype == object and pd.api.types.infer_dtype(values, skipna = True) == "string":
+        return _compact_text(values, values.astype(STRING_DTYPE))
+
+    return values
+
+# Low-cardinality text becomes a categorical, the rest stays as (or becomes) Arrow-backed strings
+def _compact_text(values: pd.Series, strings: pd.Series) -> pd.Series:
+
+    if strings.nunique(dropna = True) <= settings.FRAME_COMPACTION_CATEGORY_RATIO * len(values):
+        return values.astype("category")
+
+    return strings
+
+# Compact every column of a parsed frame; name only labels the log line
+def compact_frame(df: pd.DataFrame, name: str) -> pd.DataFrame:
+
+    with track("compact") as sample:
+        before = frame_memory_bytes(df)
+        df = df.copy(deep = False)
+
+        for position in range(df.shape[1]):
+            df.isetitem(position, _compact_column(df.iloc[:, position]))
+
+        after = frame_memory_bytes(df)
+        sample.update({"bytes": after, "rows_in": len(df)})
+
+    FRAME_MEMORY.labels("before").observe(before)
+    FRAME_MEMORY.labels("after").observe(after)
+    print(f"Compacted {name} from {before / 1024 / 1024:.1f} MiB to {after / 1024 / 1024:.1f} MiB.")
+
+    return df
+
+def _key_values(values: pd.Series) -> pd.Series:
+
+    # Categories differ between files, so categorical keys are joined on their values
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.astype(values.cat.categories.dtype)
+
+    return values
+
+# Common dtype of two join key columns, or None when pd.merge should keep deciding (e.g. text against numbers)
+def _common_key_dtype(left: pd.Series, right: pd.Series):
+
+    if pd.api.types.is_bool_dtype(left.dtype) or pd.api.types.is_bool_dtype(right.dtype):
+        return None
+    if pd.api.types.is_integer_dtype(left.dtype) and pd.api.types.is_integer_dtype(right.dtype):
+        common = np.promote_types(left.dtype, right.dtype)
+        return common if common.kind in "iu" else np.dtype(np.float64)
+    if pd.api.types.is_numeric_dtype(left.dtype) and pd.api.types.is_numeric_dtype(right.dtype):
+        return np.dtype(np.float64)
+    if all(pd.api.types.infer_dtype(values, skipna = True) in ("string", "empty") for values in (left, right)):
+        return STRING_DTYPE
+
+    return None
+
+# Give the join column of both frames the same dtype; frames that already match are returned as they are
+def align_key_dtypes(left: pd.DataFrame, right: pd.DataFrame, column: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+
+    if left[column].dtype == right[column].dtype:
+        return left, right
+
+    left_keys = _key_values(left[column])
+    right_keys = _key_values(right[column])
+    dtype = _common_key_dtype(left_keys, right_keys)
+
+    aligned = []
+    for df, keys in ((left, left_keys), (right, right_keys)):
+        df = df.copy(deep = False)
+        df[column] = keys.astype(dtype) if dtype is not None else keys
+        aligned.append(df)
+
+    return aligned[0], aligned[1]
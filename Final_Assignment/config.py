@@ -1,19 +1,88 @@
-from pydantic_settings import BaseSettings
-
-class Settings(BaseSettings):
-
-    POSTGRES_USER: str
-    POSTGRES_PASSWORD: str
-    POSTGRES_DB: str
-    POSTGRES_HOST: str
-
-    MINIO_ENDPOINT: str
-    MINIO_ACCESS_KEY: str
-    MINIO_SECRET_KEY: str
-    MINIO_BUCKET: str
-
-    class Config:
-        env_file = ".env"
-
-settings = Settings()
-
+from pydantic_settings import BaseSettings
+import os
+
+class Settings(BaseSettings):
+
+    POSTGRES_USER: str = ""
+    POSTGRES_PASSWORD: str = ""
+    POSTGRES_DB: str = ""
+    POSTGRES_HOST: str = ""
+
+    # Full SQLAlchemy URL, e.g. sqlite:///bench.db; the POSTGRES_* settings are used when it is not set
+    DATABASE_URL: str | None = None
+
+    # Connection pool of each engine (ignored for SQLite); recycle is in seconds
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
+    # Async endpoints use an AsyncSession (asyncpg, or aiosqlite for SQLite) instead of running the sync session
+    # on the I/O pool; ASYNC_DATABASE_URL defaults to the database URL with the async driver
+    DB_ASYNC_ENABLED: bool = False
+    ASYNC_DATABASE_URL: str | None = None
+
+    MINIO_ENDPOINT: str
+    MINIO_ACCESS_KEY: str
+    MINIO_SECRET_KEY: str
+    MINIO_BUCKET: str
+    MINIO_PART_SIZE: int = 10 * 1024 * 1024
+    MINIO_PARALLEL_UPLOADS: int = 3
+
+    BATCH_UPLOAD_MAX_FILES: int = 500
+    BATCH_UPLOAD_CONCURRENCY: int = 8
+
+    FILES_PAGE_DEFAULT_LIMIT: int = 100
+    FILES_PAGE_MAX_LIMIT: int = 1000
+
+    KEY_INDEX_COLUMNS: list[str] = ["id"]
+    KEY_INDEX_BLOOM_FPP: float = 0.01
+
+    MERGE_CACHE_TTL: int = 300
+
+    # "disk" shares merge results between all workers on the host through files in CACHE_DIR (a temporary
+    # directory by default), evicting least recently used entries past CACHE_MAX_BYTES; "memory" keeps them per process.
+    # Each worker tracks the directory size from its own writes and lists the directory again every CACHE_SCAN_SECONDS
+    # to count the other workers' entries
+    CACHE_BACKEND: str = "disk"
+    CACHE_DIR: str | None = None
+    CACHE_MAX_BYTES: int = 4 * 1024 * 1024 * 1024
+    CACHE_SCAN_SECONDS: float = 30.0
+    FRAME_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+
+    # Shrink parsed merge inputs before they are cached and joined: text columns become Arrow-backed strings, or
+    # categoricals when at most FRAME_COMPACTION_CATEGORY_RATIO of their values are distinct, and numbers are downcast losslessly
+    FRAME_COMPACTION_ENABLED: bool = False
+    FRAME_COMPACTION_CATEGORY_RATIO: float = 0.5
+
+    MERGE_MEMORY_LIMIT_BYTES: int = 1024 * 1024 * 1024
+    MERGE_CHUNK_ROWS: int = 100_000
+    MERGE_SPILL_DIR: str | None = None
+    MERGE_CHAIN_MAX_FILES: int = 10
+
+    # Write merge results of at least MERGE_STAGING_MIN_BYTES (size of the cached Arrow payload) in their output format to a staging
+    # object right after the merge, so saving them is a server-side copy; smaller results are serialized when they are saved
+    MERGE_STAGING_ENABLED: bool = True
+    MERGE_STAGING_MIN_BYTES: int = 64 * 1024 * 1024
+
+    SERVER_TIMING_ENABLED: bool = False
+
+    # The MinIO bucket check and table creation run in the background once a worker starts; API requests that arrive
+    # before they finish wait up to STARTUP_REQUEST_WAIT_SECONDS (then get 503), and failed checks are retried every STARTUP_RETRY_SECONDS
+    STARTUP_REQUEST_WAIT_SECONDS: float = 30.0
+    STARTUP_RETRY_SECONDS: float = 2.0
+
+    IO_EXECUTOR_WORKERS: int = 16
+    CPU_EXECUTOR_WORKERS: int = max(1, (os.cpu_count() or 2) // 2)
+
+    MERGE_JOB_WORKERS: int = 2
+    MERGE_JOB_MEMORY_LIMIT_BYTES: int = 4 * 1024 * 1024 * 1024
+    MERGE_JOB_MAX_PENDING: int = 32
+    MERGE_JOB_RETENTION: int = 3600
+
+    class Config:
+        env_file = ".env"
+
+settings = Settings()
+
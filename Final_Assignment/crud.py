@@ -1,23 +1,285 @@
-from sqlalchemy.orm import Session
-from models import FileMetadata
-
-def create_file_record(db: Session, file_name: str, file_format: str) -> FileMetadata:
-
-    db_file = FileMetadata(file_name = file_name, file_format = file_format)
-
-    db.add(db_file)
-    db.commit()
-    db.refresh(db_file)
-    
-    return db_file
-
-def get_all_file_records(db: Session) -> list[FileMetadata]:
-
-    all_files = db.query(FileMetadata).all()
-    return all_files
-
-def get_file_record(db: Session, file_id: int) -> FileMetadata | None:
-
-    file = db.query(FileMetadata).filter(FileMetadata.id == file_id).first()
-    return file
-
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Query, Session
+from models import FileDelta, FileMetadata, FileSchema, MergeLineage
+
+def create_file_record(
+    db: Session,
+    file_name: str,
+    file_format: str,
+    file_size: int | None = None,
+    checksum: str | None = None,
+    parquet_object: str | None = None,
+    profile: dict | None = None,
+    lineage: dict | None = None
+) -> FileMetadata:
+
+    db_file = FileMetadata(
+        file_name = file_name,
+        file_format = file_format,
+        file_size = file_size,
+        checksum = checksum,
+        parquet_object = parquet_object
+    )
+
+    db.add(db_file)
+
+    # The column catalog (and the lineage of a saved merge result) is written in the same transaction as the file record
+    if profile is not None or lineage is not None:
+        db.flush()
+    if profile is not None:
+        db.add(FileSchema(file_id = db_file.id, **profile))
+    if lineage is not None:
+        db.add(MergeLineage(file_id = db_file.id, **lineage))
+
+    db.commit()
+    db.refresh(db_file)
+    
+    return db_file
+
+# Async counterpart of create_file_record, for sessions from AsyncSessionLocal
+async def create_file_record_async(
+    db: AsyncSession,
+    file_name: str,
+    file_format: str,
+    file_size: int | None = None,
+    checksum: str | None = None,
+    parquet_object: str | None = None,
+    profile: dict | None = None,
+    lineage: dict | None = None
+) -> FileMetadata:
+
+    db_file = FileMetadata(
+        file_name = file_name,
+        file_format = file_format,
+        file_size = file_size,
+        checksum = checksum,
+        parquet_object = parquet_object
+    )
+
+    db.add(db_file)
+
+    if profile is not None or lineage is not None:
+        await db.flush()
+    if profile is not None:
+        db.add(FileSchema(file_id = db_file.id, **profile))
+    if lineage is not None:
+        db.add(MergeLineage(file_id = db_file.id, **lineage))
+
+    await db.commit()
+    await db.refresh(db_file)
+
+    return db_file
+
+# Insert many records with one multi-row INSERT ... RETURNING and a single commit
+def create_file_records(db: Session, records: list[dict]) -> list[FileMetadata]:
+
+    if not records:
+        return []
+
+    records = [dict(record) for record in records]
+    profiles = [record.pop("profile", None) for record in records]
+
+    try:
+        db_files = list(db.scalars(insert(FileMetadata).returning(FileMetadata, sort_by_parameter_order = True), records))
+
+        schema_rows = [dict(profile, file_id = db_file.id) for db_file, profile in zip(db_files, profiles) if profile is not None]
+        if schema_rows:
+            db.execute(insert(FileSchema), schema_rows)
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return db_files
+
+def get_all_file_records(db: Session) -> list[FileMetadata]:
+
+    all_files = db.query(FileMetadata).all()
+    return all_files
+
+async def get_all_file_records_async(db: AsyncSession) -> list[FileMetadata]:
+
+    all_files = await db.scalars(select(FileMetadata))
+    return list(all_files)
+
+def _filtered_file_records(db: Session, file_format: str | None, file_name_prefix: str | None) -> Query:
+
+    query = db.query(FileMetadata)
+
+    if file_format:
+        query = query.filter(FileMetadata.file_format == file_format)
+    if file_name_prefix:
+        query = query.filter(FileMetadata.file_name.startswith(file_name_prefix, autoescape = True))
+
+    return query
+
+# One keyset page ordered by id; fetches one extra row to know whether another page follows
+def get_file_records_page(
+    db: Session,
+    after_id: int | None,
+    limit: int,
+    file_format: str | None = None,
+    file_name_prefix: str | None = None
+) -> tuple[list[FileMetadata], int | None]:
+
+    query = _filtered_file_records(db, file_format, file_name_prefix)
+
+    if after_id is not None:
+        query = query.filter(FileMetadata.id > after_id)
+
+    files = query.order_by(FileMetadata.id).limit(limit + 1).all()
+
+    if len(files) > limit:
+        files = files[:limit]
+        return files, files[-1].id
+
+    return files, None
+
+# Row count from planner statistics on PostgreSQL (no table scan); exact count on other databases
+def estimate_file_record_count(db: Session, file_format: str | None = None, file_name_prefix: str | None = None) -> int:
+
+    if db.get_bind().dialect.name != "postgresql":
+        return _filtered_file_records(db, file_format, file_name_prefix).count()
+
+    if not file_format and not file_name_prefix:
+        estimate = db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:table_name)"),
+            {"table_name": FileMetadata.__tablename__}
+        ).scalar()
+
+        # -1 means the table was never analyzed
+        if estimate is not None and estimate >= 0:
+            return int(estimate)
+
+    statement = _filtered_file_records(db, file_format, file_name_prefix).statement
+    compiled = statement.compile(dialect = db.get_bind().dialect)
+
+    plan = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+def get_file_record(db: Session, file_id: int) -> FileMetadata | None:
+
+    file = db.query(FileMetadata).filter(FileMetadata.id == file_id).first()
+    return file
+
+async def get_file_record_async(db: AsyncSession, file_id: int) -> FileMetadata | None:
+
+    file = await db.scalar(select(FileMetadata).where(FileMetadata.id == file_id))
+    return file
+
+# Metadata records of several files in one query, keyed by file id
+def get_file_records(db: Session, file_ids: list[int]) -> dict[int, FileMetadata]:
+
+    files = db.query(FileMetadata).filter(FileMetadata.id.in_(file_ids)).all()
+    return {file.id: file for file in files}
+
+async def get_file_records_async(db: AsyncSession, file_ids: list[int]) -> dict[int, FileMetadata]:
+
+    files = await db.scalars(select(FileMetadata).where(FileMetadata.id.in_(file_ids)))
+    return {file.id: file for file in files}
+
+def get_file_schema(db: Session, file_id: int) -> FileSchema | None:
+
+    schema = db.query(FileSchema).filter(FileSchema.file_id == file_id).first()
+    return schema
+
+# Catalog entries of several files in one query, keyed by file id
+def get_file_schemas(db: Session, file_ids: list[int]) -> dict[int, FileSchema]:
+
+    schemas = db.query(FileSchema).filter(FileSchema.file_id.in_(file_ids)).all()
+    return {schema.file_id: schema for schema in schemas}
+
+def get_file_record_by_name(db: Session, file_name: str, file_format: str) -> FileMetadata | None:
+
+    file = db.query(FileMetadata).filter(FileMetadata.file_name == file_name, FileMetadata.file_format == file_format).order_by(FileMetadata.id.desc()).first()
+    return file
+
+def get_records_without_parquet(db: Session) -> list[FileMetadata]:
+
+    files = db.query(FileMetadata).filter(FileMetadata.parquet_object.is_(None)).order_by(FileMetadata.id).all()
+    return files
+
+def set_parquet_object(db: Session, file_record: FileMetadata, parquet_object: str) -> FileMetadata:
+
+    file_record.parquet_object = parquet_object
+    db.commit()
+    db.refresh(file_record)
+
+    return file_record
+
+# Sequence number of the last delta appended to a file; 0 when none was
+def get_last_delta_sequence(db: Session, file_id: int) -> int:
+
+    sequence = db.query(func.max(FileDelta.sequence)).filter(FileDelta.file_id == file_id).scalar()
+    return sequence or 0
+
+# Record an appended delta and the new state of its file in one transaction: size, Parquet copy and a
+# column catalog profiled from the file with the delta folded in (none when it could not be profiled)
+def create_file_delta(
+    db: Session,
+    file_record: FileMetadata,
+    sequence: int,
+    object_name: str,
+    row_count: int,
+    base_etag: str,
+    etag: str,
+    file_size: int,
+    parquet_object: str | None = None,
+    profile: dict | None = None
+) -> FileDelta:
+
+    db_delta = FileDelta(
+        file_id = file_record.id,
+        sequence = sequence,
+        object_name = object_name,
+        row_count = row_count,
+        base_etag = base_etag,
+        etag = etag
+    )
+
+    db.add(db_delta)
+
+    # The checksum was taken of the file as uploaded
+    file_record.file_size = file_size
+    file_record.checksum = None
+    file_record.parquet_object = parquet_object
+
+    db.execute(delete(FileSchema).where(FileSchema.file_id == file_record.id))
+    if profile is not None:
+        db.add(FileSchema(file_id = file_record.id, **profile))
+
+    db.commit()
+    db.refresh(db_delta)
+    db.refresh(file_record)
+
+    return db_delta
+
+# Deltas of several files in one query, keyed by file id, each list in append order
+def get_file_deltas(db: Session, file_ids: list[int]) -> dict[int, list[FileDelta]]:
+
+    deltas = {file_id: [] for file_id in file_ids}
+
+    for delta in db.query(FileDelta).filter(FileDelta.file_id.in_(file_ids)).order_by(FileDelta.file_id, FileDelta.sequence):
+        deltas[delta.file_id].append(delta)
+
+    return deltas
+
+def get_merge_lineage(db: Session, file_id: int) -> MergeLineage | None:
+
+    lineage = db.query(MergeLineage).filter(MergeLineage.file_id == file_id).first()
+    return lineage
+
+# Record that a saved merge result now reflects these versions of its sources
+def set_merge_lineage_refreshed(db: Session, lineage: MergeLineage, file_record: FileMetadata, source_etags: list[str], file_size: int | None) -> MergeLineage:
+
+    lineage.source_etags = source_etags
+    lineage.refreshed_at = func.now()
+    file_record.file_size = file_size
+
+    db.commit()
+    db.refresh(lineage)
+    db.refresh(file_record)
+
+    return lineage
@@ -1,22 +1,74 @@
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from config import settings
-
-SQLALCHEMY_DATABASE_URL = f"postgresql://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}@{settings.POSTGRES_HOST}/{settings.POSTGRES_DB}"
-
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-
-SessionLocal = sessionmaker(bind = engine, autocommit = False, autoflush = False)
-
-Base = declarative_base()
-
-def get_db():
-
-    db = SessionLocal()
-    
-    try:
-        yield db
-    finally:
-        db.close()
-
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+from config import settings
+
+SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL or f"postgresql://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}@{settings.POSTGRES_HOST}/{settings.POSTGRES_DB}"
+
+# Same database through the async driver of its dialect
+def async_database_url(url: str) -> str:
+
+    dialect, _, rest = url.partition("://")
+    driver = "aiosqlite" if dialect.startswith("sqlite") else "asyncpg"
+
+    return f"{dialect.split('+')[0]}+{driver}://{rest}"
+
+# Pool settings for PostgreSQL; SQLite keeps SQLAlchemy's own pooling
+def engine_options(url: str) -> dict:
+
+    if url.startswith("sqlite"):
+        return {}
+
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING
+    }
+
+# Sessions are used from the executor threads, so SQLite connections must not be tied to the thread that opened them
+connect_args = {"check_same_thread": False} if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {}
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args = connect_args, **engine_options(SQLALCHEMY_DATABASE_URL))
+
+SessionLocal = sessionmaker(bind = engine, autocommit = False, autoflush = False)
+
+async_engine = None
+AsyncSessionLocal = None
+
+if settings.DB_ASYNC_ENABLED:
+    ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or async_database_url(SQLALCHEMY_DATABASE_URL)
+
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL))
+
+    # Records are returned to the endpoints after the commit, so they must not expire with it
+    AsyncSessionLocal = async_sessionmaker(bind = async_engine, autoflush = False, expire_on_commit = False)
+
+Base = declarative_base()
+
+def get_db():
+
+    db = SessionLocal()
+
+    try:
+        yield db
+    finally:
+        db.close()
+
+# Session for the async endpoints: an AsyncSession when DB_ASYNC_ENABLED is set, the sync session otherwise
+async def get_async_db():
+
+    if AsyncSessionLocal is None:
+        db = SessionLocal()
+
+        try:
+            yield db
+        finally:
+            db.close()
+
+        return
+
+    async with AsyncSessionLocal() as db:
+        yield db
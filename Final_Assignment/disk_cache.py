@@ -0,0 +1,227 @@
+from fastapi_cache.backends import Backend
+from executors import run_io
+import os
+import struct
+import tempfile
+import threading
+import time
+import urllib.parse
+import pyarrow as pa
+
+# File-backed cache shared by every worker process on the host. Each entry is one file in the cache
+# directory: an 8-byte expiry timestamp followed by the value. Files are written under a temporary
+# name and renamed into place, so readers in other processes never see a partial entry. Reads touch
+# the file's mtime, which drives LRU eviction once the directory grows past its byte budget, and large
+# payloads can be memory-mapped instead of read into the process.
+
+HEADER = struct.Struct("<d")
+ENTRY_SUFFIX = ".entry"
+
+# Eviction frees space down to this share of the budget, so a full cache does not evict on every write
+EVICTION_TARGET = 0.9
+
+class DiskBackend(Backend):
+
+    def __init__(self, directory: str | None, max_bytes: int, scan_interval: float = 30.0):
+
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "npcyf_cache")
+        self.max_bytes = max_bytes
+        self.scan_interval = scan_interval
+        os.makedirs(self.directory, exist_ok = True)
+
+        # Bytes in the directory as of the last scan plus this process's writes since; None before the first scan
+        self._bytes = None
+        self._scanned_at = 0.0
+        self._size_lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, urllib.parse.quote(key, safe = "") + ENTRY_SUFFIX)
+
+    def _entries(self) -> list[tuple[str, str]]:
+        return [
+            (urllib.parse.unquote(entry.name[:-len(ENTRY_SUFFIX)]), entry.path)
+            for entry in os.scandir(self.directory)
+            if entry.name.endswith(ENTRY_SUFFIX)
+        ]
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    # Expiry of the entry at path, or None when it is missing; expired entries are removed
+    def _expires_at(self, path: str) -> float | None:
+
+        try:
+            with open(path, "rb") as f:
+                header = f.read(HEADER.size)
+        except FileNotFoundError:
+            return None
+
+        if len(header) < HEADER.size:
+            return None
+
+        expires_at = HEADER.unpack(header)[0]
+        if expires_at and expires_at < time.time():
+            self._remove(path)
+            return None
+
+        # Mark the entry as recently used for LRU eviction
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+
+        return expires_at
+
+    def _read(self, key: str) -> tuple[float, bytes] | None:
+
+        path = self._path(key)
+
+        if self._expires_at(path) is None:
+            return None
+
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+
+        return HEADER.unpack(data[:HEADER.size])[0], data[HEADER.size:]
+
+    # Last use, size and path of every entry except replacing, from the directory listing alone
+    def _scan(self, replacing: str) -> list[tuple[float, int, str]]:
+
+        entries = []
+
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(ENTRY_SUFFIX) or entry.path == replacing:
+                continue
+
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        return entries
+
+    # Make room for incoming bytes; replacing is the entry about to be overwritten. The directory is only
+    # listed when the tracked size would pass the budget or is older than scan_interval, and entries are
+    # only opened when the budget is really exceeded
+    def _make_room(self, incoming: int, replacing: str) -> None:
+
+        with self._size_lock:
+            now = time.time()
+
+            if self._bytes is not None and now - self._scanned_at < self.scan_interval and self._bytes + incoming <= self.max_bytes:
+                self._bytes += incoming
+                return
+
+            entries = self._scan(replacing)
+            total = sum(size for _, size, _ in entries)
+
+            if total + incoming > self.max_bytes:
+                total = self._evict(entries, total, incoming, now)
+
+            self._bytes = total + incoming
+            self._scanned_at = now
+
+    # Drop expired entries, then the least recently used ones until incoming bytes fit EVICTION_TARGET of the
+    # budget; returns the bytes left. An entry larger than the whole budget is still stored once everything else is gone
+    def _evict(self, entries: list[tuple[float, int, str]], total: int, incoming: int, now: float) -> int:
+
+        live = []
+
+        for mtime, size, path in entries:
+            try:
+                with open(path, "rb") as f:
+                    expires_at = HEADER.unpack(f.read(HEADER.size))[0]
+            except (FileNotFoundError, struct.error):
+                total -= size
+                continue
+
+            if expires_at and expires_at < now:
+                self._remove(path)
+                total -= size
+            else:
+                live.append((mtime, size, path))
+
+        for _, size, path in sorted(live):
+            if total + incoming <= self.max_bytes * EVICTION_TARGET:
+                break
+            if self._remove(path):
+                total -= size
+
+        return total
+
+    def _write(self, key: str, value: bytes, expire: int | None) -> None:
+
+        path = self._path(key)
+        self._make_room(HEADER.size + len(value), replacing = path)
+
+        expires_at = time.time() + expire if expire else 0.0
+        descriptor, temp_path = tempfile.mkstemp(dir = self.directory, suffix = ".tmp")
+
+        try:
+            with os.fdopen(descriptor, "wb") as f:
+                f.write(HEADER.pack(expires_at))
+                f.write(value)
+            os.replace(temp_path, path)
+        except Exception:
+            self._remove(temp_path)
+            raise
+
+    def _clear(self, namespace: str | None, key: str | None) -> int:
+
+        if namespace:
+            return sum(self._remove(path) for entry_key, path in self._entries() if entry_key.startswith(namespace))
+        if key:
+            return int(self._remove(self._path(key)))
+        return 0
+
+    async def get_with_ttl(self, key: str) -> tuple[int, bytes | None]:
+
+        entry = await run_io(self._read, key)
+        if entry is None:
+            return 0, None
+
+        expires_at, data = entry
+        return (int(expires_at - time.time()) if expires_at else -1), data
+
+    async def get(self, key: str) -> bytes | None:
+
+        entry = await run_io(self._read, key)
+        return entry[1] if entry is not None else None
+
+    async def set(self, key: str, value: bytes | str, expire: int | None = None) -> None:
+
+        if isinstance(value, str):
+            value = value.encode()
+
+        await run_io(self._write, key, value, expire)
+
+    async def clear(self, namespace: str | None = None, key: str | None = None) -> int:
+        return await run_io(self._clear, namespace, key)
+
+    # Memory-map the value of a key instead of reading it; the returned Arrow buffer stays valid
+    # even if the entry is evicted or replaced while it is in use
+    async def get_buffer(self, key: str) -> pa.Buffer | None:
+
+        path = self._path(key)
+
+        if await run_io(self._expires_at, path) is None:
+            return None
+
+        try:
+            mapped = pa.memory_map(path)
+        except FileNotFoundError:
+            return None
+
+        mapped.seek(HEADER.size)
+        return mapped.read_buffer()
@@ -0,0 +1,28 @@
+from concurrent.futures import ThreadPoolExecutor
+from config import settings
+import asyncio
+import contextvars
+import functools
+
+# Bounded pools that keep blocking work off the event loop: MinIO/database calls go to the I/O pool,
+# pandas parsing, joins and serialization to the smaller CPU pool so heavy merges cannot starve light requests
+io_executor = ThreadPoolExecutor(max_workers = settings.IO_EXECUTOR_WORKERS, thread_name_prefix = "npcyf-io")
+cpu_executor = ThreadPoolExecutor(max_workers = settings.CPU_EXECUTOR_WORKERS, thread_name_prefix = "npcyf-cpu")
+
+# Work runs in a copy of the caller's context, so per-request state (e.g. Server-Timing stages) follows it into the pool
+async def run_io(func, *args, **kwargs):
+
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(io_executor, functools.partial(context.run, func, *args, **kwargs))
+
+async def run_cpu(func, *args, **kwargs):
+
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(cpu_executor, functools.partial(context.run, func, *args, **kwargs))
+
+def shutdown_executors() -> None:
+
+    io_executor.shutdown(wait = False, cancel_futures = True)
+    cpu_executor.shutdown(wait = False, cancel_futures = True)
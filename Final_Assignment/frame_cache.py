@@ -0,0 +1,73 @@
+from collections import OrderedDict
+from config import settings
+import pandas as pd
+import threading
+
+# Process-local LRU of parsed DataFrames keyed by (bucket, object name, etag), bounded by a total byte budget
+class FrameCache:
+
+    def __init__(self, max_bytes: int):
+
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries: OrderedDict[tuple, tuple[pd.DataFrame, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> pd.DataFrame | None:
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        # Shallow copy so callers can rename or add columns without touching the cached frame
+        return entry[0].copy(deep = False)
+
+    def put(self, key: tuple, df: pd.DataFrame) -> None:
+
+        size = int(df.memory_usage(index = True, deep = True).sum())
+
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+
+            while self._entries and self.current_bytes + size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last = False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+            self._entries[key] = (df, size)
+            self.current_bytes += size
+
+    # Drop every cached version of an object, e.g. after it is overwritten
+    def invalidate(self, bucket: str, object_name: str) -> None:
+
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == bucket and key[1] == object_name]:
+                self.current_bytes -= self._entries.pop(key)[1]
+
+    def stats(self) -> dict:
+
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "current_bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+frame_cache = FrameCache(max_bytes = settings.FRAME_CACHE_MAX_BYTES)
@@ -0,0 +1,287 @@
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from fastapi import HTTPException
+from fastapi_cache.backends import Backend
+from types import SimpleNamespace
+from merge_cache import get_reusable_merge, start_staging
+from config import settings
+from executors import run_io
+import asyncio
+import json
+import multiprocessing
+import time
+import uuid
+
+class JobCancelled(Exception):
+    pass
+
+# Picklable stand-in for HTTPException raised inside a worker process
+class JobError(Exception):
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+# Worker process setup: cap the address space so one runaway merge cannot take the host down
+def _init_worker(memory_limit: int) -> None:
+
+    if memory_limit <= 0:
+        return
+
+    try:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    except (ImportError, ValueError, OSError) as e:
+        print(f"Could not apply merge job memory limit: {e}")
+
+# Runs in a worker process: download, merge and write the result payload to the spill directory
+def run_merge_job(cache_key: str, file_record_1: dict, file_record_2: dict, common_column: str, join_type: str, progress, cancel_event) -> dict:
+
+    from minio_client import download_from_minio, get_object_stat
+    from key_index import load_merge_indexes
+    from merge_cache import write_chunks_to_spill
+    from merge_pipeline import merge_frames, preview_records, start_out_of_core_merge
+    from external_merge import fits_in_memory
+
+    timings = {}
+    record_1 = SimpleNamespace(**file_record_1)
+    record_2 = SimpleNamespace(**file_record_2)
+    full_name_1 = f"{record_1.file_name}.{record_1.file_format}"
+    full_name_2 = f"{record_2.file_name}.{record_2.file_format}"
+
+    def enter_stage(stage: str, fraction: float) -> float:
+        if cancel_event.is_set():
+            raise JobCancelled()
+        progress.update({"stage": stage, "progress": fraction})
+        return time.perf_counter()
+
+    def leave_stage(stage: str, started: float) -> None:
+        timings[stage] = round(time.perf_counter() - started, 4)
+        progress["timings"] = dict(timings)
+
+    progress.update({"status": "running", "started_at": time.time()})
+
+    try:
+        started = enter_stage("download", 0.05)
+        stats = [get_object_stat(full_name_1), get_object_stat(full_name_2)]
+        file_sizes = [stat.size for stat in stats]
+
+        if fits_in_memory(file_sizes, settings.MERGE_MEMORY_LIMIT_BYTES):
+            df1 = download_from_minio(full_name_1, record_1.parquet_object)
+            df2 = download_from_minio(full_name_2, record_2.parquet_object)
+            leave_stage("download", started)
+
+            started = enter_stage("merge", 0.4)
+            merged_df = merge_frames(df1, df2, common_column, join_type)
+            del df1, df2
+            preview = preview_records(merged_df)
+            merged_chunks = [merged_df]
+            leave_stage("merge", started)
+        else:
+            key_indexes = load_merge_indexes([full_name_1, full_name_2], [stat.etag for stat in stats], common_column, join_type)
+            leave_stage("download", started)
+
+            started = enter_stage("merge", 0.1)
+            preview, merged_chunks = start_out_of_core_merge(record_1, record_2, common_column, join_type, file_sizes, key_indexes)
+            leave_stage("merge", started)
+
+        started = enter_stage("cache", 0.8)
+        payload = write_chunks_to_spill(cache_key, merged_chunks)
+        leave_stage("cache", started)
+
+    except HTTPException as e:
+        raise JobError(e.status_code, str(e.detail))
+
+    progress.update({"stage": "done", "progress": 1.0})
+
+    return {"payload": payload, "preview": json.loads(json.dumps(preview, default = str)), "timings": timings}
+
+# Local merge job queue: a bounded process pool plus in-process job bookkeeping, no external broker
+class MergeJobManager:
+
+    def __init__(self, max_workers: int, memory_limit: int, max_pending: int, retention: int):
+
+        self.max_workers = max_workers
+        self.memory_limit = memory_limit
+        self.max_pending = max_pending
+        self.retention = retention
+
+        self._jobs: dict[str, dict] = {}
+        self._executor = None
+        self._manager = None
+
+    def _ensure_started(self) -> None:
+
+        if self._executor is not None:
+            return
+
+        # Spawned workers do not inherit the API's threads, sockets or sessions
+        context = multiprocessing.get_context("spawn")
+        self._manager = context.Manager()
+        self._executor = ProcessPoolExecutor(
+            max_workers = self.max_workers,
+            mp_context = context,
+            initializer = _init_worker,
+            initargs = (self.memory_limit,)
+        )
+
+    def _prune(self) -> None:
+
+        cutoff = time.time() - self.retention
+
+        for job_id in [job_id for job_id, job in self._jobs.items() if job["finished_at"] and job["finished_at"] < cutoff]:
+            del self._jobs[job_id]
+
+    def pending_count(self) -> int:
+        return sum(1 for job in self._jobs.values() if job["status"] in ("queued", "running"))
+
+    async def submit(self, cache: Backend, cache_key: str, file_record_1, file_record_2, common_column: str, join_type: str, cache_data: dict) -> dict:
+
+        self._prune()
+        job_id = str(uuid.uuid4())
+
+        # Identical merge already cached: record the job as completed without running it again
+        cached_merge = await get_reusable_merge(cache, cache_key)
+        if cached_merge is not None:
+            now = time.time()
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "status": "completed",
+                "submitted_at": now,
+                "finished_at": now,
+                "last_progress": {},
+                "cache_key": cache_key,
+                "preview": cached_merge.get("preview", []),
+                "error": None,
+                "timings": {}
+            }
+            return await self.status(job_id)
+
+        if self.pending_count() >= self.max_pending:
+            raise HTTPException(status_code = 429, detail = "Too many merge jobs in progress. Please retry later.")
+
+        await asyncio.to_thread(self._ensure_started)
+        progress = self._manager.dict({"status": "queued", "stage": "queued", "progress": 0.0, "timings": {}})
+        cancel_event = self._manager.Event()
+
+        def as_dict(record) -> dict:
+            return {
+                "id": record.id,
+                "file_name": record.file_name,
+                "file_format": record.file_format,
+                "parquet_object": record.parquet_object
+            }
+
+        future = self._executor.submit(
+            run_merge_job, cache_key, as_dict(file_record_1), as_dict(file_record_2), common_column, join_type, progress, cancel_event
+        )
+
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "submitted_at": time.time(),
+            "finished_at": None,
+            "last_progress": {},
+            "cache_key": None,
+            "preview": None,
+            "error": None,
+            "timings": {},
+            "future": future,
+            "progress": progress,
+            "cancel_event": cancel_event
+        }
+        self._jobs[job_id] = job
+
+        job["task"] = asyncio.create_task(self._finish(job, cache, cache_key, cache_data))
+
+        return await self.status(job_id)
+
+    async def _finish(self, job: dict, cache: Backend, cache_key: str, cache_data: dict) -> None:
+
+        try:
+            result = await asyncio.wrap_future(job["future"])
+
+            record = dict(cache_data)
+            record.update(result["payload"])
+            record["preview"] = result["preview"]
+            await cache.set(cache_key, json.dumps(record, default = str), expire = settings.MERGE_CACHE_TTL)
+            start_staging(cache, cache_key)
+
+            job.update({"status": "completed", "cache_key": cache_key, "preview": result["preview"], "timings": result["timings"]})
+            print(f"Merge job {job['job_id']} completed: {cache_data['file1_name']}, {cache_data['file2_name']}")
+
+        except (JobCancelled, CancelledError, asyncio.CancelledError):
+            job["status"] = "cancelled"
+            print(f"Merge job {job['job_id']} cancelled.")
+        except JobError as e:
+            job.update({"status": "failed", "error": e.detail})
+            print(f"Merge job {job['job_id']} failed: {e.detail}")
+        except Exception as e:
+            job.update({"status": "failed", "error": str(e)})
+            print(f"Merge job {job['job_id']} failed: {e}")
+        finally:
+            job["last_progress"] = await run_io(self._read_progress, job)
+            job["finished_at"] = time.time()
+
+    @staticmethod
+    def _read_progress(job: dict) -> dict:
+
+        try:
+            return dict(job["progress"])
+        except Exception:
+            return {}
+
+    # Job state lives on the event loop; only the reads and writes of the Manager proxies (a round trip to
+    # the manager process) go to the I/O pool
+    async def status(self, job_id: str) -> dict | None:
+
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+
+        progress = job["last_progress"] if job["finished_at"] else await run_io(self._read_progress, job)
+
+        if job["status"] == "queued" and progress.get("status") == "running":
+            job["status"] = "running"
+
+        return {
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "stage": job["status"] if job["status"] in ("queued", "completed") else progress.get("stage", job["status"]),
+            "progress": 1.0 if job["status"] == "completed" else progress.get("progress", 0.0),
+            "submitted_at": job["submitted_at"],
+            "started_at": progress.get("started_at"),
+            "finished_at": job["finished_at"],
+            "timings": job["timings"] or progress.get("timings", {}),
+            "cache_key": job["cache_key"],
+            "preview": job["preview"],
+            "error": job["error"]
+        }
+
+    async def cancel(self, job_id: str) -> dict | None:
+
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+
+        if job["status"] in ("queued", "running"):
+            # Queued jobs are dropped from the pool; running ones stop at their next stage boundary
+            if job["future"].cancel():
+                job["status"] = "cancelled"
+            else:
+                await run_io(job["cancel_event"].set)
+
+        return await self.status(job_id)
+
+    def shutdown(self) -> None:
+
+        if self._executor is not None:
+            self._executor.shutdown(wait = False, cancel_futures = True)
+            self._manager.shutdown()
+
+merge_jobs = MergeJobManager(
+    max_workers = settings.MERGE_JOB_WORKERS,
+    memory_limit = settings.MERGE_JOB_MEMORY_LIMIT_BYTES,
+    max_pending = settings.MERGE_JOB_MAX_PENDING,
+    retention = settings.MERGE_JOB_RETENTION
+)
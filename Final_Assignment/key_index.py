@@ -0,0 +1,192 @@
+from collections.abc import Iterator
+from minio.error import S3Error
+from minio_client import minio_client
+from config import settings
+import io
+import math
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Join-key index kept next to an uploaded file: a Bloom filter over the key values and the count of
+# null keys, which is all out-of-core merges read to prune rows. The index records the ETag of the
+# object it was built from and is ignored once that object changes.
+
+KEY_INDEX_PREFIX = "index/"
+SOURCE_ETAG_METADATA = "x-amz-meta-source-etag"
+
+# Second hash key for double hashing in the Bloom filter (must be 16 bytes)
+BLOOM_HASH_KEY = "npcyf-bloom-key2"
+
+def key_index_object_name(file_name: str, column: str) -> str:
+    return f"{KEY_INDEX_PREFIX}{file_name}.{column}.arrow"
+
+def _comparable_keys(values: pd.Series) -> pd.Series:
+
+    # Numeric keys compare and hash as float64 so 1 and 1.0 are the same key, as in pd.merge
+    if pd.api.types.is_bool_dtype(values) or pd.api.types.is_numeric_dtype(values):
+        return values.astype("float64")
+
+    return values
+
+# Bloom filter over join keys; no false negatives, so rows it rejects can never match
+class BloomFilter:
+
+    def __init__(self, num_bits: int, num_hashes: int, bits: np.ndarray | None = None):
+
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bits if bits is not None else np.zeros((num_bits + 7) // 8, dtype = np.uint8)
+
+    @classmethod
+    def for_capacity(cls, capacity: int, false_positive_rate: float) -> "BloomFilter":
+
+        capacity = max(capacity, 1)
+        num_bits = max(64, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+
+        return cls(num_bits, num_hashes)
+
+    def _positions(self, keys: pd.Series) -> Iterator[np.ndarray]:
+
+        keys = _comparable_keys(keys)
+        hash_1 = pd.util.hash_pandas_object(keys, index = False).to_numpy()
+        hash_2 = pd.util.hash_pandas_object(keys, index = False, hash_key = BLOOM_HASH_KEY).to_numpy() | np.uint64(1)
+
+        for i in range(self.num_hashes):
+            yield (hash_1 + np.uint64(i) * hash_2) % np.uint64(self.num_bits)
+
+    def add(self, keys: pd.Series) -> None:
+
+        for positions in self._positions(keys):
+            np.bitwise_or.at(self.bits, (positions >> np.uint64(3)).astype(np.int64), (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)))
+
+    def might_contain(self, keys: pd.Series) -> np.ndarray:
+
+        result = np.ones(len(keys), dtype = bool)
+
+        for positions in self._positions(keys):
+            result &= (self.bits[(positions >> np.uint64(3)).astype(np.int64)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1 == 1
+
+        return result
+
+class KeyIndex:
+
+    def __init__(self, null_count: int, bloom: BloomFilter):
+
+        self.null_count = null_count
+        self.bloom = bloom
+
+    @classmethod
+    def build(cls, values: pd.Series, false_positive_rate: float) -> "KeyIndex":
+
+        keys = values.dropna()
+
+        bloom = BloomFilter.for_capacity(len(keys), false_positive_rate)
+        bloom.add(keys)
+
+        return cls(int(len(values) - len(keys)), bloom)
+
+    # An Arrow IPC file without columns: the filter and counts are its schema metadata
+    def to_bytes(self, source_etag: str) -> bytes:
+
+        schema = pa.schema([]).with_metadata({
+            "source_etag": source_etag,
+            "null_count": str(self.null_count),
+            "bloom_bits": str(self.bloom.num_bits),
+            "bloom_hashes": str(self.bloom.num_hashes),
+            "bloom": self.bloom.bits.tobytes()
+        })
+
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_file(sink, schema):
+            pass
+
+        return sink.getvalue().to_pybytes()
+
+    # Only the schema is read, so indexes written with key and row columns load the same way
+    @classmethod
+    def from_bytes(cls, payload: bytes) -> "KeyIndex":
+
+        metadata = pa.ipc.open_file(pa.py_buffer(payload)).schema.metadata
+
+        bloom = BloomFilter(
+            int(metadata[b"bloom_bits"]),
+            int(metadata[b"bloom_hashes"]),
+            np.frombuffer(metadata[b"bloom"], dtype = np.uint8).copy()
+        )
+
+        return cls(int(metadata[b"null_count"]), bloom)
+
+# Build and store key indexes for the configured key columns present in an uploaded file; returns the object names
+def upload_key_indexes(df: pd.DataFrame, file_name: str, source_etag: str) -> list[str]:
+
+    object_names = []
+    columns = {str(column).strip().lower(): column for column in df.columns}
+
+    for column in settings.KEY_INDEX_COLUMNS:
+        if column not in columns:
+            continue
+
+        object_name = key_index_object_name(file_name, column)
+
+        try:
+            payload = KeyIndex.build(df[columns[column]], settings.KEY_INDEX_BLOOM_FPP).to_bytes(source_etag)
+
+            minio_client.put_object(
+                settings.MINIO_BUCKET,
+                object_name,
+                io.BytesIO(payload),
+                length = len(payload),
+                metadata = {SOURCE_ETAG_METADATA: source_etag}
+            )
+            object_names.append(object_name)
+            print(f"Successfully uploaded key index {object_name} to MinIO.")
+
+        except Exception as e:
+            print(f"Could not write key index {object_name}, merges will build their own: {e}")
+
+    return object_names
+
+# Load the key index of a file for one column; None when there is none or it was built from another object version
+def load_key_index(file_name: str, column: str, source_etag: str) -> KeyIndex | None:
+
+    object_name = key_index_object_name(file_name, column)
+
+    try:
+        stat = minio_client.stat_object(settings.MINIO_BUCKET, object_name)
+    except S3Error as e:
+        if e.code not in ("NoSuchKey", "NoSuchObject"):
+            print(f"Could not read key index {object_name}: {e}")
+        return None
+
+    if (stat.metadata or {}).get(SOURCE_ETAG_METADATA) != source_etag.strip('"'):
+        print(f"Key index {object_name} is stale, ignoring it.")
+        return None
+
+    response = minio_client.get_object(settings.MINIO_BUCKET, object_name, request_headers = {"If-Match": stat.etag})
+
+    try:
+        return KeyIndex.from_bytes(response.read())
+    except Exception as e:
+        print(f"Could not read key index {object_name}: {e}")
+        return None
+    finally:
+        response.close()
+        response.release_conn()
+
+# Drop rows whose key cannot appear on the other side of an inner/left join
+def prune_chunks(chunks: Iterator[pd.DataFrame], on: str, bloom: BloomFilter) -> Iterator[pd.DataFrame]:
+
+    for chunk in chunks:
+        keep = chunk[on].isna().to_numpy() | bloom.might_contain(chunk[on])
+        yield chunk if keep.all() else chunk[keep]
+
+# Key indexes of both merge inputs for Bloom filter pruning of out-of-core merges, loaded only when the join
+# can use them (inner/left on an indexed column)
+def load_merge_indexes(file_names: list[str], etags: list[str], column: str, join_type: str) -> list[KeyIndex | None]:
+
+    if join_type not in ("inner", "left") or column not in settings.KEY_INDEX_COLUMNS:
+        return [None, None]
+
+    return [load_key_index(file_name, column, etag) for file_name, etag in zip(file_names, etags)]
@@ -0,0 +1,140 @@
+from compaction import align_key_dtypes
+from minio_client import append_rows_to_object, align_rows, download_chunks_from_minio, upload_merged_to_minio
+from merge_cache import spill_directory
+from merge_pipeline import merge_frames, normalize_columns, peek_columns
+from pushdown import NO_PUSHDOWN, pushdowns_from_identity
+from config import settings
+import itertools
+import pandas as pd
+
+# Lineage of saved merge results and their refresh from appended rows. Output rows depend only on the
+# input rows with the same join key, so after appends only the keys of the appended rows can change:
+# their output rows are joined again from both sources, everything else in the saved result stays.
+# When no saved row has such a key the new rows are appended to the stored result, otherwise the rows
+# of those keys are replaced.
+
+# Lineage of a two-file merge, recorded with its result when it is saved (fields of MergeLineage)
+def merge_lineage(file_record_1, file_record_2, common_column: str, join_type: str, etags: list[str], pushdown: list | None) -> dict:
+    return {
+        "source_file_id_1": file_record_1.id,
+        "source_file_id_2": file_record_2.id,
+        "common_column": common_column,
+        "join_type": join_type,
+        "pushdowns": pushdown,
+        "source_etags": [etag.strip('"') for etag in etags]
+    }
+
+# Deltas of a source appended since the saved result was merged from it (at merged_etag); None when the
+# source changed some other way, e.g. it was uploaded again, and the result has to be merged again
+def pending_deltas(deltas: list, merged_etag: str, current_etag: str) -> list | None:
+
+    if current_etag == merged_etag:
+        return []
+
+    for index, delta in enumerate(deltas):
+        if delta.base_etag == merged_etag:
+            pending = deltas[index:]
+            return pending if pending[-1].etag == current_etag else None
+
+    return None
+
+def _full_name(file_record) -> str:
+    return f"{file_record.file_name}.{file_record.file_format}"
+
+# Appended rows of one source as the merge reads them (after its pushdown); None when nothing was appended
+def _delta_rows(deltas: list, pushdown: dict) -> pd.DataFrame | None:
+
+    frames = [
+        chunk
+        for delta in deltas
+        for chunk in normalize_columns(download_chunks_from_minio(delta.object_name, settings.MERGE_CHUNK_ROWS, spill_directory(), **pushdown))
+    ]
+
+    return pd.concat(frames, ignore_index = True) if frames else None
+
+# Two key columns in one dtype: a delta, its source and the saved result are read separately, so the same
+# key can come back as a number from one and as text from another; keys with no common dtype compare as text
+def _comparable_keys(left: pd.Series, right: pd.Series) -> tuple[pd.Series, pd.Series]:
+
+    left_frame, right_frame = align_key_dtypes(left.to_frame("key"), right.to_frame("key"), "key")
+    left, right = left_frame["key"], right_frame["key"]
+
+    if left.dtype != right.dtype:
+        return left.astype(str), right.astype(str)
+
+    return left, right
+
+# Mask of the values that are one of keys
+def _key_mask(values: pd.Series, keys) -> pd.Series:
+
+    values, keys = _comparable_keys(values, pd.Series(list(keys)))
+    return values.isin(keys)
+
+# Rows of a source (appended rows included) whose join key is one of keys, read chunk by chunk
+def _rows_with_keys(file_record, pushdown: dict, common_column: str, keys: pd.Index) -> pd.DataFrame:
+
+    chunks = normalize_columns(download_chunks_from_minio(_full_name(file_record), settings.MERGE_CHUNK_ROWS, spill_directory(), file_record.parquet_object, **pushdown))
+    return pd.concat([chunk[_key_mask(chunk[common_column], keys)] for chunk in chunks], ignore_index = True)
+
+# Keys that had rows in a source before its deltas were appended
+def _keys_before(rows: pd.DataFrame, delta_rows: pd.DataFrame | None, common_column: str) -> set:
+
+    keys = rows[common_column]
+    if delta_rows is None:
+        return set(keys.unique())
+
+    # Counted in a common dtype, reported as the source rows hold them
+    aligned, delta_keys = _comparable_keys(keys, delta_rows[common_column])
+    counts = aligned.value_counts(dropna = False).sub(delta_keys.value_counts(dropna = False), fill_value = 0)
+
+    return set(keys[aligned.isin(counts.index[counts > 0])].unique())
+
+# Join the deltas of both sources into a saved merge result (merged_record) and store it again;
+# returns how the result was updated ("append" or "patch") and the rows added and removed
+def refresh_merged_output(merged_record, source_records: list, lineage, pending: list[list]) -> dict:
+
+    common_column = lineage.common_column
+    join_type = lineage.join_type
+    pushdowns = pushdowns_from_identity(lineage.pushdowns) if lineage.pushdowns else [NO_PUSHDOWN, NO_PUSHDOWN]
+
+    delta_rows = [_delta_rows(deltas, pushdown) for deltas, pushdown in zip(pending, pushdowns)]
+    delta_keys = [rows[common_column] for rows in delta_rows if rows is not None and len(rows)]
+
+    # Every appended row was filtered out by the merge's pushdowns
+    if not delta_keys:
+        return {"mode": "append", "rows_added": 0, "rows_removed": 0}
+
+    keys = pd.Index(pd.concat(delta_keys, ignore_index = True).unique())
+
+    rows_1, rows_2 = (_rows_with_keys(file_record, pushdown, common_column, keys) for file_record, pushdown in zip(source_records, pushdowns))
+    joined = merge_frames(rows_1, rows_2, common_column, join_type)
+
+    # Keys the saved result already has rows for, judged from which source held them before the appends
+    before_1 = _keys_before(rows_1, delta_rows[0], common_column)
+    before_2 = _keys_before(rows_2, delta_rows[1], common_column)
+    stale = {"inner": before_1 & before_2, "left": before_1, "right": before_2, "outer": before_1 | before_2}[join_type]
+
+    merged_name = _full_name(merged_record)
+
+    if not stale:
+        if len(joined):
+            append_rows_to_object(merged_name, joined, merged_record.file_format)
+
+        print(f"Refreshed {merged_name}: appended {len(joined)} rows.")
+        return {"mode": "append", "rows_added": len(joined), "rows_removed": 0}
+
+    # Rewrite the result without the rows of the stale keys; the stored object is read from a local copy
+    columns, chunks = peek_columns(download_chunks_from_minio(merged_name, settings.MERGE_CHUNK_ROWS, spill_directory()))
+    removed = 0
+
+    def kept_chunks():
+        nonlocal removed
+        for chunk in chunks:
+            keep = ~_key_mask(chunk[common_column], stale)
+            removed += int((~keep).sum())
+            yield chunk[keep]
+
+    upload_merged_to_minio(itertools.chain(kept_chunks(), [align_rows(joined, list(columns), merged_name)]), merged_name, merged_record.file_format)
+
+    print(f"Refreshed {merged_name}: replaced {removed} rows with {len(joined)}.")
+    return {"mode": "patch", "rows_added": len(joined), "rows_removed": removed}
@@ -1,29 +1,103 @@
-from fastapi import FastAPI
-from fastapi_cache import FastAPICache
-from fastapi_cache.backends.inmemory import InMemoryBackend
-from contextlib import asynccontextmanager
-from database import engine
-import models 
-from api import router as api_router
-
-models.Base.metadata.create_all(bind = engine)
-
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-
-    FastAPICache.init(InMemoryBackend(), prefix = "fastapi-cache")
-    print("Application startup: Cache initialized.")
-    
-    yield
-    
-    FastAPICache.clear()
-    print("Application shutdown: Cache cleared.")
-
-app = FastAPI(title = "Final Assignment - FastAPI File Management with PostgreSQL, MinIO, and Caching", lifespan = lifespan)
-
-@app.get("/")
-def root():
-    return {"message": "Welcome to the Final Assignment of NPCYF Backend Project! Please use Swagger for all API interactions at /docs."}
-
-app.include_router(api_router, prefix = "/api/v1")
-
+import time
+
+# Taken before anything else is imported, so the startup timings of a worker include loading the app
+STARTED = time.perf_counter()
+
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends import Backend
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from contextlib import asynccontextmanager
+from database import engine, async_engine
+from disk_cache import DiskBackend
+from executors import shutdown_executors
+from metrics import METRICS_CONTENT_TYPE, observe_request, render_metrics, server_timing_header, start_request_timings
+from minio_client import ensure_bucket
+from startup import Readiness
+from config import settings
+from jobs import merge_jobs
+import models 
+from api import router as api_router
+
+# Run during the startup warm-up, not at import
+def create_tables() -> None:
+    models.Base.metadata.create_all(bind = engine)
+
+readiness = Readiness(STARTED, {"minio": ensure_bucket, "database": create_tables})
+
+def cache_backend() -> Backend:
+
+    if settings.CACHE_BACKEND == "memory":
+        return InMemoryBackend()
+
+    return DiskBackend(settings.CACHE_DIR, settings.CACHE_MAX_BYTES, settings.CACHE_SCAN_SECONDS)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+
+    FastAPICache.init(cache_backend(), prefix = "fastapi-cache")
+    print("Application startup: Cache initialized.")
+
+    readiness.start()
+    readiness.mark("serving")
+
+    yield
+
+    await readiness.stop()
+
+    # The disk cache is shared with the other workers on the host, so only a per-process cache is cleared
+    if settings.CACHE_BACKEND == "memory":
+        await FastAPICache.clear()
+        print("Application shutdown: Cache cleared.")
+
+    shutdown_executors()
+    merge_jobs.shutdown()
+    if async_engine is not None:
+        await async_engine.dispose()
+    print("Application shutdown complete.")
+
+# API requests that arrive during the warm-up wait for it instead of failing on a missing bucket or table
+async def require_ready():
+
+    if not await readiness.wait(settings.STARTUP_REQUEST_WAIT_SECONDS):
+        raise HTTPException(status_code = 503, detail = "Service is still starting up. Please retry shortly.")
+
+app = FastAPI(title = "Final Assignment - FastAPI File Management with PostgreSQL, MinIO, and Caching", lifespan = lifespan)
+
+# Request duration by route template, plus the per-stage Server-Timing header when enabled
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+
+    timings = start_request_timings() if settings.SERVER_TIMING_ENABLED else None
+    started = time.perf_counter()
+
+    response = await call_next(request)
+    elapsed = time.perf_counter() - started
+
+    route = request.scope.get("route")
+    observe_request(request.method, route.path if route is not None else "unmatched", response.status_code, elapsed)
+
+    if timings is not None:
+        response.headers["Server-Timing"] = server_timing_header(timings, elapsed)
+
+    return response
+
+# GET Method — Prometheus Metrics
+@app.get("/metrics", include_in_schema = False)
+def metrics():
+    return Response(render_metrics(), media_type = METRICS_CONTENT_TYPE)
+
+# GET Method — Readiness probe: 200 once every startup check passed, 503 with their status until then
+@app.get("/ready", include_in_schema = False)
+async def ready():
+    return JSONResponse(readiness.status(), status_code = 200 if readiness.ready else 503)
+
+@app.get("/")
+def root():
+    return {"message": "Welcome to the Final Assignment of NPCYF Backend Project! Please use Swagger for all API interactions at /docs."}
+
+app.include_router(api_router, prefix = "/api/v1", dependencies = [Depends(require_ready)])
+
+readiness.mark("imported")
+
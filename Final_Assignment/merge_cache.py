@@ -0,0 +1,330 @@
+from collections.abc import Iterable, Iterator
+from fastapi_cache.backends import Backend
+from config import settings
+from executors import run_cpu, run_io
+from metrics import track
+from minio_client import object_exists, stage_merged_output, staging_object_name
+import pandas as pd
+import pyarrow as pa
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+
+PAYLOAD_FORMAT = "arrow-ipc"
+
+MERGE_KEY_NAMESPACE = uuid.UUID("4f7a2c1e-8b3d-5e9f-a6c4-2d1b0e9f8a7c")
+
+def _payload_key(cache_key: str) -> str:
+    return f"{cache_key}:df"
+
+# Payload of a cached merge result; backends that can memory-map it (DiskBackend) hand back a zero-copy buffer
+async def _get_payload(cache: Backend, cache_key: str) -> bytes | pa.Buffer | None:
+
+    get_buffer = getattr(cache, "get_buffer", None)
+    if get_buffer is not None:
+        return await get_buffer(_payload_key(cache_key))
+
+    return await cache.get(_payload_key(cache_key))
+
+# Content-addressed cache key: identical inputs (by ETag), join column, join type and column/row pushdowns
+# always map to the same key
+def merge_cache_key(file1_name: str, etag_1: str, file2_name: str, etag_2: str, common_column: str, join_type: str, pushdown: list | None = None) -> uuid.UUID:
+
+    identity = [file1_name, etag_1.strip('"'), file2_name, etag_2.strip('"'), common_column.strip().lower(), join_type]
+
+    # Merges without pushdowns keep the keys they always had
+    if pushdown is not None:
+        identity.append(pushdown)
+
+    return uuid.uuid5(MERGE_KEY_NAMESPACE, json.dumps(identity))
+
+# Cache key of a merge chain: the inputs in the order given (by ETag) and every join column and type
+def merge_chain_cache_key(file_names: list[str], etags: list[str], joins: list[tuple[str, str]]) -> uuid.UUID:
+
+    identity = json.dumps([[[name, etag.strip('"')] for name, etag in zip(file_names, etags)], [list(join) for join in joins]])
+    return uuid.uuid5(MERGE_KEY_NAMESPACE, identity)
+
+def spill_directory() -> str:
+
+    directory = settings.MERGE_SPILL_DIR or os.path.join(tempfile.gettempdir(), "npcyf_merge_spill")
+    os.makedirs(directory, exist_ok = True)
+    return directory
+
+# Remove spilled payload files whose cache entries have expired, and partial writes left by a crashed worker
+def _sweep_spill_files(directory: str) -> None:
+
+    cutoff = time.time() - settings.MERGE_CACHE_TTL
+
+    for entry in os.scandir(directory):
+        if entry.name.endswith((".arrow", ".arrow.tmp")) and entry.stat().st_mtime < cutoff:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+# Build an Arrow table, falling back to strings for object columns Arrow cannot type (mixed values from xlsx)
+def _to_arrow_table(df: pd.DataFrame, schema: pa.Schema | None = None) -> pa.Table:
+
+    try:
+        return pa.Table.from_pandas(df, schema = schema, preserve_index = False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        df = df.copy(deep = False)
+
+        for column in df.columns:
+            field_type = schema.field(str(column)).type if schema is not None else None
+            try:
+                pa.array(df[column], type = field_type, from_pandas = True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                df[column] = df[column].where(df[column].isna(), df[column].astype(str))
+
+        return pa.Table.from_pandas(df, schema = schema, preserve_index = False)
+
+# Schema for a chunked payload; all-null columns in the first chunk are typed as strings so later chunks fit
+def _stream_schema(table: pa.Table) -> pa.Schema:
+
+    fields = [field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in table.schema]
+    return pa.schema(fields, metadata = table.schema.metadata)
+
+# Convert a stream of DataFrame chunks into Arrow record batches sharing the schema of the first chunk
+def frames_to_batches(frames: Iterable[pd.DataFrame]) -> tuple[pa.Schema, Iterator[pa.RecordBatch]]:
+
+    frames = iter(frames)
+    first_table = _to_arrow_table(next(frames))
+    schema = _stream_schema(first_table)
+
+    def batches() -> Iterator[pa.RecordBatch]:
+        yield from first_table.cast(schema).to_batches()
+        for frame in frames:
+            yield from _to_arrow_table(frame, schema = schema).to_batches()
+
+    return schema, batches()
+
+# Serialize a DataFrame into a single Arrow IPC stream blob
+def dataframe_to_ipc(df: pd.DataFrame) -> bytes:
+
+    with track("serialize_arrow") as sample:
+        table = _to_arrow_table(df)
+        sink = pa.BufferOutputStream()
+
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+
+        payload = sink.getvalue().to_pybytes()
+        sample.update({"bytes": len(payload), "rows_in": len(df)})
+
+    return payload
+
+# Rebuild a DataFrame from an Arrow IPC blob; numeric columns are backed by the blob itself where possible
+def dataframe_from_ipc(payload: bytes | pa.Buffer) -> pd.DataFrame:
+
+    table = pa.ipc.open_stream(pa.py_buffer(payload)).read_all()
+    return table.to_pandas(split_blocks = True, self_destruct = True)
+
+# Store a merge result as a small JSON metadata record plus a binary columnar payload
+async def set_merge_result(cache: Backend, cache_key: str, df: pd.DataFrame, metadata: dict, expire: int = settings.MERGE_CACHE_TTL) -> None:
+
+    payload = await run_cpu(dataframe_to_ipc, df)
+
+    record = dict(metadata)
+    record.update({
+        "format": PAYLOAD_FORMAT,
+        "rows": len(df),
+        "columns": [str(column) for column in df.columns],
+        "payload_bytes": len(payload)
+    })
+
+    with track("cache_set") as sample:
+        await cache.set(_payload_key(cache_key), payload, expire = expire)
+        await cache.set(cache_key, json.dumps(record, default = str), expire = expire)
+        sample["bytes"] = len(payload)
+
+# Write a stream of chunks to an Arrow IPC file in the spill directory; returns the payload description. The chunks
+# go to a unique temporary file renamed onto the payload path once complete, so concurrent writers never interleave
+def write_chunks_to_spill(cache_key: str, chunks: Iterable[pd.DataFrame]) -> dict:
+
+    directory = spill_directory()
+    _sweep_spill_files(directory)
+
+    payload_path = os.path.join(directory, f"{cache_key}.arrow")
+    descriptor, temp_path = tempfile.mkstemp(dir = directory, prefix = f"{cache_key}.", suffix = ".arrow.tmp")
+    os.close(descriptor)
+    rows = 0
+    columns = []
+    writer = None
+
+    # Chunks of an out-of-core merge are produced while they are written, so this stage includes that join work
+    with track("serialize_arrow") as sample:
+        try:
+            for chunk in chunks:
+                if writer is None:
+                    first_table = _to_arrow_table(chunk)
+                    schema = _stream_schema(first_table)
+                    columns = [str(column) for column in chunk.columns]
+                    writer = pa.ipc.new_file(temp_path, schema)
+                    writer.write_table(first_table.cast(schema))
+                else:
+                    writer.write_table(_to_arrow_table(chunk, schema = schema))
+                rows += len(chunk)
+        except Exception:
+            if writer is not None:
+                writer.close()
+            os.remove(temp_path)
+            raise
+
+        if writer is not None:
+            writer.close()
+            os.replace(temp_path, payload_path)
+        else:
+            os.remove(temp_path)
+
+        sample.update({"rows_in": rows, "bytes": os.path.getsize(payload_path) if writer is not None else 0})
+
+    return {
+        "format": PAYLOAD_FORMAT,
+        "rows": rows,
+        "columns": columns,
+        "payload_path": payload_path,
+        "payload_bytes": os.path.getsize(payload_path) if writer is not None else 0
+    }
+
+# Store a merge result streamed as chunks; the payload goes to an Arrow IPC file in the spill directory
+# so results larger than memory never have to be held at once
+async def set_merge_result_from_chunks(cache: Backend, cache_key: str, chunks: Iterable[pd.DataFrame], metadata: dict, expire: int = settings.MERGE_CACHE_TTL) -> None:
+
+    record = dict(metadata)
+    record.update(await run_cpu(write_chunks_to_spill, cache_key, chunks))
+
+    with track("cache_set"):
+        await cache.set(cache_key, json.dumps(record, default = str), expire = expire)
+
+# Fetch only the metadata record of a cached merge result
+async def get_merge_metadata(cache: Backend, cache_key: str) -> dict | None:
+
+    with track("cache_get"):
+        cached_json = await cache.get(cache_key)
+
+    if not cached_json:
+        return None
+
+    return json.loads(cached_json)
+
+# Whether the payload a metadata record points to is still available
+async def has_merge_payload(cache: Backend, cache_key: str, metadata: dict) -> bool:
+
+    if metadata.get("payload_path"):
+        return os.path.exists(metadata["payload_path"])
+
+    return bool(await _get_payload(cache, cache_key))
+
+# Metadata of a cached merge result whose payload is still available, for reuse by identical requests
+async def get_reusable_merge(cache: Backend, cache_key: str) -> dict | None:
+
+    try:
+        metadata = await get_merge_metadata(cache, cache_key)
+    except json.JSONDecodeError:
+        return None
+
+    if metadata is None or not await has_merge_payload(cache, cache_key, metadata):
+        return None
+
+    return metadata
+
+# Open a cached merge result as its Arrow schema plus an iterator of record batches;
+# spilled payloads are memory-mapped rather than read into memory
+async def open_merge_batches(cache: Backend, cache_key: str, metadata: dict) -> tuple[pa.Schema, Iterator[pa.RecordBatch]] | None:
+
+    payload_path = metadata.get("payload_path")
+
+    if payload_path:
+        if not os.path.exists(payload_path):
+            return None
+        reader = pa.ipc.open_file(pa.memory_map(payload_path))
+        return reader.schema, (reader.get_batch(i) for i in range(reader.num_record_batches))
+
+    with track("cache_get") as sample:
+        payload = await _get_payload(cache, cache_key)
+        sample["bytes"] = len(payload) if payload else 0
+
+    if not payload:
+        return None
+
+    reader = pa.ipc.open_stream(pa.py_buffer(payload))
+    return reader.schema, iter(reader)
+
+# Iterate a cached merge result as DataFrame chunks, one per Arrow record batch
+async def iter_merge_chunks(cache: Backend, cache_key: str, metadata: dict) -> Iterator[pd.DataFrame] | None:
+
+    opened = await open_merge_batches(cache, cache_key, metadata)
+    if opened is None:
+        return None
+
+    return (batch.to_pandas() for batch in opened[1])
+
+# Fetch the merged DataFrame of a cached merge result
+async def get_merge_dataframe(cache: Backend, cache_key: str, metadata: dict) -> pd.DataFrame | None:
+
+    payload_path = metadata.get("payload_path")
+
+    if payload_path:
+        if not os.path.exists(payload_path):
+            return None
+        table = pa.ipc.open_file(pa.memory_map(payload_path)).read_all()
+        return table.to_pandas(split_blocks = True)
+
+    with track("cache_get") as sample:
+        payload = await _get_payload(cache, cache_key)
+        sample["bytes"] = len(payload) if payload else 0
+
+    if not payload:
+        return None
+
+    return dataframe_from_ipc(payload)
+
+# Output-format copies being written in this process, by cache key
+_staging_tasks: dict[str, asyncio.Task] = {}
+
+async def _stage_merge_output(cache: Backend, cache_key: str) -> None:
+
+    try:
+        metadata = await get_merge_metadata(cache, cache_key)
+        if metadata is None:
+            return
+
+        # Most results are never saved, and small ones serialize quickly when they are
+        if metadata.get("payload_bytes", 0) < settings.MERGE_STAGING_MIN_BYTES:
+            return
+
+        file_format = metadata["merged_filename"].split('.')[-1]
+
+        # Merges are content-addressed, so a staged copy from an earlier identical merge is still valid
+        if await run_io(object_exists, staging_object_name(cache_key, file_format)):
+            return
+
+        chunks = await iter_merge_chunks(cache, cache_key, metadata)
+        if chunks is None:
+            return
+
+        await run_io(stage_merged_output, chunks, cache_key, file_format)
+
+    except Exception as e:
+        print(f"Could not stage merged output for {cache_key}: {e}")
+
+# Start writing a cached merge result in its output format to MinIO in the background
+def start_staging(cache: Backend, cache_key: str) -> None:
+
+    if not settings.MERGE_STAGING_ENABLED or cache_key in _staging_tasks:
+        return
+
+    task = asyncio.create_task(_stage_merge_output(cache, cache_key))
+    _staging_tasks[cache_key] = task
+    task.add_done_callback(lambda _: _staging_tasks.pop(cache_key, None))
+
+# Wait for a staging write of this process that is still running, so a save does not serialize the result a second time
+async def wait_for_staging(cache_key: str) -> None:
+
+    task = _staging_tasks.get(cache_key)
+    if task is not None:
+        await asyncio.shield(task)
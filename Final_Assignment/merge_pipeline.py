@@ -0,0 +1,347 @@
+from collections.abc import Iterator, Sequence
+from fastapi import HTTPException
+from minio_client import download_chunks_from_minio
+from merge_cache import spill_directory
+from external_merge import external_merge, partition_count, MEMORY_EXPANSION_FACTOR
+from profiling import estimate_join_rows, filter_selectivity, joined_profile
+from pushdown import NO_PUSHDOWN, pushdown_identity, pushdown_tag
+from compaction import align_key_dtypes
+from key_index import KeyIndex, prune_chunks
+from metrics import track
+from config import settings
+import itertools
+import pandas as pd
+
+# Validate that two file records can be merged and describe the merge result for the cache; a merge
+# with pushdowns gets their tag in its name, so saving it never replaces the result of a full merge
+def build_merge_metadata(file_record_1, file_record_2, join_type: str, pushdowns: list[dict] | None = None) -> dict:
+
+    full_name_1 = f"{file_record_1.file_name}.{file_record_1.file_format}"
+    full_name_2 = f"{file_record_2.file_name}.{file_record_2.file_format}"
+
+    if file_record_1.file_format != file_record_2.file_format:
+        print(f"File format mismatch: {file_record_1.file_format} vs {file_record_2.file_format}")
+        raise HTTPException(status_code = 400, detail = "File format mismatch. Both files must be of the same format to merge.")
+    
+    tag = pushdown_tag(pushdown_identity(pushdowns))
+    suffix = f"_{tag}" if tag else ""
+
+    if file_record_1.file_format == "csv":
+        merged_filename = f"merged_{file_record_1.file_name}_{file_record_2.file_name}_via_{join_type}{suffix}.csv"
+    elif file_record_1.file_format == "xlsx":
+        merged_filename = f"merged_{file_record_1.file_name}_{file_record_2.file_name}_via_{join_type}{suffix}.xlsx"
+    else:
+        print(f"Unsupported file format: {file_record_1.file_format}")
+        raise HTTPException(status_code = 400, detail = "Unsupported file format.")
+
+    return {
+        "file1_name": full_name_1,
+        "file2_name": full_name_2,
+        "join_type": join_type,
+        "merged_filename": merged_filename
+    }
+
+# Check the join column against the catalogs of both files before anything is downloaded and estimate
+# the merge result of the rows and columns the pushdowns keep; returns None when a catalog is missing
+# or was profiled from a different object version
+def check_merge_catalog(schema_1, schema_2, etags: list[str], file_sizes: list[int], common_column: str, join_type: str, pushdowns: Sequence[dict] = (NO_PUSHDOWN, NO_PUSHDOWN)) -> dict | None:
+
+    if schema_1 is None or schema_2 is None:
+        return None
+
+    if [schema.etag for schema in (schema_1, schema_2)] != [etag.strip('"') for etag in etags]:
+        return None
+
+    for schema in (schema_1, schema_2):
+        if common_column not in [column["name"] for column in schema.columns]:
+            print(f"Common column {common_column} not found in one or both files.")
+            raise HTTPException(status_code = 400, detail = f"Common column {common_column} not found in one or both files.")
+
+    profile_1 = {"row_count": schema_1.row_count, "columns": schema_1.columns}
+    profile_2 = {"row_count": schema_2.row_count, "columns": schema_2.columns}
+    selectivities = (filter_selectivity(profile_1, pushdowns[0]["filters"]), filter_selectivity(profile_2, pushdowns[1]["filters"]))
+
+    estimated_rows = estimate_join_rows(profile_1, profile_2, common_column, join_type, selectivities)
+    if estimated_rows is None:
+        return {"rows": None, "bytes": None}
+
+    # Output rows carry the columns of both inputs; size them by the average on-disk row width of each,
+    # scaled to the share of its columns the projection keeps
+    row_width = 0
+    for size, schema, pushdown in zip(file_sizes, (schema_1, schema_2), pushdowns):
+        projected = len(pushdown["columns"]) / max(len(schema.columns), 1) if pushdown["columns"] is not None else 1
+        row_width += size / max(schema.row_count, 1) * min(projected, 1)
+
+    return {"rows": estimated_rows, "bytes": int(estimated_rows * row_width * MEMORY_EXPANSION_FACTOR)}
+
+# Validate that a chain of file records can be merged and describe the result for the cache
+def build_merge_chain_metadata(file_records: list, joins: list[tuple[str, str]]) -> dict:
+
+    file_formats = {file_record.file_format for file_record in file_records}
+
+    if len(file_formats) > 1:
+        print(f"File format mismatch: {', '.join(sorted(file_formats))}")
+        raise HTTPException(status_code = 400, detail = "File format mismatch. All files must be of the same format to merge.")
+
+    file_format = file_records[0].file_format
+
+    if file_format not in ("csv", "xlsx"):
+        print(f"Unsupported file format: {file_format}")
+        raise HTTPException(status_code = 400, detail = "Unsupported file format.")
+
+    file_names = "_".join(file_record.file_name for file_record in file_records)
+    join_types = "_".join(join_type for _, join_type in joins)
+
+    return {
+        "file_names": [f"{file_record.file_name}.{file_record.file_format}" for file_record in file_records],
+        "joins": [{"common_column": common_column, "join_type": join_type} for common_column, join_type in joins],
+        "merged_filename": f"merged_{file_names}_via_{join_types}.{file_format}"
+    }
+
+# Column names after joining two column lists the way pd.merge names them (shared non-key columns get _x / _y)
+def _joined_columns(left: list[str], right: list[str], common_column: str) -> list[str]:
+
+    shared = set(left).intersection(right) - {common_column}
+
+    return (
+        [f"{name}_x" if name in shared else name for name in left]
+        + [f"{name}_y" if name in shared else name for name in right if name != common_column]
+    )
+
+# Estimated rows, profile and peak working set of a left-deep join order; rows is None once a join cannot be estimated
+def _estimate_chain(profiles: list[dict], row_widths: list[float], order: list[int], steps: list[tuple[str, str]]) -> dict:
+
+    profile = profiles[order[0]]
+    row_width = row_widths[order[0]]
+    estimate = {"cost": 0, "rows": profile["row_count"], "bytes": 0}
+
+    for index, (common_column, join_type) in zip(order[1:], steps):
+        rows = estimate_join_rows(profile, profiles[index], common_column, join_type)
+        if rows is None:
+            return {"cost": None, "rows": None, "bytes": None}
+
+        profile = joined_profile(profile, profiles[index], common_column, join_type, rows)
+        row_width += row_widths[index]
+
+        estimate["cost"] += rows
+        estimate["rows"] = rows
+        estimate["bytes"] = max(estimate["bytes"], int(rows * row_width * MEMORY_EXPANSION_FACTOR))
+
+    return estimate
+
+# Cheapest left-deep order of a chain of inner joins, by the sum of estimated intermediate rows (dynamic
+# programming over subsets of files). A file can only join a subset it shares exactly one column with,
+# so every join stays a single-column join and no column is ever suffixed
+def _cheapest_inner_order(profiles: list[dict], row_widths: list[float]) -> tuple[list[int], list[tuple[str, str]]] | None:
+
+    names = [{column["name"] for column in profile["columns"]} for profile in profiles]
+    best = {1 << index: {"cost": 0, "order": [index], "steps": [], "profile": profile, "columns": names[index]} for index, profile in enumerate(profiles)}
+
+    # Subsets only grow, so visiting them in numeric order sees every subset before its supersets
+    for subset in range(1, 1 << len(profiles)):
+        plan = best.get(subset)
+        if plan is None:
+            continue
+
+        for index in range(len(profiles)):
+            if subset & (1 << index):
+                continue
+
+            shared = plan["columns"] & names[index]
+            if len(shared) != 1:
+                continue
+
+            common_column = next(iter(shared))
+            rows = estimate_join_rows(plan["profile"], profiles[index], common_column, "inner")
+            if rows is None:
+                continue
+
+            cost = plan["cost"] + rows
+            candidate = best.get(subset | (1 << index))
+
+            if candidate is None or cost < candidate["cost"]:
+                best[subset | (1 << index)] = {
+                    "cost": cost,
+                    "order": plan["order"] + [index],
+                    "steps": plan["steps"] + [(common_column, "inner")],
+                    "profile": joined_profile(plan["profile"], profiles[index], common_column, "inner", rows),
+                    "columns": plan["columns"] | names[index]
+                }
+
+    plan = best.get((1 << len(profiles)) - 1)
+    return (plan["order"], plan["steps"]) if plan else None
+
+# Plan a merge chain ((file 1 join file 2) join file 3) ... from the column catalog. Join columns are checked
+# before anything is downloaded. When every join is inner and the inputs share no column besides their join
+# keys, the chain is a natural join, which yields the same rows in any order: the order with the smallest
+# estimated intermediates is picked and the columns are put back in the order the chain as written produces
+# (rows may come out in a different order). Chains with outer, left or right joins always run as written
+def plan_merge_chain(schemas: list, etags: list[str], file_sizes: list[int], joins: list[tuple[str, str]]) -> dict:
+
+    plan = {"order": list(range(len(schemas))), "steps": list(joins), "columns": None, "rows": None, "bytes": None}
+
+    if any(schema is None for schema in schemas) or [schema.etag for schema in schemas] != [etag.strip('"') for etag in etags]:
+        return plan
+
+    profiles = [{"row_count": schema.row_count, "columns": schema.columns} for schema in schemas]
+    row_widths = [size / max(schema.row_count, 1) for size, schema in zip(file_sizes, schemas)]
+
+    columns = [column["name"] for column in schemas[0].columns]
+    natural = True
+
+    for schema, (common_column, _) in zip(schemas[1:], joins):
+        right_columns = [column["name"] for column in schema.columns]
+
+        if common_column not in columns or common_column not in right_columns:
+            print(f"Common column {common_column} not found in one or both files.")
+            raise HTTPException(status_code = 400, detail = f"Common column {common_column} not found in one or both files.")
+
+        natural = natural and set(columns).intersection(right_columns) == {common_column}
+        columns = _joined_columns(columns, right_columns, common_column)
+
+    estimate = _estimate_chain(profiles, row_widths, plan["order"], plan["steps"])
+    plan.update({"rows": estimate["rows"], "bytes": estimate["bytes"]})
+
+    if not natural or len(schemas) < 3 or any(join_type != "inner" for _, join_type in joins) or estimate["cost"] is None:
+        return plan
+
+    cheapest = _cheapest_inner_order(profiles, row_widths)
+    if cheapest is None:
+        return plan
+
+    order, steps = cheapest
+    reordered = _estimate_chain(profiles, row_widths, order, steps)
+
+    if reordered["cost"] < estimate["cost"]:
+        plan.update({"order": order, "steps": steps, "columns": columns, "rows": reordered["rows"], "bytes": reordered["bytes"]})
+
+    return plan
+
+def normalize_columns(chunks: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+
+    # Specifically adding for excel files
+    for chunk in chunks:
+        chunk.columns = chunk.columns.str.strip().str.lower()
+        yield chunk
+
+def peek_columns(chunks: Iterator[pd.DataFrame]) -> tuple[pd.Index, Iterator[pd.DataFrame]]:
+
+    first_chunk = next(chunks)
+    return first_chunk.columns, itertools.chain([first_chunk], chunks)
+
+# First rows of a merge result as JSON-ready records; missing values of every dtype (NaN, NaT, pd.NA) become None
+def preview_records(df: pd.DataFrame) -> list[dict]:
+
+    head = df.head()
+    return head.astype(object).where(head.notna(), None).to_dict(orient = "records")
+
+# Normalize column names, check the join column and merge two in-memory frames
+def merge_frames(df1: pd.DataFrame, df2: pd.DataFrame, common_column: str, join_type: str) -> pd.DataFrame:
+
+    df1.columns = df1.columns.str.strip().str.lower()
+    df2.columns = df2.columns.str.strip().str.lower()
+
+    if common_column not in df1.columns or common_column not in df2.columns:
+        print(f"Common column {common_column} not found in one or both files.")
+        raise HTTPException(status_code = 400, detail = f"Common column {common_column} not found in one or both files.")
+
+    if settings.FRAME_COMPACTION_ENABLED:
+        df1, df2 = align_key_dtypes(df1, df2, common_column)
+
+    with track("merge") as sample:
+        sample["rows_in"] = len(df1) + len(df2)
+        merged_df = pd.merge(df1, df2, on = common_column, how = join_type)
+
+        sample["rows_out"] = len(merged_df)
+
+    return merged_df
+
+# Partition both inputs to local spill files and start streaming the join; returns the preview and all result chunks
+def start_out_of_core_merge(file_record_1, file_record_2, common_column: str, join_type: str, file_sizes: list[int], key_indexes: Sequence[KeyIndex | None] = (None, None), pushdowns: Sequence[dict] = (NO_PUSHDOWN, NO_PUSHDOWN)) -> tuple[list[dict], Iterator[pd.DataFrame]]:
+
+    full_name_1 = f"{file_record_1.file_name}.{file_record_1.file_format}"
+    full_name_2 = f"{file_record_2.file_name}.{file_record_2.file_format}"
+
+    spill_dir = spill_directory()
+    columns_1, chunks_1 = peek_columns(normalize_columns(download_chunks_from_minio(full_name_1, settings.MERGE_CHUNK_ROWS, spill_dir, file_record_1.parquet_object, **pushdowns[0])))
+    columns_2, chunks_2 = peek_columns(normalize_columns(download_chunks_from_minio(full_name_2, settings.MERGE_CHUNK_ROWS, spill_dir, file_record_2.parquet_object, **pushdowns[1])))
+
+    if common_column not in columns_1 or common_column not in columns_2:
+        print(f"Common column {common_column} not found in one or both files.")
+        raise HTTPException(status_code = 400, detail = f"Common column {common_column} not found in one or both files.")
+
+    # Semi-join pruning: rows whose key is not in the other file's Bloom filter are dropped before they are spilled
+    if join_type in ("inner", "left") and key_indexes[0] is not None:
+        chunks_2 = prune_chunks(chunks_2, common_column, key_indexes[0].bloom)
+    if join_type == "inner" and key_indexes[1] is not None:
+        chunks_1 = prune_chunks(chunks_1, common_column, key_indexes[1].bloom)
+
+    num_partitions = partition_count(sum(file_sizes) * MEMORY_EXPANSION_FACTOR, settings.MERGE_MEMORY_LIMIT_BYTES)
+    print(f"Merging {full_name_1} and {full_name_2} out of core with {num_partitions} partitions.")
+
+    merged_chunks = external_merge(chunks_1, chunks_2, common_column, join_type, num_partitions, spill_dir, settings.MERGE_CHUNK_ROWS)
+    first_chunk = next(merged_chunks)
+
+    return preview_records(first_chunk), itertools.chain([first_chunk], merged_chunks)
+
+# Run a planned merge chain on in-memory frames (given in the chain's written order); each intermediate
+# result is only kept until the next join has consumed it
+def merge_chain(frames: list[pd.DataFrame], plan: dict) -> pd.DataFrame:
+
+    for df in frames:
+        df.columns = df.columns.str.strip().str.lower()
+
+    order = plan["order"]
+    merged_df = frames[order[0]]
+
+    for index, (common_column, join_type) in zip(order[1:], plan["steps"]):
+        if common_column not in merged_df.columns or common_column not in frames[index].columns:
+            print(f"Common column {common_column} not found in one or both files.")
+            raise HTTPException(status_code = 400, detail = f"Common column {common_column} not found in one or both files.")
+
+        right_df = frames[index]
+        if settings.FRAME_COMPACTION_ENABLED:
+            merged_df, right_df = align_key_dtypes(merged_df, right_df, common_column)
+
+        with track("merge") as sample:
+            sample["rows_in"] = len(merged_df) + len(right_df)
+            merged_df = pd.merge(merged_df, right_df, on = common_column, how = join_type)
+            sample["rows_out"] = len(merged_df)
+
+    if plan["columns"] is not None:
+        merged_df = merged_df[plan["columns"]]
+
+    return merged_df
+
+# Stream a planned merge chain out of core: every join is an external merge fed by the chunks of the one
+# before it, so intermediate results only ever exist as spill partitions; returns the preview and all result chunks
+def start_out_of_core_chain(file_records: list, plan: dict, file_sizes: list[int]) -> tuple[list[dict], Iterator[pd.DataFrame]]:
+
+    spill_dir = spill_directory()
+    num_partitions = partition_count(sum(file_sizes) * MEMORY_EXPANSION_FACTOR, settings.MERGE_MEMORY_LIMIT_BYTES)
+
+    def read_chunks(index: int) -> tuple[pd.Index, Iterator[pd.DataFrame]]:
+        file_record = file_records[index]
+        full_name = f"{file_record.file_name}.{file_record.file_format}"
+        return peek_columns(normalize_columns(download_chunks_from_minio(full_name, settings.MERGE_CHUNK_ROWS, spill_dir, file_record.parquet_object)))
+
+    order = plan["order"]
+    print(f"Merging {len(order)} files out of core with {num_partitions} partitions per join.")
+
+    columns, merged_chunks = read_chunks(order[0])
+
+    for index, (common_column, join_type) in zip(order[1:], plan["steps"]):
+        right_columns, right_chunks = read_chunks(index)
+
+        if common_column not in columns or common_column not in right_columns:
+            print(f"Common column {common_column} not found in one or both files.")
+            raise HTTPException(status_code = 400, detail = f"Common column {common_column} not found in one or both files.")
+
+        columns, merged_chunks = peek_columns(external_merge(merged_chunks, right_chunks, common_column, join_type, num_partitions, spill_dir, settings.MERGE_CHUNK_ROWS))
+
+    if plan["columns"] is not None:
+        merged_chunks = (chunk[plan["columns"]] for chunk in merged_chunks)
+
+    first_chunk = next(merged_chunks)
+
+    return preview_records(first_chunk), itertools.chain([first_chunk], merged_chunks)
@@ -0,0 +1,96 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from prometheus_client import CONTENT_TYPE_LATEST, Gauge, Histogram, generate_latest
+import sys
+import time
+
+# Hot-path instrumentation: every stage (download, parse, merge, serialize, cache get/set, MinIO put)
+# records its duration, bytes and rows in Prometheus histograms served on /metrics, and the stages of
+# the current request can be reported back in a Server-Timing header. Merge jobs run in worker
+# processes and report their stage timings on the job instead.
+
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+BYTES_BUCKETS = tuple(4 ** exponent * 1024 for exponent in range(0, 12))
+ROWS_BUCKETS = tuple(10 ** exponent for exponent in range(0, 9))
+
+STAGE_SECONDS = Histogram("npcyf_stage_duration_seconds", "Time spent in a hot-path stage.", ["stage"], buckets = SECONDS_BUCKETS)
+STAGE_BYTES = Histogram("npcyf_stage_bytes", "Bytes read or written by a hot-path stage.", ["stage"], buckets = BYTES_BUCKETS)
+STAGE_ROWS = Histogram("npcyf_stage_rows", "Rows going into and coming out of a hot-path stage.", ["stage", "direction"], buckets = ROWS_BUCKETS)
+STAGE_PEAK_RSS = Gauge("npcyf_stage_peak_rss_bytes", "Peak resident set size of the process when a stage last finished.", ["stage"])
+FRAME_MEMORY = Histogram("npcyf_frame_memory_bytes", "In-memory size of parsed merge inputs before and after compaction.", ["state"], buckets = BYTES_BUCKETS)
+PEAK_RSS = Gauge("npcyf_process_peak_rss_bytes", "Peak resident set size of the process.")
+STARTUP_SECONDS = Gauge("npcyf_startup_seconds", "Time from the start of a worker until it reached each startup phase.", ["phase"])
+
+REQUEST_SECONDS = Histogram("npcyf_request_duration_seconds", "Time to produce a response, by route.", ["method", "route", "status"], buckets = SECONDS_BUCKETS)
+
+# Stage timings of the request being handled; None outside requests or when Server-Timing is off
+_request_timings: ContextVar[list | None] = ContextVar("request_timings", default = None)
+
+# Peak RSS in bytes (ru_maxrss is in kilobytes on Linux and bytes on macOS); None where unavailable
+def peak_rss_bytes() -> int | None:
+
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+PEAK_RSS.set_function(lambda: peak_rss_bytes() or 0)
+
+# Time a stage; the block can fill in "bytes", "rows_in" and "rows_out" on the yielded sample
+@contextmanager
+def track(stage: str) -> Iterator[dict]:
+
+    sample = {}
+    started = time.perf_counter()
+
+    try:
+        yield sample
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage).observe(elapsed)
+
+        if sample.get("bytes") is not None:
+            STAGE_BYTES.labels(stage).observe(sample["bytes"])
+        if sample.get("rows_in") is not None:
+            STAGE_ROWS.labels(stage, "in").observe(sample["rows_in"])
+        if sample.get("rows_out") is not None:
+            STAGE_ROWS.labels(stage, "out").observe(sample["rows_out"])
+
+        peak = peak_rss_bytes()
+        if peak is not None:
+            STAGE_PEAK_RSS.labels(stage).set(peak)
+
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, elapsed))
+
+# Start collecting the stages of a request for its Server-Timing header
+def start_request_timings() -> list:
+
+    timings = []
+    _request_timings.set(timings)
+    return timings
+
+# Server-Timing header value: one entry per stage, repeated stages summed, durations in milliseconds
+def server_timing_header(timings: list, total: float) -> str:
+
+    durations = {}
+    for stage, elapsed in timings:
+        durations[stage] = durations.get(stage, 0.0) + elapsed
+
+    entries = [f"{stage};dur={elapsed * 1000:.1f}" for stage, elapsed in durations.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+
+    return ", ".join(entries)
+
+def observe_request(method: str, route: str, status: int, elapsed: float) -> None:
+    REQUEST_SECONDS.labels(method, route, str(status)).observe(elapsed)
+
+def render_metrics() -> bytes:
+    return generate_latest()
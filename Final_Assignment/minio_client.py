@@ -1,99 +1,666 @@
-from minio import Minio
-from config import settings
-from fastapi import UploadFile, HTTPException
-import io
-import pandas as pd
-
-minio_client = Minio(
-    endpoint = settings.MINIO_ENDPOINT,
-    access_key = settings.MINIO_ACCESS_KEY,
-    secret_key = settings.MINIO_SECRET_KEY,
-    secure = False
-)
-
-try:
-    if not minio_client.bucket_exists(settings.MINIO_BUCKET):
-        minio_client.make_bucket(settings.MINIO_BUCKET)
-    print(f"Successfully connected to bucket '{settings.MINIO_BUCKET}'")
-
-except Exception as e:
-    print(f"Could not connect to MinIO: {e}")
-    raise HTTPException(status_code = 500, detail = "MinIO connection failed")
-
-# Upload file to MinIO
-def upload_to_minio(file: UploadFile, file_name: str) -> None:
-    
-    try:
-        file_content = file.file.read()
-        file_size = len(file_content)
-        
-        file_stream = io.BytesIO(file_content)
-        file_stream.seek(0)
-        
-        minio_client.put_object(
-            settings.MINIO_BUCKET,
-            file_name,
-            file_stream,
-            length = file_size
-        )
-        print(f"Successfully uploaded {file_name} to MinIO.")
-        
-    except Exception as e:
-        raise HTTPException(status_code = 500, detail = f"MinIO upload failed: {e}")
-
-# Download file from MinIO
-def download_from_minio(file_name: str) -> pd.DataFrame:
-    
-    try:
-        response = minio_client.get_object(settings.MINIO_BUCKET, file_name)
-        
-        file_data = response.read()
-        file_extension = file_name.split('.')[-1]
-        
-        if file_extension == "csv":
-            df = pd.read_csv(io.BytesIO(file_data))
-        elif file_extension == "xlsx":
-            df = pd.read_excel(io.BytesIO(file_data))
-        else:
-            print(f"Unsupported file format for download: {file_extension}")
-            raise HTTPException(status_code = 400, detail = "Unsupported file format for download.")
-        
-        return df
-    
-    except Exception as e:
-        print(f"Error occurred while downloading file from MinIO: {e}")
-        raise HTTPException(status_code = 500, detail = f"MinIO download failed for {file_name}: {e}")
-    finally:
-        if 'response' in locals() and response:
-            response.close()
-            response.release_conn()
-
-# Save merged DataFrame back to MinIO
-def upload_merged_to_minio(df: pd.DataFrame, merged_file_name: str, file_format: str) -> None:
-    
-    try:
-        file_stream = io.BytesIO()
-        
-        if file_format == "csv":
-            df.to_csv(file_stream, index = False)
-        elif file_format == "xlsx":
-            df.to_excel(file_stream, index = False)
-        else:
-            print(f"Unsupported file format for upload: {file_format}")
-            raise HTTPException(status_code = 400, detail = "Unsupported file format for upload.")
-        
-        file_stream.seek(0)
-        file_size = file_stream.getbuffer().nbytes
-        
-        minio_client.put_object(
-            settings.MINIO_BUCKET,
-            merged_file_name,
-            file_stream,
-            length = file_size
-        )
-        print(f"Successfully uploaded merged file {merged_file_name} to MinIO.")
-        
-    except Exception as e:
-        print(f"Error occurred while uploading merged file to MinIO: {e}")
-        raise HTTPException(status_code = 500, detail = f"MinIO upload failed for merged file: {e}")
-
+from collections.abc import Iterable, Iterator
+from minio import Minio
+from minio.commonconfig import REPLACE, ComposeSource, CopySource
+from minio.deleteobjects import DeleteObject
+from minio.error import S3Error
+from config import settings
+from fastapi import UploadFile, HTTPException
+from frame_cache import frame_cache
+from compaction import STRING_DTYPE, compact_frame
+from xlsx_io import read_xlsx, read_xlsx_chunks, write_xlsx
+from metrics import track
+from pushdown import apply_pushdown, apply_pushdown_chunks, is_full_read, read_columns
+import hashlib
+import io
+import itertools
+import os
+import tempfile
+import threading
+import time
+import uuid
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+minio_client = Minio(
+    endpoint = settings.MINIO_ENDPOINT,
+    access_key = settings.MINIO_ACCESS_KEY,
+    secret_key = settings.MINIO_SECRET_KEY,
+    secure = False
+)
+
+# Creating the client does not touch the network; the bucket is checked (and created) by ensure_bucket,
+# which the app runs during its startup warm-up instead of at import
+def ensure_bucket() -> None:
+
+    try:
+        if not minio_client.bucket_exists(settings.MINIO_BUCKET):
+            minio_client.make_bucket(settings.MINIO_BUCKET)
+        print(f"Successfully connected to bucket '{settings.MINIO_BUCKET}'")
+
+    except Exception as e:
+        print(f"Could not connect to MinIO: {e}")
+        raise
+
+PARQUET_PREFIX = "parquet/"
+STAGING_PREFIX = "staging/"
+DELTA_PREFIX = "deltas/"
+MERGE_KEY_METADATA = "x-amz-meta-merge-key"
+
+# Largest object a single server-side copy can produce; bigger ones are copied part by part
+COPY_OBJECT_MAX_BYTES = 5 * 1024 * 1024 * 1024
+
+# Every source of a server-side compose but the last must be at least this large
+COMPOSE_PART_MIN_BYTES = 5 * 1024 * 1024
+
+# Enough of a CSV object to parse its header row
+CSV_HEADER_BYTES = 1024 * 1024
+
+# Wraps a readable stream and computes its size and SHA-256 checksum as MinIO reads it
+class ChecksumReader:
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._digest = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._stream.read(size)
+        self._digest.update(chunk)
+        self.size += len(chunk)
+        return chunk
+
+    @property
+    def checksum(self) -> str:
+        return self._digest.hexdigest()
+
+# Upload file to MinIO
+def upload_to_minio(file: UploadFile, file_name: str) -> tuple[int, str, str]:
+    
+    try:
+        file.file.seek(0)
+        reader = ChecksumReader(file.file)
+
+        # Unknown length makes the SDK send multipart parts of part_size read straight off the spool,
+        # so memory stays bounded by part_size * parallel uploads instead of the file size.
+        with track("minio_put") as sample:
+            result = minio_client.put_object(
+                settings.MINIO_BUCKET,
+                file_name,
+                reader,
+                length = -1,
+                part_size = settings.MINIO_PART_SIZE,
+                num_parallel_uploads = settings.MINIO_PARALLEL_UPLOADS
+            )
+            sample["bytes"] = reader.size
+        frame_cache.invalidate(settings.MINIO_BUCKET, file_name)
+        print(f"Successfully uploaded {file_name} to MinIO ({reader.size} bytes, sha256 {reader.checksum}).")
+
+        return reader.size, reader.checksum, result.etag
+        
+    except Exception as e:
+        raise HTTPException(status_code = 500, detail = f"MinIO upload failed: {e}")
+
+# Whether an object is already stored under this name
+def object_exists(file_name: str) -> bool:
+
+    try:
+        minio_client.stat_object(settings.MINIO_BUCKET, file_name)
+        return True
+    except S3Error as e:
+        if e.code == "NoSuchKey":
+            return False
+        raise HTTPException(status_code = 500, detail = f"MinIO stat failed for {file_name}: {e}")
+
+# Delete several objects in one request; returns the names that could not be deleted
+def remove_objects_from_minio(object_names: list[str]) -> list[str]:
+
+    if not object_names:
+        return []
+
+    errors = minio_client.remove_objects(settings.MINIO_BUCKET, [DeleteObject(name) for name in object_names])
+    failed = [error.name for error in errors]
+
+    for name in object_names:
+        frame_cache.invalidate(settings.MINIO_BUCKET, name)
+
+    return failed
+
+# Object name of the typed Parquet copy kept next to an uploaded file
+def parquet_object_name(file_name: str) -> str:
+    return f"{PARQUET_PREFIX}{file_name}.parquet"
+
+def _parse_file(source, file_extension: str) -> pd.DataFrame:
+
+    if file_extension not in ("csv", "xlsx"):
+        print(f"Unsupported file format for download: {file_extension}")
+        raise HTTPException(status_code = 400, detail = "Unsupported file format for download.")
+
+    with track(f"parse_{file_extension}") as sample:
+        df = pd.read_csv(source) if file_extension == "csv" else read_xlsx(source)
+        sample["rows_out"] = len(df)
+
+    return df
+
+# Parse a file reading only the columns and rows a merge needs: CSV columns are skipped by the parser and
+# filters are applied a chunk at a time, so rows that are filtered out are never held all at once
+def _read_file(source, file_extension: str, columns: list[str] | None = None, filters: list[tuple] = ()) -> pd.DataFrame:
+
+    if is_full_read(columns, filters):
+        return _parse_file(source, file_extension)
+
+    if file_extension not in ("csv", "xlsx"):
+        print(f"Unsupported file format for download: {file_extension}")
+        raise HTTPException(status_code = 400, detail = "Unsupported file format for download.")
+
+    needed = read_columns(columns, filters)
+    usecols = (lambda name: name.strip().lower() in needed) if needed is not None else None
+
+    with track(f"parse_{file_extension}") as sample:
+        if file_extension == "csv" and not filters:
+            df = apply_pushdown(pd.read_csv(source, usecols = usecols), columns, filters)
+        else:
+            if file_extension == "csv":
+                chunks = pd.read_csv(source, usecols = usecols, chunksize = settings.MERGE_CHUNK_ROWS)
+            else:
+                chunks = read_xlsx_chunks(source, settings.MERGE_CHUNK_ROWS)
+            df = pd.concat(apply_pushdown_chunks(chunks, columns, filters), ignore_index = True)
+        sample["rows_out"] = len(df)
+
+    return df
+
+# Parse an uploaded stream; returns None when the file cannot be parsed
+def parse_upload(stream, file_name: str) -> pd.DataFrame | None:
+
+    try:
+        stream.seek(0)
+        return _parse_file(stream, file_name.split('.')[-1])
+    except Exception as e:
+        print(f"Could not parse {file_name}: {e}")
+        return None
+
+# Parse an upload once and store it as Parquet so merges can skip the CSV/XLSX parse;
+# returns None (and the original is used) when the copy cannot be written
+def upload_parquet_shadow(stream, file_name: str, df: pd.DataFrame | None = None) -> str | None:
+
+    object_name = parquet_object_name(file_name)
+
+    try:
+        if df is None:
+            stream.seek(0)
+            df = _parse_file(stream, file_name.split('.')[-1])
+
+        table = pa.Table.from_pandas(df, preserve_index = False)
+
+        with tempfile.SpooledTemporaryFile(max_size = settings.MINIO_PART_SIZE) as parquet_stream:
+            with track("serialize_parquet") as sample:
+                pq.write_table(table, parquet_stream)
+                sample.update({"bytes": parquet_stream.tell(), "rows_in": len(df)})
+            parquet_stream.seek(0)
+
+            with track("minio_put") as sample:
+                minio_client.put_object(
+                    settings.MINIO_BUCKET,
+                    object_name,
+                    parquet_stream,
+                    length = -1,
+                    part_size = settings.MINIO_PART_SIZE,
+                    num_parallel_uploads = settings.MINIO_PARALLEL_UPLOADS
+                )
+                sample["bytes"] = parquet_stream.tell()
+        frame_cache.invalidate(settings.MINIO_BUCKET, object_name)
+        print(f"Successfully uploaded Parquet copy {object_name} to MinIO.")
+
+        return object_name
+
+    except Exception as e:
+        print(f"Could not write Parquet copy of {file_name}, merges will read the original: {e}")
+        return None
+
+# Original column names of a Parquet file whose normalized (stripped, lower-cased) name is requested
+def _project_columns(schema: pa.Schema, columns: list[str] | None) -> list[str] | None:
+
+    if columns is None:
+        return None
+
+    wanted = set(columns)
+    return [name for name in schema.names if name.strip().lower() in wanted]
+
+# Frame cache key of a read; projected or filtered reads are cached separately from the full file
+def _frame_key(object_name: str, etag: str, columns: list[str] | None, filters: list[tuple]) -> tuple:
+
+    if is_full_read(columns, filters):
+        return (settings.MINIO_BUCKET, object_name, etag)
+
+    return (settings.MINIO_BUCKET, object_name, etag, tuple(columns) if columns is not None else None, tuple(filters))
+
+# Arrow data as pandas; with compaction on, text columns come out as Arrow-backed strings instead of Python objects
+def _arrow_to_pandas(data: pa.Table | pa.RecordBatch) -> pd.DataFrame:
+
+    if settings.FRAME_COMPACTION_ENABLED:
+        return data.to_pandas(types_mapper = {pa.string(): STRING_DTYPE, pa.large_string(): STRING_DTYPE}.get)
+
+    return data.to_pandas()
+
+# Read a Parquet file's projected columns; with filters, record batches are decoded and filtered one at a time
+def _read_parquet(parquet_file: pq.ParquetFile, columns: list[str] | None, filters: list[tuple]) -> pd.DataFrame:
+
+    needed = _project_columns(parquet_file.schema_arrow, read_columns(columns, filters))
+
+    if not filters:
+        df = _arrow_to_pandas(parquet_file.read(columns = needed))
+        return df if columns is None else apply_pushdown(df, columns, filters)
+
+    batches = parquet_file.iter_batches(batch_size = settings.MERGE_CHUNK_ROWS, columns = needed)
+    frames = list(apply_pushdown_chunks((_arrow_to_pandas(batch) for batch in batches), columns, filters))
+
+    # A file without rows has no batches
+    if not frames:
+        empty = parquet_file.schema_arrow.empty_table()
+        return apply_pushdown(_arrow_to_pandas(empty.select(needed) if needed is not None else empty), columns, filters)
+
+    return pd.concat(frames, ignore_index = True)
+
+# Download the Parquet copy of a file from MinIO, reading only the requested columns and rows
+def download_parquet_from_minio(parquet_object: str, columns: list[str] | None = None, filters: list[tuple] = ()) -> pd.DataFrame:
+
+    etag = minio_client.stat_object(settings.MINIO_BUCKET, parquet_object).etag
+    cache_key = _frame_key(parquet_object, etag, columns, filters)
+
+    cached_df = frame_cache.get(cache_key)
+    if cached_df is not None:
+        return cached_df
+
+    with track("download") as sample:
+        response = minio_client.get_object(settings.MINIO_BUCKET, parquet_object, request_headers = {"If-Match": etag})
+
+        try:
+            payload = response.read()
+            sample["bytes"] = len(payload)
+        finally:
+            response.close()
+            response.release_conn()
+
+    with track("parse_parquet") as sample:
+        df = _read_parquet(pq.ParquetFile(pa.BufferReader(payload)), columns, filters)
+        sample["rows_out"] = len(df)
+
+    if settings.FRAME_COMPACTION_ENABLED:
+        df = compact_frame(df, parquet_object)
+    frame_cache.put(cache_key, df)
+
+    return df.copy(deep = False)
+
+# Download file from MinIO, preferring its Parquet copy when one was recorded; columns (normalized names)
+# and filters (see pushdown.parse_filters) are applied while the file is read
+def download_from_minio(file_name: str, parquet_object: str | None = None, columns: list[str] | None = None, filters: list[tuple] = ()) -> pd.DataFrame:
+    
+    if parquet_object:
+        try:
+            return download_parquet_from_minio(parquet_object, columns, filters)
+        except HTTPException:
+            raise
+        except Exception as e:
+            print(f"Parquet copy {parquet_object} unavailable, reading {file_name} instead: {e}")
+
+    try:
+        # A cheap HEAD request tells us whether the parsed frame we already hold is still current
+        etag = minio_client.stat_object(settings.MINIO_BUCKET, file_name).etag
+        cache_key = _frame_key(file_name, etag, columns, filters)
+
+        cached_df = frame_cache.get(cache_key)
+        if cached_df is not None:
+            return cached_df
+
+        with track("download") as sample:
+            response = minio_client.get_object(settings.MINIO_BUCKET, file_name, request_headers = {"If-Match": etag})
+            file_data = response.read()
+            sample["bytes"] = len(file_data)
+
+        df = _read_file(io.BytesIO(file_data), file_name.split('.')[-1], columns, filters)
+
+        if settings.FRAME_COMPACTION_ENABLED:
+            df = compact_frame(df, file_name)
+        frame_cache.put(cache_key, df)
+
+        return df.copy(deep = False)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error occurred while downloading file from MinIO: {e}")
+        raise HTTPException(status_code = 500, detail = f"MinIO download failed for {file_name}: {e}")
+    finally:
+        if 'response' in locals() and response:
+            response.close()
+            response.release_conn()
+
+# Size and ETag of a stored object
+def get_object_stat(file_name: str):
+
+    try:
+        return minio_client.stat_object(settings.MINIO_BUCKET, file_name)
+
+    except Exception as e:
+        print(f"Error occurred while reading object metadata from MinIO: {e}")
+        raise HTTPException(status_code = 500, detail = f"MinIO stat failed for {file_name}: {e}")
+
+# Size in bytes of a stored object
+def get_object_size(file_name: str) -> int:
+    return get_object_stat(file_name).size
+
+# Merge key recorded on a saved merged object, or None when the object does not exist
+def get_merge_key_of_object(file_name: str) -> str | None:
+
+    try:
+        stat = minio_client.stat_object(settings.MINIO_BUCKET, file_name)
+    except S3Error as e:
+        if e.code in ("NoSuchKey", "NoSuchObject"):
+            return None
+        raise
+
+    return (stat.metadata or {}).get(MERGE_KEY_METADATA)
+
+def staging_object_name(cache_key: str, file_format: str) -> str:
+    return f"{STAGING_PREFIX}{cache_key}.{file_format}"
+
+# Staged objects written by this process and when; whether the objects left by earlier processes were swept
+_staged_objects: dict[str, float] = {}
+_staged_objects_lock = threading.Lock()
+_orphans_swept = False
+
+def _remove_staged(object_names: list[str]) -> None:
+
+    if object_names:
+        for error in minio_client.remove_objects(settings.MINIO_BUCKET, [DeleteObject(name) for name in object_names]):
+            print(f"Could not remove staged merge {error.name}: {error.message}")
+
+# Remove staged merge outputs older than the merge cache TTL; their cache entries (and so any save) are gone.
+# Only the objects this process staged are checked, so no listing is needed, except once per process for
+# the objects that earlier processes left behind
+def sweep_staged_merges() -> None:
+
+    global _orphans_swept
+    cutoff = time.time() - settings.MERGE_CACHE_TTL
+
+    with _staged_objects_lock:
+        expired = [name for name, staged_at in _staged_objects.items() if staged_at < cutoff]
+        for name in expired:
+            del _staged_objects[name]
+
+        sweep_orphans = not _orphans_swept
+        _orphans_swept = True
+
+    if sweep_orphans:
+        expired += [
+            item.object_name
+            for item in minio_client.list_objects(settings.MINIO_BUCKET, prefix = STAGING_PREFIX, recursive = True)
+            if item.last_modified is not None and item.last_modified.timestamp() < cutoff
+        ]
+
+    _remove_staged(expired)
+
+# Write a merge result in its output format to its staging object, ready to be saved with a server-side copy
+def stage_merged_output(chunks: Iterable[pd.DataFrame], cache_key: str, file_format: str) -> None:
+
+    sweep_staged_merges()
+
+    staging_name = staging_object_name(cache_key, file_format)
+    upload_merged_to_minio(chunks, staging_name, file_format, merge_key = cache_key)
+
+    with _staged_objects_lock:
+        _staged_objects[staging_name] = time.time()
+
+# Save a staged merge result under its final name with a server-side copy, then drop the staged object;
+# returns False when this merge was not staged (or already committed), so the caller has to upload it
+def commit_staged_merge(cache_key: str, merged_file_name: str, file_format: str) -> bool:
+
+    staging_name = staging_object_name(cache_key, file_format)
+
+    try:
+        stat = minio_client.stat_object(settings.MINIO_BUCKET, staging_name)
+    except S3Error as e:
+        if e.code in ("NoSuchKey", "NoSuchObject"):
+            return False
+        raise
+
+    metadata = {MERGE_KEY_METADATA: cache_key}
+
+    with track("minio_copy") as sample:
+        if stat.size > COPY_OBJECT_MAX_BYTES:
+            minio_client.compose_object(settings.MINIO_BUCKET, merged_file_name, [ComposeSource(settings.MINIO_BUCKET, staging_name)], metadata = metadata)
+        else:
+            minio_client.copy_object(settings.MINIO_BUCKET, merged_file_name, CopySource(settings.MINIO_BUCKET, staging_name), metadata = metadata, metadata_directive = REPLACE)
+        sample["bytes"] = stat.size
+
+    frame_cache.invalidate(settings.MINIO_BUCKET, merged_file_name)
+    minio_client.remove_object(settings.MINIO_BUCKET, staging_name)
+
+    with _staged_objects_lock:
+        _staged_objects.pop(staging_name, None)
+    print(f"Saved staged merge result {staging_name} as {merged_file_name}.")
+
+    return True
+
+def delta_object_name(file_name: str, sequence: int) -> str:
+    return f"{DELTA_PREFIX}{file_name}/{sequence:06d}.{file_name.split('.')[-1]}"
+
+# Rows reordered to a stored file's columns, matched by normalized name; 400 when the column sets differ
+def align_rows(rows: pd.DataFrame, columns: list, object_name: str) -> pd.DataFrame:
+
+    names = {str(column).strip().lower(): column for column in rows.columns}
+    wanted = [str(column).strip().lower() for column in columns]
+
+    missing = [column for column in wanted if column not in names]
+    unexpected = [column for column in names if column not in wanted]
+
+    if missing or unexpected:
+        print(f"Columns do not match {object_name}: missing {missing}, unexpected {unexpected}")
+        raise HTTPException(status_code = 400, detail = f"Columns do not match {object_name}. Missing: {', '.join(missing) or 'none'}; unexpected: {', '.join(unexpected) or 'none'}.")
+
+    rows = rows[[names[column] for column in wanted]]
+    rows.columns = columns
+
+    return rows
+
+def _csv_header(object_name: str, size: int) -> list:
+
+    response = minio_client.get_object(settings.MINIO_BUCKET, object_name, offset = 0, length = min(size, CSV_HEADER_BYTES))
+
+    try:
+        return list(pd.read_csv(io.BytesIO(response.read()), nrows = 0).columns)
+    finally:
+        response.close()
+        response.release_conn()
+
+# Appends to one object are serialized within this process; the ETag checks catch writers in other processes
+_append_locks: dict[str, threading.Lock] = {}
+_append_locks_lock = threading.Lock()
+
+def _append_lock(object_name: str) -> threading.Lock:
+
+    with _append_locks_lock:
+        return _append_locks.setdefault(object_name, threading.Lock())
+
+def _append_conflict(object_name: str) -> HTTPException:
+
+    print(f"{object_name} changed while rows were appended to it")
+    return HTTPException(status_code = 409, detail = f"{object_name} changed while the rows were appended. Please append them again.")
+
+# Before an object is rewritten with appended rows: fail when it changed since it was read (at etag)
+def _check_unchanged(object_name: str, etag: str) -> None:
+
+    if minio_client.stat_object(settings.MINIO_BUCKET, object_name).etag != etag:
+        raise _append_conflict(object_name)
+
+# Append rows to a stored CSV/XLSX file; returns its new ETag. A CSV gets the rows as a second object
+# composed onto it server-side when it is large enough to be a compose source, otherwise it is rewritten;
+# an xlsx workbook is always rewritten
+def append_rows_to_object(object_name: str, rows: pd.DataFrame, file_format: str) -> str:
+
+    with _append_lock(object_name):
+        return _append_rows(object_name, rows, file_format)
+
+def _append_rows(object_name: str, rows: pd.DataFrame, file_format: str) -> str:
+
+    stat = minio_client.stat_object(settings.MINIO_BUCKET, object_name)
+
+    if file_format == "xlsx":
+        columns, chunks = _peek_chunks(download_chunks_from_minio(object_name, settings.MERGE_CHUNK_ROWS))
+
+        with track("minio_append") as sample, tempfile.SpooledTemporaryFile(max_size = settings.MINIO_PART_SIZE) as file_stream:
+            write_xlsx(itertools.chain(chunks, [align_rows(rows, columns, object_name)]), file_stream)
+            file_stream.seek(0)
+
+            _check_unchanged(object_name, stat.etag)
+            result = minio_client.put_object(settings.MINIO_BUCKET, object_name, file_stream, length = -1, part_size = settings.MINIO_PART_SIZE)
+            sample.update({"bytes": file_stream.tell(), "rows_in": len(rows)})
+
+        frame_cache.invalidate(settings.MINIO_BUCKET, object_name)
+        print(f"Appended {len(rows)} rows to {object_name}.")
+
+        return result.etag
+
+    if file_format != "csv":
+        print(f"Unsupported file format for append: {file_format}")
+        raise HTTPException(status_code = 400, detail = "Unsupported file format for append.")
+
+    body = align_rows(rows, _csv_header(object_name, stat.size), object_name).to_csv(index = False, header = False).encode()
+
+    with track("minio_append") as sample:
+        last_byte = minio_client.get_object(settings.MINIO_BUCKET, object_name, offset = max(stat.size - 1, 0), length = 1, request_headers = {"If-Match": stat.etag})
+        try:
+            if last_byte.read() not in (b"\n", b""):
+                body = b"\n" + body
+        finally:
+            last_byte.close()
+            last_byte.release_conn()
+
+        if stat.size >= COMPOSE_PART_MIN_BYTES:
+            part_name = f"{DELTA_PREFIX}{object_name}/append-{uuid.uuid4().hex}.csv"
+            minio_client.put_object(settings.MINIO_BUCKET, part_name, io.BytesIO(body), length = len(body))
+
+            try:
+                result = minio_client.compose_object(settings.MINIO_BUCKET, object_name, [ComposeSource(settings.MINIO_BUCKET, object_name, match_etag = stat.etag), ComposeSource(settings.MINIO_BUCKET, part_name)])
+            finally:
+                minio_client.remove_object(settings.MINIO_BUCKET, part_name)
+        else:
+            response = minio_client.get_object(settings.MINIO_BUCKET, object_name, request_headers = {"If-Match": stat.etag})
+            try:
+                data = response.read() + body
+            finally:
+                response.close()
+                response.release_conn()
+
+            _check_unchanged(object_name, stat.etag)
+            result = minio_client.put_object(settings.MINIO_BUCKET, object_name, io.BytesIO(data), length = len(data))
+
+        sample.update({"bytes": len(body), "rows_in": len(rows)})
+
+    frame_cache.invalidate(settings.MINIO_BUCKET, object_name)
+    print(f"Appended {len(rows)} rows to {object_name}.")
+
+    return result.etag
+
+def _peek_chunks(chunks: Iterator[pd.DataFrame]) -> tuple[list, Iterator[pd.DataFrame]]:
+
+    first_chunk = next(chunks)
+    return list(first_chunk.columns), itertools.chain([first_chunk], chunks)
+
+# Download file from MinIO to local disk and read it back as DataFrame chunks (for merges larger than memory)
+def download_chunks_from_minio(file_name: str, chunk_rows: int, spill_dir: str | None = None, parquet_object: str | None = None, columns: list[str] | None = None, filters: list[tuple] = ()) -> Iterator[pd.DataFrame]:
+
+    full_read = is_full_read(columns, filters)
+    needed = read_columns(columns, filters)
+
+    if parquet_object:
+        with tempfile.TemporaryDirectory(prefix = "minio_download_", dir = spill_dir) as tmpdir:
+            local_path = os.path.join(tmpdir, os.path.basename(parquet_object))
+
+            try:
+                with track("download") as sample:
+                    minio_client.fget_object(settings.MINIO_BUCKET, parquet_object, local_path)
+                    sample["bytes"] = os.path.getsize(local_path)
+            except Exception as e:
+                print(f"Parquet copy {parquet_object} unavailable, reading {file_name} instead: {e}")
+            else:
+                parquet_file = pq.ParquetFile(local_path)
+                projected = _project_columns(parquet_file.schema_arrow, needed)
+                chunks = (batch.to_pandas() for batch in parquet_file.iter_batches(batch_size = chunk_rows, columns = projected))
+
+                if parquet_file.metadata.num_rows == 0:
+                    empty = parquet_file.schema_arrow.empty_table()
+                    chunks = iter([(empty.select(projected) if projected is not None else empty).to_pandas()])
+
+                yield from chunks if full_read else apply_pushdown_chunks(chunks, columns, filters)
+                return
+
+    file_extension = file_name.split('.')[-1]
+
+    if file_extension not in ("csv", "xlsx"):
+        print(f"Unsupported file format for download: {file_extension}")
+        raise HTTPException(status_code = 400, detail = "Unsupported file format for download.")
+
+    with tempfile.TemporaryDirectory(prefix = "minio_download_", dir = spill_dir) as tmpdir:
+        local_path = os.path.join(tmpdir, os.path.basename(file_name))
+
+        try:
+            with track("download") as sample:
+                minio_client.fget_object(settings.MINIO_BUCKET, file_name, local_path)
+                sample["bytes"] = os.path.getsize(local_path)
+        except Exception as e:
+            print(f"Error occurred while downloading file from MinIO: {e}")
+            raise HTTPException(status_code = 500, detail = f"MinIO download failed for {file_name}: {e}")
+
+        if file_extension == "csv":
+            usecols = (lambda name: name.strip().lower() in needed) if needed is not None else None
+            chunks = pd.read_csv(local_path, usecols = usecols, chunksize = chunk_rows)
+        else:
+            chunks = read_xlsx_chunks(local_path, chunk_rows)
+
+        yield from chunks if full_read else apply_pushdown_chunks(chunks, columns, filters)
+
+# Save merged DataFrame (or a stream of DataFrame chunks) back to MinIO
+def upload_merged_to_minio(df: pd.DataFrame | Iterable[pd.DataFrame], merged_file_name: str, file_format: str, merge_key: str | None = None) -> None:
+    
+    chunks = [df] if isinstance(df, pd.DataFrame) else df
+
+    try:
+        # Spool to a temp file so large results go to disk and are sent in multipart parts
+        with tempfile.SpooledTemporaryFile(max_size = settings.MINIO_PART_SIZE) as file_stream:
+
+            if file_format not in ("csv", "xlsx"):
+                print(f"Unsupported file format for upload: {file_format}")
+                raise HTTPException(status_code = 400, detail = "Unsupported file format for upload.")
+
+            with track(f"serialize_{file_format}") as sample:
+                if file_format == "csv":
+                    header = True
+                    sample["rows_in"] = 0
+                    for chunk in chunks:
+                        chunk.to_csv(file_stream, index = False, header = header)
+                        header = False
+                        sample["rows_in"] += len(chunk)
+                else:
+                    sample["rows_in"] = write_xlsx(chunks, file_stream)
+                sample["bytes"] = file_stream.tell()
+
+            file_stream.seek(0)
+
+            with track("minio_put") as sample:
+                minio_client.put_object(
+                    settings.MINIO_BUCKET,
+                    merged_file_name,
+                    file_stream,
+                    length = -1,
+                    metadata = {MERGE_KEY_METADATA: merge_key} if merge_key else None,
+                    part_size = settings.MINIO_PART_SIZE,
+                    num_parallel_uploads = settings.MINIO_PARALLEL_UPLOADS
+                )
+                sample["bytes"] = file_stream.tell()
+        frame_cache.invalidate(settings.MINIO_BUCKET, merged_file_name)
+        print(f"Successfully uploaded merged file {merged_file_name} to MinIO.")
+        
+    except Exception as e:
+        print(f"Error occurred while uploading merged file to MinIO: {e}")
+        raise HTTPException(status_code = 500, detail = f"MinIO upload failed for merged file: {e}")
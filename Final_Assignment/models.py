@@ -1,11 +1,67 @@
-from sqlalchemy import Column, Integer, String
-from database import Base
-
-class FileMetadata(Base):
-    
-    __tablename__ = "file_metadata"
-
-    id = Column(Integer, primary_key = True, index = True)
-    file_name = Column(String, index = True)
-    file_format = Column(String(5))
-
+from sqlalchemy import JSON, BigInteger, Column, DateTime, ForeignKey, Index, Integer, String, UniqueConstraint, func
+from database import Base
+
+class FileMetadata(Base):
+    
+    __tablename__ = "file_metadata"
+
+    id = Column(Integer, primary_key = True, index = True)
+    file_name = Column(String, index = True)
+    file_format = Column(String(5))
+    file_size = Column(BigInteger, nullable = True)
+    checksum = Column(String(64), nullable = True)
+    parquet_object = Column(String, nullable = True)
+
+    __table_args__ = (
+        # Prefix search on file_name (LIKE 'abc%') regardless of the database collation
+        Index("ix_file_metadata_file_name_pattern", "file_name", postgresql_ops = {"file_name": "text_pattern_ops"}),
+        # Keyset pages filtered by format walk this index in id order
+        Index("ix_file_metadata_file_format_id", "file_format", "id"),
+    )
+
+# Column catalog of an uploaded file, profiled once at upload time
+class FileSchema(Base):
+
+    __tablename__ = "file_schema"
+
+    id = Column(Integer, primary_key = True, index = True)
+    file_id = Column(Integer, ForeignKey("file_metadata.id", ondelete = "CASCADE"), unique = True, index = True)
+    etag = Column(String, nullable = True)
+    row_count = Column(BigInteger)
+    columns = Column(JSON)
+    profiled_at = Column(DateTime(timezone = True), server_default = func.now())
+
+# Rows appended to an uploaded file: each delta is kept as its own object and also folded into the file,
+# which moves the file from ETag base_etag to etag
+class FileDelta(Base):
+
+    __tablename__ = "file_delta"
+
+    id = Column(Integer, primary_key = True, index = True)
+    file_id = Column(Integer, ForeignKey("file_metadata.id", ondelete = "CASCADE"), index = True)
+    sequence = Column(Integer)
+    object_name = Column(String)
+    row_count = Column(BigInteger)
+    base_etag = Column(String, nullable = True)
+    etag = Column(String, nullable = True)
+    created_at = Column(DateTime(timezone = True), server_default = func.now())
+
+    __table_args__ = (
+        UniqueConstraint("file_id", "sequence", name = "uq_file_delta_file_id_sequence"),
+    )
+
+# Where a saved merge result came from (two source files, join column, join type and pushdowns) and which
+# versions of the sources it reflects, so appended rows can be joined into it without redoing the merge
+class MergeLineage(Base):
+
+    __tablename__ = "merge_lineage"
+
+    id = Column(Integer, primary_key = True, index = True)
+    file_id = Column(Integer, ForeignKey("file_metadata.id", ondelete = "CASCADE"), unique = True, index = True)
+    source_file_id_1 = Column(Integer, ForeignKey("file_metadata.id", ondelete = "CASCADE"), index = True)
+    source_file_id_2 = Column(Integer, ForeignKey("file_metadata.id", ondelete = "CASCADE"), index = True)
+    common_column = Column(String)
+    join_type = Column(String(5))
+    pushdowns = Column(JSON, nullable = True)
+    source_etags = Column(JSON)
+    refreshed_at = Column(DateTime(timezone = True), nullable = True)
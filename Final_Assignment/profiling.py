@@ -0,0 +1,242 @@
+from collections.abc import Iterable
+import numpy as np
+import pandas as pd
+
+# Column profiles captured once per upload: normalized names, dtypes, row and null counts, and
+# HyperLogLog distinct-count estimates for the columns that could serve as join keys.
+
+HLL_PRECISION = 12
+
+# HyperLogLog sketch over 64-bit value hashes; 2^precision one-byte registers, ~1.04 / sqrt(2^precision) error
+class HyperLogLog:
+
+    def __init__(self, precision: int = HLL_PRECISION):
+
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype = np.uint8)
+
+    @staticmethod
+    def _bit_length(values: np.ndarray) -> np.ndarray:
+
+        lengths = np.zeros(len(values), dtype = np.uint8)
+        values = values.copy()
+
+        for shift in (32, 16, 8, 4, 2, 1):
+            wide = values >= (np.uint64(1) << np.uint64(shift))
+            lengths[wide] += shift
+            values[wide] >>= np.uint64(shift)
+
+        return lengths + (values > 0).astype(np.uint8)
+
+    def add_hashes(self, hashes: np.ndarray) -> None:
+
+        if len(hashes) == 0:
+            return
+
+        hashes = hashes.astype(np.uint64, copy = False)
+        remaining_bits = 64 - self.precision
+
+        index = (hashes >> np.uint64(remaining_bits)).astype(np.int64)
+        remainder = hashes & np.uint64((1 << remaining_bits) - 1)
+        rank = (remaining_bits + 1 - self._bit_length(remainder)).astype(np.uint8)
+
+        np.maximum.at(self.registers, index, rank)
+
+    def estimate(self) -> int:
+
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+
+        # Linear counting is more accurate while many registers are still empty
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return int(round(m * np.log(m / zeros)))
+
+        return int(round(raw))
+
+# Hash values so that keys pd.merge treats as equal (e.g. 1 and 1.0) hash the same
+def _value_hashes(values: pd.Series) -> np.ndarray:
+
+    if pd.api.types.is_bool_dtype(values) or pd.api.types.is_numeric_dtype(values):
+        values = values.astype("float64")
+
+    return pd.util.hash_pandas_object(values, index = False).to_numpy()
+
+# dtype a column ends up with when chunks disagree, e.g. int64 in one chunk and float64 (NaN) in the next
+def _common_dtype(profiled: str, dtype) -> str:
+
+    try:
+        first = np.dtype(profiled)
+        if first.kind in "iuf" and isinstance(dtype, np.dtype) and dtype.kind in "iuf":
+            return str(np.result_type(first, dtype))
+    except TypeError:
+        pass
+
+    return "object"
+
+# Integer, string and datetime columns can be join keys; floats and booleans are not profiled for distinct counts
+def is_key_candidate(values: pd.Series) -> bool:
+
+    if pd.api.types.is_bool_dtype(values):
+        return False
+
+    return (
+        pd.api.types.is_integer_dtype(values)
+        or pd.api.types.is_object_dtype(values)
+        or pd.api.types.is_string_dtype(values)
+        or pd.api.types.is_datetime64_any_dtype(values)
+    )
+
+# Profile a file read as one or more DataFrame chunks
+def profile_chunks(chunks: Iterable[pd.DataFrame]) -> dict:
+
+    row_count = 0
+    columns: dict[str, dict] = {}
+    sketches: dict[str, HyperLogLog] = {}
+
+    for chunk in chunks:
+        row_count += len(chunk)
+
+        for original_name in chunk.columns:
+            values = chunk[original_name]
+            name = str(original_name).strip().lower()
+
+            profile = columns.get(name)
+            if profile is None:
+                profile = columns[name] = {"name": name, "dtype": str(values.dtype), "null_count": 0, "distinct_estimate": None}
+                if is_key_candidate(values):
+                    sketches[name] = HyperLogLog()
+            elif profile["dtype"] != str(values.dtype):
+                profile["dtype"] = _common_dtype(profile["dtype"], values.dtype)
+
+            profile["null_count"] += int(values.isna().sum())
+
+            if name in sketches:
+                sketches[name].add_hashes(_value_hashes(values.dropna()))
+
+    for name, sketch in sketches.items():
+        columns[name]["distinct_estimate"] = min(sketch.estimate(), row_count - columns[name]["null_count"])
+
+    return {"row_count": row_count, "columns": list(columns.values())}
+
+def profile_dataframe(df: pd.DataFrame) -> dict:
+    return profile_chunks([df])
+
+# Profile a CSV stream chunk by chunk, for uploads too large to parse in one go
+def profile_csv_stream(stream, chunk_rows: int) -> dict:
+
+    stream.seek(0)
+    return profile_chunks(pd.read_csv(stream, chunksize = chunk_rows))
+
+# Estimated row count of joining two profiled files on one column, assuming the smaller key set
+# is contained in the larger one (the usual System R style estimate)
+def estimate_join_rows(profile_1: dict, profile_2: dict, common_column: str, join_type: str, selectivities: tuple[float, float] = (1.0, 1.0)) -> int | None:
+
+    column_1 = next((column for column in profile_1["columns"] if column["name"] == common_column), None)
+    column_2 = next((column for column in profile_2["columns"] if column["name"] == common_column), None)
+
+    if column_1 is None or column_2 is None or column_1["distinct_estimate"] is None or column_2["distinct_estimate"] is None:
+        return None
+
+    rows_1 = profile_1["row_count"] - column_1["null_count"]
+    rows_2 = profile_2["row_count"] - column_2["null_count"]
+    distinct_1 = max(column_1["distinct_estimate"], 1)
+    distinct_2 = max(column_2["distinct_estimate"], 1)
+
+    matched = rows_1 * rows_2 / max(distinct_1, distinct_2)
+    shared = min(distinct_1, distinct_2)
+    unmatched_1 = profile_1["row_count"] - rows_1 * shared / distinct_1
+    unmatched_2 = profile_2["row_count"] - rows_2 * shared / distinct_2
+
+    # Rows dropped by filters take their share of the matches with them; a side that keeps its unmatched rows
+    # still keeps every filtered row, however few matches the other side's filters leave
+    selectivity_1, selectivity_2 = selectivities
+    matched *= selectivity_1 * selectivity_2
+    kept_1 = profile_1["row_count"] * selectivity_1
+    kept_2 = profile_2["row_count"] * selectivity_2
+
+    if join_type == "inner":
+        estimate = matched
+    elif join_type == "left":
+        estimate = max(matched + unmatched_1 * selectivity_1, kept_1)
+    elif join_type == "right":
+        estimate = max(matched + unmatched_2 * selectivity_2, kept_2)
+    else:
+        estimate = max(matched + unmatched_1 * selectivity_1 + unmatched_2 * selectivity_2, kept_1, kept_2)
+
+    return int(round(estimate))
+
+# Share of rows a range filter is assumed to keep, and an equality filter on a column without a distinct
+# estimate (the classic System R defaults)
+RANGE_SELECTIVITY = 1 / 3
+EQUALITY_SELECTIVITY = 1 / 10
+
+def _filter_selectivity(column: dict | None, operator: str, value) -> float:
+
+    distinct = column["distinct_estimate"] if column is not None else None
+    equality = 1 / max(distinct, 1) if distinct is not None else EQUALITY_SELECTIVITY
+
+    if operator == "eq":
+        return equality
+    if operator == "ne":
+        return 1 - equality
+    if operator == "in":
+        return min(1.0, len(value) * equality)
+
+    return RANGE_SELECTIVITY
+
+# Estimated share of a file's rows its pushdown filters (column, operator, value) keep, taking the filters
+# as independent and values as evenly spread
+def filter_selectivity(profile: dict, filters: list[tuple]) -> float:
+
+    by_name = {column["name"]: column for column in profile["columns"]}
+    selectivity = 1.0
+
+    for name, operator, value in filters:
+        selectivity *= _filter_selectivity(by_name.get(name), operator, value)
+
+    return selectivity
+
+# Estimated profile of a join result, so joins further down a chain can be estimated from it too;
+# distinct counts follow the same containment assumption as estimate_join_rows
+def joined_profile(profile_1: dict, profile_2: dict, common_column: str, join_type: str, rows: int) -> dict:
+
+    columns = []
+
+    for profile, side in ((profile_1, "left"), (profile_2, "right")):
+        for column in profile["columns"]:
+            if column["name"] == common_column:
+                if side == "right":
+                    continue
+
+                other = next(candidate for candidate in profile_2["columns"] if candidate["name"] == common_column)
+                estimates = [column["distinct_estimate"], other["distinct_estimate"]]
+
+                if None in estimates:
+                    distinct = None
+                elif join_type == "inner":
+                    distinct = min(estimates)
+                elif join_type == "left":
+                    distinct = estimates[0]
+                elif join_type == "right":
+                    distinct = estimates[1]
+                else:
+                    distinct = max(estimates)
+
+                null_count = 0 if join_type == "inner" else column["null_count"]
+                columns.append({"name": column["name"], "dtype": column["dtype"], "null_count": null_count, "distinct_estimate": distinct})
+                continue
+
+            # Other columns keep their share of nulls; a column cannot have more distinct values than rows
+            scale = rows / max(profile["row_count"], 1)
+            distinct = column["distinct_estimate"]
+
+            columns.append({
+                "name": column["name"],
+                "dtype": column["dtype"],
+                "null_count": int(round(column["null_count"] * scale)),
+                "distinct_estimate": min(distinct, rows) if distinct is not None else None
+            })
+
+    return {"row_count": rows, "columns": columns}
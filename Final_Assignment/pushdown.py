@@ -0,0 +1,151 @@
+from collections.abc import Iterable, Iterator
+from fastapi import HTTPException
+import hashlib
+import json
+import pandas as pd
+
+# Column projections and row filters of a merge, applied while an input is read so the join only sees
+# the columns and rows it needs. Column names are matched after normalization (stripped, lower-cased),
+# like the join column; frames keep their original names.
+
+FILTER_OPERATORS = ("eq", "ne", "gt", "gte", "lt", "lte", "in")
+
+NO_PUSHDOWN = {"columns": None, "filters": []}
+
+# Parse filters written as column:operator:value, e.g. region:eq:south, age:gte:18 or region:in:north,south
+def parse_filters(raw_filters: list[str] | None) -> list[tuple[str, str, str | tuple[str, ...]]]:
+
+    filters = []
+
+    for raw_filter in raw_filters or []:
+        parts = raw_filter.split(":", 2)
+
+        if len(parts) != 3 or not parts[0].strip() or parts[1].strip().lower() not in FILTER_OPERATORS:
+            print(f"Invalid filter: {raw_filter}")
+            raise HTTPException(status_code = 400, detail = f"Invalid filter '{raw_filter}'. Use column:operator:value with operator one of: {', '.join(FILTER_OPERATORS)}.")
+
+        column, operator, value = parts[0].strip().lower(), parts[1].strip().lower(), parts[2]
+        filters.append((column, operator, tuple(value.split(",")) if operator == "in" else value))
+
+    return filters
+
+# Normalized columns to read for a projection: the requested ones plus the join column; None reads every column
+def projection_columns(columns: list[str] | None, common_column: str) -> list[str] | None:
+
+    if not columns:
+        return None
+
+    projected = [common_column]
+    for column in columns:
+        column = column.strip().lower()
+        if column not in projected:
+            projected.append(column)
+
+    return projected
+
+# Columns to read: the projection plus the columns the filters need
+def read_columns(columns: list[str] | None, filters: list[tuple]) -> list[str] | None:
+
+    if columns is None:
+        return None
+
+    return columns + [column for column, _, _ in filters if column not in columns]
+
+# Filter values arrive as text; compare them as the column's type
+def _typed_value(series: pd.Series, value: str):
+
+    try:
+        if pd.api.types.is_bool_dtype(series.dtype):
+            return value.strip().lower() in ("true", "1")
+        if pd.api.types.is_numeric_dtype(series.dtype):
+            return float(value)
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            return pd.Timestamp(value)
+    except ValueError:
+        print(f"Invalid filter value {value} for column {series.name}")
+        raise HTTPException(status_code = 400, detail = f"Invalid filter value '{value}' for column {series.name}.")
+
+    return value
+
+def _matches(series: pd.Series, operator: str, value) -> pd.Series:
+
+    # Text (or mixed) columns are compared as text
+    if series.dtype == object:
+        series = series.where(series.isna(), series.astype(str))
+
+    if operator == "in":
+        return series.isin([_typed_value(series, item) for item in value])
+
+    value = _typed_value(series, value)
+
+    if operator == "eq":
+        return series == value
+    if operator == "ne":
+        return series != value
+    if operator == "gt":
+        return series > value
+    if operator == "gte":
+        return series >= value
+    if operator == "lt":
+        return series < value
+    return series <= value
+
+def _column_names(df: pd.DataFrame) -> dict[str, str]:
+    return {str(name).strip().lower(): name for name in df.columns}
+
+# Keep the rows of a frame that match every filter, then only the projected columns
+def apply_pushdown(df: pd.DataFrame, columns: list[str] | None, filters: list[tuple]) -> pd.DataFrame:
+
+    names = _column_names(df)
+
+    missing = [column for column in (columns or []) + [column for column, _, _ in filters] if column not in names]
+    if missing:
+        print(f"Columns not found: {', '.join(missing)}")
+        raise HTTPException(status_code = 400, detail = f"Columns not found in the file: {', '.join(dict.fromkeys(missing))}.")
+
+    if filters:
+        mask = pd.Series(True, index = df.index)
+        for column, operator, value in filters:
+            mask &= _matches(df[names[column]], operator, value).fillna(False).astype(bool)
+        df = df[mask]
+
+    if columns is not None:
+        df = df[[names[column] for column in columns]]
+
+    return df
+
+def apply_pushdown_chunks(chunks: Iterable[pd.DataFrame], columns: list[str] | None, filters: list[tuple]) -> Iterator[pd.DataFrame]:
+
+    for chunk in chunks:
+        yield apply_pushdown(chunk, columns, filters)
+
+# Whether a read can skip projection and filtering altogether
+def is_full_read(columns: list[str] | None, filters: list[tuple]) -> bool:
+    return columns is None and not filters
+
+# Projection and filters of one merge input, from the raw request parameters
+def build_pushdown(columns: list[str] | None, raw_filters: list[str] | None, common_column: str) -> dict:
+    return {"columns": projection_columns(columns, common_column), "filters": parse_filters(raw_filters)}
+
+# Part of a merge's identity (and so of its cache key) that comes from pushdowns; None when every input is read in full
+def pushdown_identity(pushdowns: list[dict] | None) -> list | None:
+
+    if not pushdowns or all(is_full_read(pushdown["columns"], pushdown["filters"]) for pushdown in pushdowns):
+        return None
+
+    return [[pushdown["columns"], [list(row_filter) for row_filter in pushdown["filters"]]] for pushdown in pushdowns]
+
+# Short, stable tag of a pushdown_identity, so results read with different pushdowns get different names
+def pushdown_tag(identity: list | None) -> str | None:
+
+    if identity is None:
+        return None
+
+    return hashlib.sha256(json.dumps(identity).encode()).hexdigest()[:8]
+
+# Pushdowns of both inputs back from their pushdown_identity, e.g. one recorded with a saved merge result
+def pushdowns_from_identity(identity: list) -> list[dict]:
+    return [
+        {"columns": columns, "filters": [(column, operator, tuple(value) if operator == "in" else value) for column, operator, value in filters]}
+        for columns, filters in identity
+    ]
@@ -1,17 +1,94 @@
-from pydantic import BaseModel, ConfigDict
-import uuid
-
-class FileResponse(BaseModel):
-    model_config = ConfigDict(from_attributes = True)
-    id: int
-    file_name: str
-    file_format: str
-
-class MergeResponse(BaseModel):
-    message: str
-    cache_key: uuid.UUID = uuid.uuid4()
-    preview: list[dict]
-
-class SaveMergedResponse(BaseModel):
-    cache_key: uuid.UUID
-
+from pydantic import BaseModel, ConfigDict
+import datetime
+import uuid
+
+class FileResponse(BaseModel):
+    model_config = ConfigDict(from_attributes = True)
+    id: int
+    file_name: str
+    file_format: str
+    file_size: int | None = None
+    checksum: str | None = None
+    parquet_object: str | None = None
+
+class ColumnProfile(BaseModel):
+    name: str
+    dtype: str
+    null_count: int
+    distinct_estimate: int | None = None
+
+class FileSchemaResponse(BaseModel):
+    model_config = ConfigDict(from_attributes = True)
+    file_id: int
+    etag: str | None = None
+    row_count: int
+    columns: list[ColumnProfile]
+    profiled_at: datetime.datetime | None = None
+
+class FileDeltaResponse(BaseModel):
+    model_config = ConfigDict(from_attributes = True)
+    file_id: int
+    sequence: int
+    object_name: str
+    row_count: int
+    created_at: datetime.datetime | None = None
+
+class AppendResponse(BaseModel):
+    file: FileResponse
+    delta: FileDeltaResponse
+
+class BatchUploadResult(BaseModel):
+    filename: str
+    status: str
+    file: FileResponse | None = None
+    error: str | None = None
+
+class BatchUploadResponse(BaseModel):
+    uploaded: int
+    failed: int
+    results: list[BatchUploadResult]
+
+class FilePageResponse(BaseModel):
+    items: list[FileResponse]
+    next_cursor: int | None = None
+    estimated_total: int | None = None
+
+class MergeResponse(BaseModel):
+    message: str
+    cache_key: uuid.UUID = uuid.uuid4()
+    preview: list[dict]
+    estimated_rows: int | None = None
+
+class MergeChainJoin(BaseModel):
+    common_column: str
+    join_type: str
+
+class MergeChainRequest(BaseModel):
+    file_ids: list[int]
+    joins: list[MergeChainJoin]
+
+class MergeChainResponse(MergeResponse):
+    join_order: list[int]
+
+class SaveMergedResponse(BaseModel):
+    cache_key: uuid.UUID
+
+class MergeRefreshResponse(BaseModel):
+    file: FileResponse
+    mode: str
+    deltas_applied: list[int]
+    rows_added: int = 0
+    rows_removed: int = 0
+
+class MergeJobResponse(BaseModel):
+    job_id: str
+    status: str
+    stage: str
+    progress: float
+    submitted_at: float
+    started_at: float | None = None
+    finished_at: float | None = None
+    timings: dict[str, float] = {}
+    cache_key: uuid.UUID | None = None
+    preview: list[dict] | None = None
+    error: str | None = None
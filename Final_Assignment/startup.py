@@ -0,0 +1,89 @@
+from contextlib import suppress
+from config import settings
+from executors import run_io
+from metrics import STARTUP_SECONDS
+import asyncio
+import time
+
+# Startup warm-up of a worker. Nothing touches the network at import: once the app starts, the lifespan
+# hook runs every dependency check (MinIO bucket, database tables) concurrently in the background, so a
+# slow dependency delays readiness (GET /ready) instead of the boot. Failed checks are retried until they pass.
+
+class Readiness:
+
+    # started: time.perf_counter() when the worker started; checks: blocking callables by dependency name
+    def __init__(self, started: float, checks: dict):
+        self.started = started
+        self.checks = checks
+        self.phases = {}
+        self.dependencies = {name: {"status": "pending", "attempts": 0, "seconds": None, "error": None} for name in checks}
+        self._ready = None
+        self._task = None
+
+    # Seconds from the start of the worker until it reached phase, also exported on /metrics
+    def mark(self, phase: str) -> None:
+
+        seconds = time.perf_counter() - self.started
+        self.phases[phase] = round(seconds, 4)
+        STARTUP_SECONDS.labels(phase).set(seconds)
+
+    @property
+    def ready(self) -> bool:
+        return self._ready is not None and self._ready.is_set()
+
+    # Start the checks on the running event loop; returns at once
+    def start(self) -> None:
+
+        self._ready = asyncio.Event()
+        self._task = asyncio.create_task(self._warm_up())
+
+    async def _warm_up(self) -> None:
+
+        await asyncio.gather(*(self._check(name, check) for name, check in self.checks.items()))
+
+        self.mark("ready")
+        self._ready.set()
+        print(f"Application ready after {self.phases['ready']:.2f}s.")
+
+    async def _check(self, name: str, check) -> None:
+
+        dependency = self.dependencies[name]
+
+        while True:
+            dependency["attempts"] += 1
+            started = time.perf_counter()
+
+            try:
+                await run_io(check)
+            except Exception as e:
+                dependency.update({"status": "failed", "seconds": round(time.perf_counter() - started, 4), "error": str(e)})
+                print(f"Startup check '{name}' failed (attempt {dependency['attempts']}), retrying in {settings.STARTUP_RETRY_SECONDS}s: {e}")
+                await asyncio.sleep(settings.STARTUP_RETRY_SECONDS)
+                continue
+
+            dependency.update({"status": "ready", "seconds": round(time.perf_counter() - started, 4), "error": None})
+            self.mark(name)
+            return
+
+    # Wait up to timeout seconds for every check to pass; False when they still have not
+    async def wait(self, timeout: float) -> bool:
+
+        if self._ready is None:
+            return False
+        if self._ready.is_set():
+            return True
+
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self._ready.wait(), timeout)
+
+        return self._ready.is_set()
+
+    def status(self) -> dict:
+        return {"ready": self.ready, "dependencies": self.dependencies, "startup_seconds": self.phases}
+
+    async def stop(self) -> None:
+
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
@@ -0,0 +1,171 @@
+from collections.abc import Iterable, Iterator
+from fastapi import HTTPException
+from minio_client import minio_client
+from config import settings
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Incremental encoders for streaming downloads: every record batch is encoded and handed to the
+# response on its own, so the body is never built in memory.
+
+STREAM_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet"
+}
+
+OBJECT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "parquet": "application/vnd.apache.parquet"
+}
+
+# Write-only file object collecting what an Arrow writer produces until the response takes it
+class _ByteQueue:
+
+    def __init__(self):
+        self.closed = False
+        self._parts = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+# Rows offset .. offset + limit of a batch stream; batches before the offset are skipped without being decoded
+def slice_batches(batches: Iterable[pa.RecordBatch], offset: int = 0, limit: int | None = None) -> Iterator[pa.RecordBatch]:
+
+    remaining = limit
+
+    for batch in batches:
+        if remaining is not None and remaining <= 0:
+            return
+
+        if offset >= batch.num_rows:
+            offset -= batch.num_rows
+            continue
+
+        batch = batch.slice(offset)
+        offset = 0
+
+        if remaining is not None:
+            batch = batch.slice(0, remaining)
+            remaining -= batch.num_rows
+
+        yield batch
+
+def _encode_csv(schema: pa.Schema, batches: Iterator[pa.RecordBatch]) -> Iterator[bytes]:
+
+    header = True
+
+    for batch in batches:
+        yield batch.to_pandas().to_csv(index = False, header = header).encode()
+        header = False
+
+    if header:
+        yield schema.empty_table().to_pandas().to_csv(index = False).encode()
+
+def _encode_ndjson(batches: Iterator[pa.RecordBatch]) -> Iterator[bytes]:
+
+    for batch in batches:
+        if batch.num_rows:
+            lines = batch.to_pandas().to_json(orient = "records", lines = True, date_format = "iso", double_precision = 15)
+            yield (lines if lines.endswith("\n") else lines + "\n").encode()
+
+def _encode_arrow(schema: pa.Schema, batches: Iterator[pa.RecordBatch]) -> Iterator[bytes]:
+
+    sink = _ByteQueue()
+
+    with pa.ipc.new_stream(pa.PythonFile(sink, mode = "w"), schema) as writer:
+        yield sink.drain()
+        for batch in batches:
+            writer.write_batch(batch)
+            yield sink.drain()
+
+    yield sink.drain()
+
+def _encode_parquet(schema: pa.Schema, batches: Iterator[pa.RecordBatch]) -> Iterator[bytes]:
+
+    sink = _ByteQueue()
+
+    # One row group per batch, so each batch can leave as soon as it is written
+    with pq.ParquetWriter(pa.PythonFile(sink, mode = "w"), schema) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            yield sink.drain()
+
+    yield sink.drain()
+
+# Encode a batch stream in one of STREAM_MEDIA_TYPES, one piece per batch
+def encode_batches(schema: pa.Schema, batches: Iterable[pa.RecordBatch], stream_format: str) -> Iterator[bytes]:
+
+    batches = iter(batches)
+
+    if stream_format == "csv":
+        return _encode_csv(schema, batches)
+    elif stream_format == "ndjson":
+        return _encode_ndjson(batches)
+    elif stream_format == "arrow":
+        return _encode_arrow(schema, batches)
+    elif stream_format == "parquet":
+        return _encode_parquet(schema, batches)
+    else:
+        print(f"Unsupported download format: {stream_format}")
+        raise HTTPException(status_code = 400, detail = f"Unsupported download format. Use one of: {', '.join(STREAM_MEDIA_TYPES)}.")
+
+# Parse a single-range "Range: bytes=..." header against an object size; None means send the whole object
+def parse_range(range_header: str | None, size: int) -> tuple[int, int] | None:
+
+    if not range_header:
+        return None
+
+    unit, _, spec = range_header.partition("=")
+
+    # Multiple ranges are not supported; answering with the full body is allowed for those
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+
+    first, _, last = spec.strip().partition("-")
+
+    try:
+        if first == "":
+            start = max(size - int(last), 0)
+            end = size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+
+    if start > end or start >= size:
+        raise HTTPException(status_code = 416, detail = "Requested range not satisfiable.", headers = {"Content-Range": f"bytes */{size}"})
+
+    return start, end
+
+# Stream a byte range of a stored object straight from MinIO
+def iter_object_bytes(object_name: str, offset: int = 0, length: int = 0) -> Iterator[bytes]:
+
+    response = minio_client.get_object(settings.MINIO_BUCKET, object_name, offset = offset, length = length)
+
+    try:
+        yield from response.stream(settings.MINIO_PART_SIZE)
+    finally:
+        response.close()
+        response.release_conn()
@@ -0,0 +1,208 @@
+from collections.abc import Iterable, Iterator
+from datetime import date, timedelta
+from pandas.io.parsers import TextParser
+import importlib.util
+import math
+import pandas as pd
+
+# Streaming xlsx reading and writing. Reads walk the first sheet row by row (python-calamine when it is
+# installed, openpyxl's read-only mode otherwise) and parse rows the way pd.read_excel does, a chunk at a
+# time; writes go through openpyxl's write-only mode, so neither side builds the workbook in memory.
+# Both libraries are imported on first use, so starting a worker does not pay for them.
+
+XLSX_MAX_ROWS = 1_048_576
+
+XLSX_ENGINES = ("calamine", "openpyxl")
+
+def default_engine() -> str:
+    return "calamine" if importlib.util.find_spec("python_calamine") is not None else "openpyxl"
+
+# Cell conversions below mirror pandas' own openpyxl and calamine readers, so parsed frames match pd.read_excel
+def _openpyxl_rows(source) -> Iterator[list]:
+
+    from openpyxl import load_workbook
+    from openpyxl.cell.cell import ERROR_CODES
+
+    workbook = load_workbook(source, read_only = True, data_only = True, keep_links = False)
+
+    try:
+        sheet = workbook.worksheets[0]
+        # Some writers record a wrong sheet size; read-only mode trusts it unless reset
+        sheet.reset_dimensions()
+
+        for row in sheet.iter_rows(values_only = True):
+            converted = []
+            for value in row:
+                if value is None:
+                    value = ""
+                elif isinstance(value, float):
+                    if value.is_integer():
+                        value = int(value)
+                elif isinstance(value, str) and value in ERROR_CODES:
+                    value = math.nan
+                converted.append(value)
+            yield converted
+    finally:
+        workbook.close()
+
+def _calamine_rows(source) -> Iterator[list]:
+
+    from python_calamine import CalamineWorkbook
+
+    workbook = CalamineWorkbook.from_object(source)
+
+    try:
+        sheet = workbook.get_sheet_by_index(0)
+
+        # Rows start at the first used column; pandas reads from column A, so the empty columns are put back
+        padding = [""] * (sheet.start or (0, 0))[1]
+
+        for row in sheet.iter_rows():
+            converted = list(padding)
+            for value in row:
+                if isinstance(value, float):
+                    if value.is_integer():
+                        value = int(value)
+                elif isinstance(value, date):
+                    value = pd.Timestamp(value)
+                elif isinstance(value, timedelta):
+                    value = pd.Timedelta(value)
+                converted.append(value)
+            yield converted
+    finally:
+        workbook.close()
+
+# Rows of the first sheet with trailing empty cells trimmed and trailing empty rows dropped, as pandas does
+def iter_xlsx_rows(source, engine: str | None = None) -> Iterator[list]:
+
+    engine = engine or default_engine()
+
+    if engine == "calamine":
+        rows = _calamine_rows(source)
+    elif engine == "openpyxl":
+        rows = _openpyxl_rows(source)
+    else:
+        raise ValueError(f"Unsupported xlsx engine: {engine}. Use one of: {', '.join(XLSX_ENGINES)}.")
+
+    blank_rows = 0
+
+    for row in rows:
+        while row and row[-1] == "":
+            row.pop()
+
+        # Empty rows are held back until a row with data follows them
+        if not row:
+            blank_rows += 1
+            continue
+
+        for _ in range(blank_rows):
+            yield []
+        blank_rows = 0
+
+        yield row
+
+def _parse_rows(rows: list[list], width: int, header: list | None = None, names: list | None = None, dtype: dict | None = None) -> pd.DataFrame:
+
+    data = [row + [""] * (width - len(row)) if len(row) < width else row for row in rows]
+
+    if header is not None:
+        data.insert(0, header + [""] * (width - len(header)))
+        return TextParser(data, header = 0, skip_blank_lines = False).read()
+
+    return TextParser(data, header = None, names = names, dtype = dtype, skip_blank_lines = False).read()
+
+# Read the first sheet into one DataFrame
+def read_xlsx(source, engine: str | None = None) -> pd.DataFrame:
+
+    rows = iter_xlsx_rows(source, engine)
+    header = next(rows, None)
+
+    if header is None:
+        return pd.DataFrame()
+
+    data = list(rows)
+    return _parse_rows(data, max([len(header)] + [len(row) for row in data]), header = header)
+
+# Read the first sheet as DataFrame chunks of chunk_rows rows; only one chunk of rows is held at a time.
+# Column names come from the header row and dtypes are inferred per chunk, as with pd.read_csv(chunksize = ...),
+# except that text columns of the first chunk stay text, so e.g. a later chunk of "42" codes is not read as numbers
+def read_xlsx_chunks(source, chunk_rows: int, engine: str | None = None) -> Iterator[pd.DataFrame]:
+
+    rows = iter_xlsx_rows(source, engine)
+    header = next(rows, None)
+
+    if header is None:
+        yield pd.DataFrame()
+        return
+
+    columns = None
+    text_columns = None
+    batch = []
+
+    for row in rows:
+        batch.append(row)
+
+        if len(batch) == chunk_rows:
+            if columns is None:
+                chunk = _parse_rows(batch, max(len(header), max(len(row) for row in batch)), header = header)
+                columns = list(chunk.columns)
+                text_columns = {column: object for column, dtype in chunk.dtypes.items() if dtype == object}
+            else:
+                chunk = _parse_rows(batch, len(columns), names = columns, dtype = text_columns)
+            yield chunk
+            batch = []
+
+    if columns is None:
+        yield _parse_rows(batch, max([len(header)] + [len(row) for row in batch]), header = header)
+    elif batch:
+        yield _parse_rows(batch, len(columns), names = columns, dtype = text_columns)
+
+# Values of a chunk as openpyxl can write them: missing values become empty cells and infinities
+# are written as text, like DataFrame.to_excel
+def _writable_rows(chunk: pd.DataFrame) -> Iterator[tuple]:
+
+    values = chunk.astype(object)
+    values = values.where(chunk.notna(), None)
+
+    for column in chunk.columns[[pd.api.types.is_float_dtype(dtype) for dtype in chunk.dtypes]]:
+        infinite = chunk[column].abs() == math.inf
+        if infinite.any():
+            values.loc[infinite, column] = chunk.loc[infinite, column].map(lambda value: "inf" if value > 0 else "-inf")
+
+    return values.itertuples(index = False, name = None)
+
+def _header_cell(sheet, value):
+
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    cell = WriteOnlyCell(sheet, value = value)
+    cell.font = Font(bold = True)
+    return cell
+
+# Write DataFrame chunks to a single-sheet workbook; rows go straight to the output as they arrive.
+# The header comes from the first chunk and is written bold, like DataFrame.to_excel
+def write_xlsx(chunks: Iterable[pd.DataFrame], target, sheet_name: str = "Sheet1") -> int:
+
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only = True)
+    sheet = workbook.create_sheet(sheet_name)
+    header_written = False
+    rows = 0
+
+    for chunk in chunks:
+        if not header_written:
+            sheet.append([_header_cell(sheet, column) for column in chunk.columns])
+            header_written = True
+
+        if rows + len(chunk) >= XLSX_MAX_ROWS:
+            raise ValueError(f"Result has more rows than an xlsx sheet can hold ({XLSX_MAX_ROWS - 1} data rows).")
+
+        for row in _writable_rows(chunk):
+            sheet.append(row)
+        rows += len(chunk)
+
+    workbook.save(target)
+
+    return rows
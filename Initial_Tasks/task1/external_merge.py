@@ -0,0 +1,229 @@
+from collections.abc import Iterable, Iterator
+import math
+import os
+import pickle
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Out-of-core hash join. Both inputs are hash-partitioned on the join key into local spill files,
+# joined one partition at a time, and the result is re-ordered through range buckets so the
+# streamed chunks concatenate to exactly what pd.merge(left, right, on = on, how = how) returns.
+
+JOIN_TYPES = ("inner", "left", "right", "outer")
+
+# Rough in-memory size of a parsed CSV/XLSX relative to its size on disk
+MEMORY_EXPANSION_FACTOR = 4
+
+# One partition join holds its left part, right part and output at the same time
+PARTITION_WORKING_SET_FACTOR = 3
+
+KEY_SAMPLE_PER_CHUNK = 1000
+
+LEFT_POSITION = "__external_merge_left_position"
+RIGHT_POSITION = "__external_merge_right_position"
+
+# Number of partitions needed so one partition join stays within the memory limit
+def partition_count(estimated_bytes: int, memory_limit: int) -> int:
+    return max(1, math.ceil(estimated_bytes * PARTITION_WORKING_SET_FACTOR / max(memory_limit, 1)))
+
+# Decide from on-disk input sizes whether the merge can run fully in memory
+def fits_in_memory(file_sizes: Iterable[int], memory_limit: int) -> bool:
+    return sum(file_sizes) * MEMORY_EXPANSION_FACTOR * PARTITION_WORKING_SET_FACTOR <= memory_limit
+
+# Hash join keys so that values pd.merge treats as equal (e.g. 1 and 1.0) land in the same partition
+def _key_hash(keys: pd.Series) -> np.ndarray:
+
+    if pd.api.types.is_bool_dtype(keys) or pd.api.types.is_numeric_dtype(keys):
+        keys = keys.astype("float64")
+
+    return pd.util.hash_pandas_object(keys, index = False).to_numpy()
+
+def _append_spill(path: str, df: pd.DataFrame) -> None:
+
+    with open(path, "ab") as f:
+        pickle.dump(df, f, protocol = pickle.HIGHEST_PROTOCOL)
+
+def _read_spill(path: str, schema: pd.DataFrame) -> pd.DataFrame:
+
+    if not os.path.exists(path):
+        return schema
+
+    parts = []
+    with open(path, "rb") as f:
+        while True:
+            try:
+                parts.append(pickle.load(f))
+            except EOFError:
+                break
+
+    return pd.concat(parts, ignore_index = True) if len(parts) > 1 else parts[0]
+
+# Hash-partition one input into spill files, tagging every row with its original position
+def _partition_input(chunks: Iterable[pd.DataFrame], on: str, position_column: str, num_partitions: int, spill_dir: str, side: str) -> tuple[pd.DataFrame, int, list]:
+
+    schema = None
+    rows = 0
+    key_sample = []
+
+    for chunk in chunks:
+        if schema is None:
+            schema = chunk.iloc[:0].assign(**{position_column: np.empty(0, dtype = np.int64)})
+
+        if chunk.empty:
+            continue
+
+        chunk = chunk.reset_index(drop = True)
+        chunk[position_column] = np.arange(rows, rows + len(chunk), dtype = np.int64)
+        rows += len(chunk)
+
+        key_sample.append(chunk[on].sample(n = min(len(chunk), KEY_SAMPLE_PER_CHUNK), random_state = 0))
+
+        partitions = _key_hash(chunk[on]) % num_partitions
+        for partition, part in chunk.groupby(partitions, sort = False):
+            _append_spill(os.path.join(spill_dir, f"{side}_{partition}.pkl"), part)
+
+    if schema is None:
+        raise ValueError(f"The {side} input of the merge produced no data, not even a header.")
+
+    return schema, rows, key_sample
+
+# Key boundaries splitting the sorted key space into roughly equal buckets (used by outer joins)
+def _key_boundaries(key_sample: list, num_buckets: int) -> np.ndarray:
+
+    sample = pd.concat(key_sample, ignore_index = True).dropna() if key_sample else pd.Series(dtype = "float64")
+
+    if sample.empty or num_buckets == 1:
+        return sample.iloc[:0].to_numpy()
+
+    sample = sample.sort_values(ignore_index = True)
+    positions = [len(sample) * i // num_buckets for i in range(1, num_buckets)]
+    return sample.iloc[positions].drop_duplicates().to_numpy()
+
+# Order bucket of every merged row, chosen so bucket order follows pd.merge output order
+def _order_buckets(merged: pd.DataFrame, on: str, how: str, num_buckets: int, left_rows: int, right_rows: int, boundaries: np.ndarray) -> np.ndarray:
+
+    if how in ("inner", "left"):
+        return merged[LEFT_POSITION].to_numpy(dtype = np.int64) * num_buckets // max(left_rows, 1)
+
+    if how == "right":
+        return merged[RIGHT_POSITION].to_numpy(dtype = np.int64) * num_buckets // max(right_rows, 1)
+
+    keys = merged[on]
+    buckets = np.full(len(merged), num_buckets - 1, dtype = np.int64)
+    not_null = keys.notna().to_numpy()
+    buckets[not_null] = np.searchsorted(boundaries, keys[not_null].to_numpy(), side = "right")
+    return buckets
+
+def _sort_columns(on: str, how: str) -> list[str]:
+
+    if how in ("inner", "left"):
+        return [LEFT_POSITION, RIGHT_POSITION]
+    if how == "right":
+        return [RIGHT_POSITION, LEFT_POSITION]
+    return [on, LEFT_POSITION, RIGHT_POSITION]
+
+# Common dtype of a column across partition results, following pandas' upcasting (int + NaN -> float, otherwise object)
+def _common_dtype(dtypes: list) -> np.dtype:
+
+    unique = list(dict.fromkeys(dtypes))
+    if len(unique) == 1:
+        return unique[0]
+
+    try:
+        if all(isinstance(dtype, np.dtype) and dtype.kind in "biuf" for dtype in unique):
+            return np.result_type(*unique)
+    except TypeError:
+        pass
+
+    return np.dtype(object)
+
+def _iter_slices(df: pd.DataFrame, chunk_rows: int) -> Iterator[pd.DataFrame]:
+
+    if df.empty:
+        yield df
+        return
+
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+# Stream the result of merging two chunked inputs, partitioning to disk when num_partitions > 1
+def external_merge(
+    left_chunks: Iterable[pd.DataFrame],
+    right_chunks: Iterable[pd.DataFrame],
+    on: str,
+    how: str,
+    num_partitions: int,
+    spill_dir: str | None = None,
+    chunk_rows: int = 100_000
+) -> Iterator[pd.DataFrame]:
+
+    if how not in JOIN_TYPES:
+        raise ValueError(f"Invalid join type '{how}'. Use one of: {', '.join(JOIN_TYPES)}.")
+
+    if num_partitions <= 1:
+        left = pd.concat(list(left_chunks), ignore_index = True)
+        right = pd.concat(list(right_chunks), ignore_index = True)
+        yield from _iter_slices(pd.merge(left, right, on = on, how = how), chunk_rows)
+        return
+
+    work_dir = tempfile.mkdtemp(prefix = "external_merge_", dir = spill_dir)
+
+    try:
+        left_schema, left_rows, left_sample = _partition_input(left_chunks, on, LEFT_POSITION, num_partitions, work_dir, "left")
+        right_schema, right_rows, right_sample = _partition_input(right_chunks, on, RIGHT_POSITION, num_partitions, work_dir, "right")
+
+        num_buckets = num_partitions
+        boundaries = _key_boundaries(left_sample + right_sample, num_buckets) if how == "outer" else None
+
+        # Join partition by partition and scatter the output into order buckets
+        result_dtypes = {}
+        empty_result = None
+
+        for partition in range(num_partitions):
+            left = _read_spill(os.path.join(work_dir, f"left_{partition}.pkl"), left_schema)
+            right = _read_spill(os.path.join(work_dir, f"right_{partition}.pkl"), right_schema)
+            merged = pd.merge(left, right, on = on, how = how)
+            del left, right
+
+            if merged.empty:
+                if empty_result is None:
+                    empty_result = merged
+                continue
+
+            for column, dtype in merged.dtypes.items():
+                result_dtypes.setdefault(column, []).append(dtype)
+
+            buckets = _order_buckets(merged, on, how, num_buckets, left_rows, right_rows, boundaries)
+            for bucket, part in merged.groupby(buckets, sort = False):
+                _append_spill(os.path.join(work_dir, f"bucket_{bucket}.pkl"), part)
+
+        if not result_dtypes:
+            yield empty_result.drop(columns = [LEFT_POSITION, RIGHT_POSITION])
+            return
+
+        final_dtypes = {column: _common_dtype(dtypes) for column, dtypes in result_dtypes.items()}
+        schema = pd.DataFrame({column: pd.Series(dtype = dtype) for column, dtype in final_dtypes.items()})
+        sort_columns = _sort_columns(on, how)
+        offset = 0
+
+        # Emit buckets in order; each bucket is sorted back into pd.merge row order
+        for bucket in range(num_buckets):
+            path = os.path.join(work_dir, f"bucket_{bucket}.pkl")
+            if not os.path.exists(path):
+                continue
+
+            result = _read_spill(path, schema)
+            os.remove(path)
+
+            result = result.astype(final_dtypes)
+            result = result.sort_values(sort_columns, kind = "stable", na_position = "last")
+            result = result.drop(columns = [LEFT_POSITION, RIGHT_POSITION])
+            result.index = pd.RangeIndex(offset, offset + len(result))
+            offset += len(result)
+
+            yield from _iter_slices(result, chunk_rows)
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors = True)
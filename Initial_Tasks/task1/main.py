@@ -1,54 +1,316 @@
-import pandas as pd
-import sys
-
-def merge_files(file1, file2, join_type):
-
-    def read_file(path):
-        if path.endswith('.csv'):
-            return pd.read_csv(path)
-        elif path.endswith(('.xlsx')):
-            return pd.read_excel(path)
-        else:
-            raise ValueError("Unsupported file format. Kindly use CSV or Excel files.")
-
-    data_file_1 = read_file(file1)
-    data_file_2 = read_file(file2)
-
-    # Specifically adding for excel files
-    data_file_1.columns = data_file_1.columns.str.strip().str.lower()
-    data_file_2.columns = data_file_2.columns.str.strip().str.lower()
-
-    if 'id' not in data_file_1.columns or 'id' not in data_file_2.columns:
-        print("Error: Column 'id' not found in one or both files.")
-        print(f"File1 columns: {list(data_file_1.columns)}")
-        print(f"File2 columns: {list(data_file_2.columns)}")
-        sys.exit(1)
-
-    new_merged_file = pd.merge(data_file_1, data_file_2, on = 'id', how = join_type)
-    
-    output_filename = f"new_merged_file_by_{join_type}_join"
-    
-    if file1.endswith('.csv'):
-        output_file = f"{output_filename}.csv"
-        new_merged_file.to_csv(output_file, index = False)
-    else:
-        output_file = f"{output_filename}.xlsx"
-        new_merged_file.to_excel(output_file, index = False)
-
-    print(f"New merged file saved as: {output_file}")
-
-
-if __name__ == "__main__":
-    if len(sys.argv) != 4:
-        print("Sample Usage: python main.py <file1> <file2> <join_type>")
-        sys.exit(1)
-
-    file1 = sys.argv[1]
-    file2 = sys.argv[2]
-    join_type = sys.argv[3].lower()
-
-    if join_type not in ['inner', 'outer', 'left', 'right']:
-        print("Invalid join type. Kindly use one of the provided - inner, outer, left, right.")
-        sys.exit(1)
-
-    merge_files(file1, file2, join_type)
+import pandas as pd
+import concurrent.futures
+import csv
+import itertools
+import json
+import math
+import os
+import shutil
+import sys
+import tempfile
+import time
+from external_merge import external_merge, partition_count, JOIN_TYPES, MEMORY_EXPANSION_FACTOR
+from xlsx_io import read_xlsx, read_xlsx_chunks, write_xlsx
+
+CHUNK_ROWS = 100_000
+
+def read_file_chunks(path):
+    if path.endswith('.csv'):
+        yield from pd.read_csv(path, chunksize = CHUNK_ROWS)
+    elif path.endswith(('.xlsx')):
+        yield from read_xlsx_chunks(path, CHUNK_ROWS)
+    else:
+        raise ValueError("Unsupported file format. Kindly use CSV or Excel files.")
+
+def normalize_columns(chunks):
+    # Specifically adding for excel files
+    for chunk in chunks:
+        chunk.columns = chunk.columns.str.strip().str.lower()
+        yield chunk
+
+# Merge files larger than memory by hash-partitioning both inputs to spill files on disk
+def merge_files_out_of_core(file1, file2, join_type, memory_limit_mb):
+
+    estimated_bytes = (os.path.getsize(file1) + os.path.getsize(file2)) * MEMORY_EXPANSION_FACTOR
+    num_partitions = partition_count(estimated_bytes, memory_limit_mb * 1024 * 1024)
+
+    chunks_1 = normalize_columns(read_file_chunks(file1))
+    chunks_2 = normalize_columns(read_file_chunks(file2))
+
+    first_chunk_1 = next(chunks_1)
+    first_chunk_2 = next(chunks_2)
+
+    if 'id' not in first_chunk_1.columns or 'id' not in first_chunk_2.columns:
+        print("Error: Column 'id' not found in one or both files.")
+        print(f"File1 columns: {list(first_chunk_1.columns)}")
+        print(f"File2 columns: {list(first_chunk_2.columns)}")
+        sys.exit(1)
+
+    chunks_1 = itertools.chain([first_chunk_1], chunks_1)
+    chunks_2 = itertools.chain([first_chunk_2], chunks_2)
+
+    merged_chunks = external_merge(chunks_1, chunks_2, 'id', join_type, num_partitions, chunk_rows = CHUNK_ROWS)
+
+    output_filename = f"new_merged_file_by_{join_type}_join"
+
+    if file1.endswith('.csv'):
+        output_file = f"{output_filename}.csv"
+        header = True
+        with open(output_file, 'w', newline = '') as f:
+            for chunk in merged_chunks:
+                chunk.to_csv(f, index = False, header = header)
+                header = False
+    else:
+        output_file = f"{output_filename}.xlsx"
+        write_xlsx(merged_chunks, output_file)
+
+    print(f"New merged file saved as: {output_file} ({num_partitions} partitions)")
+
+def read_file(path):
+    if path.endswith('.csv'):
+        return pd.read_csv(path)
+    elif path.endswith(('.xlsx')):
+        return read_xlsx(path)
+    else:
+        raise ValueError("Unsupported file format. Kindly use CSV or Excel files.")
+
+def merge_files(file1, file2, join_type):
+
+    data_file_1 = read_file(file1)
+    data_file_2 = read_file(file2)
+
+    # Specifically adding for excel files
+    data_file_1.columns = data_file_1.columns.str.strip().str.lower()
+    data_file_2.columns = data_file_2.columns.str.strip().str.lower()
+
+    if 'id' not in data_file_1.columns or 'id' not in data_file_2.columns:
+        print("Error: Column 'id' not found in one or both files.")
+        print(f"File1 columns: {list(data_file_1.columns)}")
+        print(f"File2 columns: {list(data_file_2.columns)}")
+        sys.exit(1)
+
+    new_merged_file = pd.merge(data_file_1, data_file_2, on = 'id', how = join_type)
+    
+    output_filename = f"new_merged_file_by_{join_type}_join"
+    
+    if file1.endswith('.csv'):
+        output_file = f"{output_filename}.csv"
+        new_merged_file.to_csv(output_file, index = False)
+    else:
+        output_file = f"{output_filename}.xlsx"
+        write_xlsx([new_merged_file], output_file)
+
+    print(f"New merged file saved as: {output_file}")
+
+
+# Batch mode: many merges from a manifest, run across a process pool. Every distinct input is parsed
+# once (in parallel) into a pickle spill file; merge workers load inputs from those spills and keep the
+# last few in memory, and merges are ordered so pairs sharing an input tend to run back to back.
+
+# Parsed inputs a merge worker keeps in memory; a pair needs two at a time
+WORKER_CACHE_INPUTS = 4
+
+_worker_inputs = {}
+
+# Merges of a manifest: a CSV with a header row or a JSON list of objects, with fields file1, file2,
+# join_type and optionally key (default id); relative paths are taken from the manifest's folder
+def read_manifest(path):
+
+    with open(path, newline = '') as f:
+        if path.endswith('.json'):
+            entries = json.load(f)
+        elif path.endswith('.csv'):
+            entries = list(csv.DictReader(f))
+        else:
+            raise ValueError("Unsupported manifest format. Kindly use a CSV or JSON manifest.")
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    merges = []
+
+    for index, entry in enumerate(entries, start = 1):
+        entry = {str(name).strip().lower(): str(value).strip() for name, value in entry.items() if value is not None}
+        join_type = entry.get('join_type', '').lower()
+
+        if not entry.get('file1') or not entry.get('file2'):
+            raise ValueError(f"Manifest entry {index} needs both file1 and file2.")
+        if join_type not in JOIN_TYPES:
+            raise ValueError(f"Manifest entry {index} has invalid join type '{join_type}'. Kindly use one of the provided - inner, outer, left, right.")
+
+        merges.append({
+            'index': index,
+            'file1': os.path.join(base_dir, entry['file1']),
+            'file2': os.path.join(base_dir, entry['file2']),
+            'join_type': join_type,
+            'key': (entry.get('key') or 'id').lower()
+        })
+
+    return merges
+
+# Parse one input and spill it for the merge workers; returns the spill path or the error
+def parse_input(path, spill_path):
+
+    start = time.perf_counter()
+
+    try:
+        data = read_file(path)
+        # Specifically adding for excel files
+        data.columns = data.columns.str.strip().str.lower()
+        data.to_pickle(spill_path)
+    except Exception as e:
+        return {'path': path, 'spill': None, 'error': f"{type(e).__name__}: {e}", 'seconds': time.perf_counter() - start}
+
+    return {'path': path, 'spill': spill_path, 'error': None, 'seconds': time.perf_counter() - start}
+
+def load_input(spill_path):
+
+    if spill_path in _worker_inputs:
+        _worker_inputs[spill_path] = _worker_inputs.pop(spill_path)
+        return _worker_inputs[spill_path]
+
+    if len(_worker_inputs) >= WORKER_CACHE_INPUTS:
+        _worker_inputs.pop(next(iter(_worker_inputs)))
+
+    _worker_inputs[spill_path] = pd.read_pickle(spill_path)
+    return _worker_inputs[spill_path]
+
+# Output name of a batch merge; the manifest position keeps names unique when pairs repeat
+def batch_output_file(merge, output_dir):
+
+    stem_1 = os.path.splitext(os.path.basename(merge['file1']))[0]
+    stem_2 = os.path.splitext(os.path.basename(merge['file2']))[0]
+    extension = 'csv' if merge['file1'].endswith('.csv') else 'xlsx'
+
+    return os.path.join(output_dir, f"merged_{merge['index']:04d}_{stem_1}_{stem_2}_by_{merge['join_type']}_join.{extension}")
+
+# Run one merge of the batch in a worker; failures are reported in the result instead of stopping the batch
+def run_batch_merge(merge, spill_1, spill_2, output_file):
+
+    result = {'index': merge['index'], 'output': None, 'rows': None, 'error': None, 'load': 0.0, 'merge': 0.0, 'write': 0.0}
+    start = time.perf_counter()
+
+    try:
+        data_file_1 = load_input(spill_1)
+        data_file_2 = load_input(spill_2)
+        result['load'] = time.perf_counter() - start
+
+        key = merge['key']
+        if key not in data_file_1.columns or key not in data_file_2.columns:
+            raise KeyError(f"Column '{key}' not found in one or both files.")
+
+        start = time.perf_counter()
+        new_merged_file = pd.merge(data_file_1, data_file_2, on = key, how = merge['join_type'])
+        result['merge'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        if output_file.endswith('.csv'):
+            new_merged_file.to_csv(output_file, index = False)
+        else:
+            write_xlsx([new_merged_file], output_file)
+        result['write'] = time.perf_counter() - start
+
+        result['output'] = output_file
+        result['rows'] = len(new_merged_file)
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+
+    return result
+
+def print_batch_summary(merges, results, input_seconds, wall_seconds):
+
+    print()
+    print(f"{'#':>5}  {'join':<5}  {'rows':>10}  {'load s':>8}  {'merge s':>8}  {'write s':>8}  {'total s':>8}  output")
+
+    for merge in merges:
+        result = results[merge['index']]
+        total = result['load'] + result['merge'] + result['write']
+        rows = result['rows'] if result['rows'] is not None else '-'
+        output = result['output'] or f"FAILED ({result['error']})"
+        print(f"{merge['index']:>5}  {merge['join_type']:<5}  {rows:>10}  {result['load']:>8.3f}  {result['merge']:>8.3f}  {result['write']:>8.3f}  {total:>8.3f}  {output}")
+
+    failed = sum(1 for result in results.values() if result['error'])
+    merge_seconds = sum(result['load'] + result['merge'] + result['write'] for result in results.values())
+
+    print()
+    print(f"{len(merges) - failed} of {len(merges)} merges succeeded, {failed} failed.")
+    print(f"Inputs parsed: {len(input_seconds)} in {sum(input_seconds):.3f}s of worker time.")
+    print(f"Merge time across workers: {merge_seconds:.3f}s; wall time: {wall_seconds:.3f}s.")
+
+def merge_batch(manifest, workers = None, output_dir = '.'):
+
+    start = time.perf_counter()
+    merges = read_manifest(manifest)
+
+    if not merges:
+        print("Manifest has no merges.")
+        return
+
+    os.makedirs(output_dir, exist_ok = True)
+    inputs = sorted({merge['file1'] for merge in merges} | {merge['file2'] for merge in merges})
+    workers = max(1, min(workers or os.cpu_count() or 1, max(len(inputs), len(merges))))
+    spill_dir = tempfile.mkdtemp(prefix = "batch_merge_")
+
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers = workers) as pool:
+            parsed = {}
+            spill_paths = [os.path.join(spill_dir, f"input_{position}.pkl") for position in range(len(inputs))]
+            for result in pool.map(parse_input, inputs, spill_paths):
+                parsed[result['path']] = result
+                if result['error']:
+                    print(f"Could not read {result['path']}: {result['error']}")
+
+            print(f"Parsed {len(inputs)} distinct inputs for {len(merges)} merges with {workers} workers.")
+
+            # Pairs sharing inputs next to each other, so a worker's cached inputs get reused
+            ordered = sorted(merges, key = lambda merge: (merge['file1'], merge['file2']))
+            runnable = [merge for merge in ordered if not parsed[merge['file1']]['error'] and not parsed[merge['file2']]['error']]
+
+            results = {
+                merge['index']: {'index': merge['index'], 'output': None, 'rows': None, 'error': "Input could not be read.", 'load': 0.0, 'merge': 0.0, 'write': 0.0}
+                for merge in ordered if parsed[merge['file1']]['error'] or parsed[merge['file2']]['error']
+            }
+
+            chunk_size = max(1, math.ceil(len(runnable) / (workers * 4)))
+            for result in pool.map(
+                run_batch_merge,
+                runnable,
+                [parsed[merge['file1']]['spill'] for merge in runnable],
+                [parsed[merge['file2']]['spill'] for merge in runnable],
+                [batch_output_file(merge, output_dir) for merge in runnable],
+                chunksize = chunk_size
+            ):
+                results[result['index']] = result
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors = True)
+
+    print_batch_summary(merges, results, [result['seconds'] for result in parsed.values()], time.perf_counter() - start)
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == '--batch':
+        if len(sys.argv) > 5:
+            print("Sample Usage: python main.py --batch <manifest.csv|manifest.json> [workers] [output_dir]")
+            sys.exit(1)
+
+        try:
+            merge_batch(sys.argv[2], int(sys.argv[3]) if len(sys.argv) >= 4 else None, sys.argv[4] if len(sys.argv) == 5 else '.')
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        sys.exit(0)
+
+    if len(sys.argv) not in (4, 5):
+        print("Sample Usage: python main.py <file1> <file2> <join_type> [memory_limit_mb]")
+        print("              python main.py --batch <manifest.csv|manifest.json> [workers] [output_dir]")
+        sys.exit(1)
+
+    file1 = sys.argv[1]
+    file2 = sys.argv[2]
+    join_type = sys.argv[3].lower()
+
+    if join_type not in ['inner', 'outer', 'left', 'right']:
+        print("Invalid join type. Kindly use one of the provided - inner, outer, left, right.")
+        sys.exit(1)
+
+    if len(sys.argv) == 5:
+        merge_files_out_of_core(file1, file2, join_type, int(sys.argv[4]))
+    else:
+        merge_files(file1, file2, join_type)